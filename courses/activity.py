@@ -0,0 +1,141 @@
+"""
+Append-only learning event log.
+
+Views and models call ``record()`` when a lesson is viewed or completed and when
+an exercise is submitted or passed. Each event is one narrow, integer-coded
+``LearningEvent`` row, and rows are never updated. Streaks, the dashboard's
+recent activity and reports are range scans over the ``(user, occurred_at)``
+and ``occurred_at`` indexes.
+
+``record()`` only appends to a per-process buffer, so it is cheap and safe to
+call from async views. The buffer is written with one ``bulk_create`` when a
+request finishes and either ``LEARNING_EVENTS_BATCH_SIZE`` events are pending
+or the oldest has waited ``LEARNING_EVENTS_FLUSH_SECONDS``. Readers call
+``flush()`` first, so learners always see their own activity. Events buffered
+by other processes can lag by up to the flush interval.
+
+Each calendar month is a partition. ``python manage.py archive_learning_events``
+writes months older than ``LEARNING_EVENTS_KEEP_MONTHS`` to gzipped JSON Lines
+and deletes them.
+"""
+import atexit
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import DatabaseError
+from django.utils import timezone
+
+from .models import InteractiveExercise, LearningEvent, Lesson
+from .prerequisites import prerequisite_graph
+
+logger = logging.getLogger(__name__)
+
+LESSON_KINDS = (LearningEvent.LESSON_VIEWED, LearningEvent.LESSON_COMPLETED)
+
+_lock = threading.Lock()
+_pending = []
+_oldest = None
+
+
+def record(user_id, kind, object_id, course_id=None, occurred_at=None):
+    """Queue one event; it is written with the next batch."""
+    global _oldest
+    event = LearningEvent(
+        occurred_at=occurred_at or timezone.now(),
+        user_id=user_id,
+        kind=kind,
+        object_id=object_id,
+        course_id=course_id,
+    )
+    with _lock:
+        if not _pending:
+            _oldest = time.monotonic()
+        _pending.append(event)
+
+
+def record_attempt(attempt, course_id=None):
+    """A submission, plus a pass when it was correct."""
+    record(attempt.user_id, LearningEvent.EXERCISE_SUBMITTED, attempt.exercise_id, course_id)
+    if attempt.is_correct:
+        record(attempt.user_id, LearningEvent.EXERCISE_PASSED, attempt.exercise_id, course_id)
+
+
+def flush():
+    """Write every pending event now; returns how many were written."""
+    with _lock:
+        batch = _pending[:]
+        _pending.clear()
+    if batch:
+        LearningEvent.objects.bulk_create(batch, batch_size=settings.LEARNING_EVENTS_BATCH_SIZE)
+    return len(batch)
+
+
+def discard():
+    """Drop pending events without writing them (for tests, or in a freshly forked worker)."""
+    with _lock:
+        _pending.clear()
+
+
+def _flush_if_due(**kwargs):
+    if not _pending:
+        return
+    waited = time.monotonic() - _oldest
+    if len(_pending) >= settings.LEARNING_EVENTS_BATCH_SIZE or waited >= settings.LEARNING_EVENTS_FLUSH_SECONDS:
+        try:
+            flush()
+        except DatabaseError:
+            logger.exception('Could not write learning events')
+
+
+def _flush_at_exit():
+    try:
+        flush()
+    except Exception:
+        logger.exception('Dropped learning events at shutdown')
+
+
+request_finished.connect(_flush_if_due, dispatch_uid='learning_events_flush')
+atexit.register(_flush_at_exit)
+
+
+def _start_of(day):
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+
+def active_days(user_id, since):
+    """Dates from ``since`` on with any activity by the user."""
+    flush()
+    return set(
+        LearningEvent.objects.filter(user_id=user_id, occurred_at__gte=_start_of(since)).dates('occurred_at', 'day')
+    )
+
+
+def recent(user_id, days=7, limit=10):
+    """The learner's latest events, with lesson / exercise and course titles."""
+    flush()
+    since = timezone.now() - timedelta(days=days)
+    events = list(
+        LearningEvent.objects.filter(user_id=user_id, occurred_at__gte=since)
+        .order_by('-occurred_at', '-id')[:limit]
+    )
+    lesson_ids = {event.object_id for event in events if event.kind in LESSON_KINDS}
+    exercise_ids = {event.object_id for event in events if event.kind not in LESSON_KINDS}
+    lessons = dict(Lesson.objects.filter(id__in=lesson_ids).values_list('id', 'title')) if lesson_ids else {}
+    exercises = dict(InteractiveExercise.objects.filter(id__in=exercise_ids).values_list('id', 'title')) if exercise_ids else {}
+    course_titles = prerequisite_graph().titles
+    for event in events:
+        titles = lessons if event.kind in LESSON_KINDS else exercises
+        event.title = titles.get(event.object_id, '(removed)')
+        event.course_title = course_titles.get(event.course_id, '')
+    return events
+
+
+def month_bounds(year, month):
+    """``[start, end)`` of a calendar month, the unit events are archived in."""
+    start = timezone.make_aware(datetime(year, month, 1))
+    end = timezone.make_aware(datetime(year + month // 12, month % 12 + 1, 1))
+    return start, end
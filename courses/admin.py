@@ -1,11 +1,13 @@
 from django import forms
 from django.contrib import admin
 from django.db import models
+from django.db.models import Sum
 from django.utils.html import format_html
 from django_ckeditor_5.widgets import CKEditor5Widget
-from .models import InteractiveExercise, UserExerciseAttempt
+from .models import CourseDailyStats, ExerciseDailyStats, InteractiveExercise, LessonDailyStats, UserExerciseAttempt
 
 from .models import CodeExample, Course, Lesson, Module, Technology, WorkflowDiagram
+from .prerequisites import PrerequisiteCycle, check_prerequisites
 
 
 class CodeExampleInline(admin.TabularInline):
@@ -39,6 +41,24 @@ class LessonAdminForm(forms.ModelForm):
             ),
         }
 
+class CourseAdminForm(forms.ModelForm):
+    class Meta:
+        model = Course
+        fields = '__all__'
+
+    def clean_prerequisites(self):
+        prerequisites = self.cleaned_data['prerequisites']
+        try:
+            check_prerequisites(self.instance, prerequisites)
+        except PrerequisiteCycle as e:
+            titles = dict(Course.objects.filter(pk__in=e.cycle).values_list('pk', 'title'))
+            raise forms.ValidationError(
+                'These prerequisites would create a cycle: %(cycle)s',
+                code='prerequisite_cycle',
+                params={'cycle': ' → '.join(titles[pk] for pk in e.cycle)},
+            )
+        return prerequisites
+
 class CodeExampleAdminForm(forms.ModelForm):
     class Meta:
         model = CodeExample
@@ -64,6 +84,7 @@ class TechnologyAdmin(admin.ModelAdmin):
 
 @admin.register(Course)
 class CourseAdmin(admin.ModelAdmin):
+    form = CourseAdminForm
     list_display = ['title', 'technology', 'difficulty', 'estimated_duration', 'lesson_count', 'is_active']
     list_filter = ['difficulty', 'is_active', 'technology__phase']
     search_fields = ['title', 'description']
@@ -178,12 +199,21 @@ class InteractiveExerciseAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_queryset(self, request):
+        # Totals come from the daily rollups (manage.py rollup_attempts), one query per page
+        return super().get_queryset(request).annotate(
+            total_attempts=Sum('daily_stats__attempts'),
+            total_successes=Sum('daily_stats__successes'),
+        )
+    
     def get_total_attempts(self, obj):
-        return obj.get_total_attempts()
+        return obj.total_attempts or 0
     get_total_attempts.short_description = 'Total Attempts'
+    get_total_attempts.admin_order_field = 'total_attempts'
     
     def get_success_rate(self, obj):
-        return f"{obj.get_success_rate():.1f}%"
+        rate = (obj.total_successes / obj.total_attempts) * 100 if obj.total_attempts else 0
+        return f"{rate:.1f}%"
     get_success_rate.short_description = 'Success Rate'
 
 @admin.register(UserExerciseAttempt)
@@ -207,4 +237,43 @@ class UserExerciseAttemptAdmin(admin.ModelAdmin):
         ('Timestamps', {
             'fields': ('attempted_at', 'completed_at')
         }),
-    )
\ No newline at end of file
+    )
+
+
+class DailyStatsAdmin(admin.ModelAdmin):
+    """Read-only view of the attempt rollups"""
+    list_display = ['day', 'attempts', 'successes', 'success_rate_display', 'mean_score_display', 'median_solve_seconds']
+    date_hierarchy = 'day'
+    ordering = ['-day']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def success_rate_display(self, obj):
+        return f"{obj.success_rate:.1f}%"
+    success_rate_display.short_description = 'Success Rate'
+    
+    def mean_score_display(self, obj):
+        return f"{obj.mean_score:.1f}"
+    mean_score_display.short_description = 'Mean Score'
+
+@admin.register(ExerciseDailyStats)
+class ExerciseDailyStatsAdmin(DailyStatsAdmin):
+    list_display = ['exercise', *DailyStatsAdmin.list_display]
+    list_filter = ['exercise__lesson__module__course']
+    list_select_related = ['exercise__lesson']
+
+@admin.register(LessonDailyStats)
+class LessonDailyStatsAdmin(DailyStatsAdmin):
+    list_display = ['lesson', *DailyStatsAdmin.list_display]
+    list_filter = ['lesson__module__course']
+    list_select_related = ['lesson']
+
+@admin.register(CourseDailyStats)
+class CourseDailyStatsAdmin(DailyStatsAdmin):
+    list_display = ['course', *DailyStatsAdmin.list_display]
+    list_filter = ['course']
+    list_select_related = ['course']
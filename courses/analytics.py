@@ -0,0 +1,131 @@
+"""
+Per-learner analytics computed with grouped queries and cached per user.
+
+Each learner has a progress version, bumped after commit whenever one of their
+``UserProgress`` rows, completed lessons or exercise attempts changes. Per-user
+results (and per-user template fragments, see ``courses.fragments``) are cached
+under a key that combines it with the catalog version, so they stay valid
+until the learner makes progress or the catalog changes.
+"""
+import time
+from dataclasses import dataclass
+
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Avg, Count, Q
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from users.models import UserProgress
+
+from .catalog import catalog_version
+from .models import Course, UserExerciseAttempt
+
+PROGRESS_TIMEOUT = 86400
+
+
+def progress_version(user_id):
+    cache = caches['default']
+    key = f'progress:version:{user_id}'
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_progress_version(user_id):
+    caches['default'].set(f'progress:version:{user_id}', time.time_ns(), None)
+
+
+@receiver([post_save, post_delete], sender=UserProgress, dispatch_uid='progress_version_progress')
+@receiver([post_save, post_delete], sender=UserExerciseAttempt, dispatch_uid='progress_version_attempts')
+def _progress_changed(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) == {'last_accessed_lesson'}:
+        # Moving between lessons is not progress; keep cached pages valid.
+        return
+    transaction.on_commit(lambda: bump_progress_version(instance.user_id))
+
+
+@receiver(m2m_changed, sender=UserProgress.completed_lessons.through, dispatch_uid='progress_version_lessons')
+def _completed_lessons_changed(sender, instance, action, reverse, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        # Changed from the lesson side; affects every learner who completed it.
+        user_ids = set(UserProgress.objects.filter(pk__in=kwargs['pk_set'] or ()).values_list('user_id', flat=True))
+    else:
+        user_ids = {instance.user_id}
+    for user_id in user_ids:
+        transaction.on_commit(lambda user_id=user_id: bump_progress_version(user_id))
+
+
+@dataclass
+class PhaseProgress:
+    phase: int
+    courses: int
+    active_courses: int
+    enrolled: int = 0
+    completed: int = 0
+    average_progress: float = 0.0
+
+    @property
+    def percent(self):
+        """Share of the phase's courses the learner has completed."""
+        return int(self.completed / self.courses * 100) if self.courses else 0
+
+
+def phase_course_counts():
+    """``{phase: (courses, active courses)}``, cached per catalog version."""
+    key = f'phases:courses:{catalog_version()}'
+    counts = caches['catalog'].get(key)
+    if counts is None:
+        counts = {
+            row['technology__phase']: (row['courses'], row['active'])
+            for row in Course.objects.values('technology__phase').annotate(
+                courses=Count('id'), active=Count('id', filter=Q(is_active=True))
+            )
+        }
+        caches['catalog'].set(key, counts)
+    return counts
+
+
+def phase_progress(user):
+    """``{phase: PhaseProgress}`` for every phase in the catalog, in phase order."""
+    cache = caches['default']
+    key = f'phases:{user.pk}:{progress_version(user.pk)}:{catalog_version()}'
+    phases = cache.get(key)
+    if phases is not None:
+        return phases
+
+    phases = {
+        phase: PhaseProgress(phase, courses, active)
+        for phase, (courses, active) in sorted(phase_course_counts().items())
+    }
+    rows = (
+        UserProgress.objects.filter(user=user)
+        .values('course__technology__phase')
+        .annotate(
+            enrolled=Count('id'),
+            completed=Count('id', filter=Q(progress_percentage=100)),
+            average=Avg('progress_percentage'),
+        )
+    )
+    for row in rows:
+        stats = phases[row['course__technology__phase']]
+        stats.enrolled = row['enrolled']
+        stats.completed = row['completed']
+        stats.average_progress = row['average']
+    cache.set(key, phases, PROGRESS_TIMEOUT)
+    return phases
+
+
+def current_phase(phases):
+    """First phase the learner has started but not finished; 1 before any progress."""
+    started = [stats for stats in phases.values() if stats.enrolled]
+    if not started:
+        return 1
+    for stats in started:
+        if stats.average_progress < 100:
+            return stats.phase
+    return started[-1].phase + 1
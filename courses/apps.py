@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class CoursesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "courses"
+
+    def ready(self):
+        # Register connection-created hooks for the active database profile
+        from devoops_lms import db  # noqa: F401
+        # Bump the catalog and per-learner progress versions on change, and
+        # keep leaderboards and site statistics current as attempts are scored;
+        # flush batched learning events as requests finish; generate image
+        # derivatives for new uploads
+        from . import activity, analytics, catalog, images, leaderboards, site_stats  # noqa: F401
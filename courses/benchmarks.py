@@ -0,0 +1,199 @@
+"""
+View-level query and latency benchmarks.
+
+``SCENARIOS`` covers every named URL in courses/urls.py and devoops_lms/urls.py
+as an anonymous and an authenticated learner against the fixed dataset built
+by ``seed_dataset``. ``QUERY_BUDGETS`` holds the upper bound of queries per
+scenario; the test suite fails when a change exceeds one, and
+``python manage.py benchmark_views`` records latency percentiles to a JSON
+baseline for comparison between commits.
+"""
+import json
+import time
+from dataclasses import dataclass, field
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from devoops_lms.metrics import summarize
+from users.models import UserProgress
+
+from .models import InteractiveExercise, Lesson, UserExerciseAttempt
+from .synthetic import create_catalog, create_learners
+
+
+@dataclass
+class Scenario:
+    name: str
+    url_name: str
+    args: tuple = ()
+    method: str = 'get'
+    query: str = ''
+    data: dict = field(default_factory=dict)
+    json_body: bool = False
+    ajax: bool = False
+    expected_status: dict = field(default_factory=lambda: {'anonymous': 200, 'authenticated': 200})
+
+    def url(self, dataset):
+        args = [dataset[arg] for arg in self.args]
+        return reverse(self.url_name, args=args) + (f'?{self.query}' if self.query else '')
+
+    def request(self, client, dataset):
+        kwargs = {}
+        if self.ajax:
+            kwargs['HTTP_X_REQUESTED_WITH'] = 'XMLHttpRequest'
+        if self.json_body:
+            kwargs.update(data=json.dumps(self.data), content_type='application/json')
+        elif self.data:
+            kwargs['data'] = self.data
+        return getattr(client, self.method)(self.url(dataset), **kwargs)
+
+
+LOGIN_REDIRECT = {'anonymous': 302, 'authenticated': 200}
+
+SCENARIOS = [
+    Scenario('home', 'home'),
+    Scenario('dashboard', 'dashboard', expected_status=LOGIN_REDIRECT),
+    Scenario('course_list', 'course_list'),
+    Scenario('course_detail', 'course_detail', args=('course',)),
+    Scenario('technology_detail', 'technology_detail', args=('technology',)),
+    Scenario('lesson_detail', 'lesson_detail', args=('lesson',), expected_status=LOGIN_REDIRECT),
+    Scenario('lesson_sections', 'lesson_sections', args=('lesson',), expected_status=LOGIN_REDIRECT),
+    Scenario('roadmap', 'roadmap'),
+    Scenario('leaderboard', 'leaderboard', query='period=week'),
+    Scenario('search', 'search', query='q=Tech'),
+    Scenario('search_suggestions', 'search_suggestions', query='q=Tech'),
+    Scenario(
+        'mark_lesson_complete', 'mark_lesson_complete', args=('lesson',), method='post',
+        data={'action': 'complete'}, ajax=True, expected_status=LOGIN_REDIRECT,
+    ),
+    Scenario('get_course_progress', 'get_course_progress', args=('course',), expected_status=LOGIN_REDIRECT),
+    Scenario(
+        'validate_exercise', 'validate_exercise', args=('exercise',), method='post',
+        data={'code': 'git init'}, json_body=True, expected_status=LOGIN_REDIRECT,
+    ),
+    Scenario(
+        'submit_quiz_answer', 'submit_quiz_answer', args=('exercise',), method='post',
+        data={'answer': 'a'}, json_body=True, expected_status=LOGIN_REDIRECT,
+    ),
+    Scenario('exercise_detail', 'exercise_detail', args=('exercise',), expected_status=LOGIN_REDIRECT),
+    # Staff only; the benchmark learner is redirected to the admin login.
+    Scenario(
+        'export_learning_data', 'export_learning_data', args=('export', 'export_format'),
+        expected_status={'anonymous': 302, 'authenticated': 302},
+    ),
+    # The test client speaks WSGI, where the event stream is refused with 501.
+    Scenario('event_stream', 'event_stream', expected_status={'anonymous': 302, 'authenticated': 501}),
+]
+
+# Upper bounds on queries per request for the seed_dataset() catalog.
+# Lower these when a view gets cheaper; never raise one without a reason.
+# Caches start empty, so these include loads that production pays once per
+# catalog version (prerequisite graph, phase course counts) or once per
+# progress change (phase progress).
+QUERY_BUDGETS = {
+    # Statistics come from the worker's copy or the shared cache; both are cold
+    # here, so the singleton row is read once.
+    ('home', 'anonymous'): 1,
+    ('home', 'authenticated'): 2,
+    ('dashboard', 'anonymous'): 0,
+    ('dashboard', 'authenticated'): 20,
+    ('course_list', 'anonymous'): 9,
+    ('course_list', 'authenticated'): 10,
+    ('course_detail', 'anonymous'): 4,
+    ('course_detail', 'authenticated'): 7,
+    ('technology_detail', 'anonymous'): 5,
+    ('technology_detail', 'authenticated'): 6,
+    ('lesson_detail', 'anonymous'): 0,
+    # Code examples and exercises are fetched separately from lesson_sections.
+    ('lesson_detail', 'authenticated'): 12,
+    ('lesson_sections', 'anonymous'): 0,
+    ('lesson_sections', 'authenticated'): 4,
+    ('roadmap', 'anonymous'): 1,
+    ('roadmap', 'authenticated'): 7,
+    ('leaderboard', 'anonymous'): 4,
+    ('leaderboard', 'authenticated'): 7,
+    ('search', 'anonymous'): 9,
+    ('search', 'authenticated'): 10,
+    ('search_suggestions', 'anonymous'): 2,
+    ('search_suggestions', 'authenticated'): 2,
+    ('mark_lesson_complete', 'anonymous'): 0,
+    ('mark_lesson_complete', 'authenticated'): 10,
+    ('get_course_progress', 'anonymous'): 0,
+    ('get_course_progress', 'authenticated'): 6,
+    ('validate_exercise', 'anonymous'): 0,
+    # Grading publishes a live event and upserts the leaderboards, plus the streak
+    # and weekly rollover on the first write of the day/week (either scenario),
+    # and bumps the solved-exercise count the first time an attempt passes.
+    ('validate_exercise', 'authenticated'): 12,
+    ('submit_quiz_answer', 'anonymous'): 0,
+    ('submit_quiz_answer', 'authenticated'): 12,
+    ('exercise_detail', 'anonymous'): 0,
+    ('exercise_detail', 'authenticated'): 4,
+    ('export_learning_data', 'anonymous'): 0,
+    ('export_learning_data', 'authenticated'): 1,
+    ('event_stream', 'anonymous'): 0,
+    ('event_stream', 'authenticated'): 1,
+}
+
+AUDIENCES = ('anonymous', 'authenticated')
+
+
+def seed_dataset():
+    """Fixed catalog plus one learner with some progress and attempts."""
+    courses = create_catalog(phases=3, technologies_per_phase=2, modules_per_course=2, lessons_per_module=4)
+    learner = create_learners(1, prefix='benchmark')[0]
+    course = courses[0]
+    lessons = list(Lesson.objects.filter(module__course=course).order_by('module__order', 'order'))
+
+    progress = UserProgress.objects.create(user=learner, course=course, last_accessed_lesson=lessons[0])
+    progress.completed_lessons.add(*lessons[:3])
+    progress.update_progress()
+    UserProgress.objects.create(user=learner, course=courses[1])
+
+    exercise = InteractiveExercise.objects.filter(lesson=lessons[1]).first()
+    UserExerciseAttempt.objects.create(user=learner, exercise=exercise, code_submission='git', score=2)
+    return {
+        'user': learner,
+        'course': course.pk,
+        'technology': course.technology_id,
+        'lesson': lessons[1].pk,
+        'exercise': exercise.pk,
+        'export': 'attempts',
+        'export_format': 'csv',
+    }
+
+
+def client_for(audience, dataset):
+    client = Client()
+    if audience == 'authenticated':
+        client.force_login(dataset['user'])
+    return client
+
+
+def measure(scenario, audience, dataset, client=None):
+    """Run a scenario once; return (response, captured queries, latency ms)."""
+    client = client or client_for(audience, dataset)
+    with CaptureQueriesContext(connection) as ctx:
+        start = time.perf_counter()
+        response = scenario.request(client, dataset)
+        elapsed = (time.perf_counter() - start) * 1000
+    return response, ctx.captured_queries, elapsed
+
+
+def run_benchmarks(dataset, repeat=20):
+    """Latency summary and query count for each (scenario, audience)."""
+    results = {}
+    for scenario in SCENARIOS:
+        for audience in AUDIENCES:
+            client = client_for(audience, dataset)
+            measure(scenario, audience, dataset, client)  # warm caches and lazy imports
+            latencies, queries = [], 0
+            for _ in range(repeat):
+                _, captured, elapsed = measure(scenario, audience, dataset, client)
+                latencies.append(elapsed)
+                queries = max(queries, len(captured))
+            results[f'{scenario.name}:{audience}'] = {**summarize(latencies), 'queries': queries}
+    return results
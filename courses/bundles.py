@@ -0,0 +1,284 @@
+"""
+Course content bundles: copy whole courses between environments.
+
+A bundle is one gzipped tar stream holding
+
+* ``manifest.json``: format version, the exported courses and row counts;
+* ``records.jsonl``: one ``{"m": model, "pk": id, "f": fields}`` line per
+  technology, workflow diagram, course, module, lesson, code example and
+  interactive exercise, parents before children;
+* ``media/<name>``: every media file the rows refer to (logos and images in
+  rich text).
+
+``export()`` reads each table with ``iterator(chunk_size=EXPORT_CHUNK_SIZE)``
+and spools the records to a temporary file (on disk past a few MB) so the tar
+member size is known. ``load()`` reads the stream member by member and upserts
+rows ``BUNDLE_IMPORT_BATCH_SIZE`` at a time: one query finds the existing rows
+for the batch by natural key (technology name, then parent and ``order``), an
+``INSERT ... ON CONFLICT DO UPDATE`` rewrites those and ``bulk_create`` inserts
+the rest. Source primary keys are remapped to the target's as the batches go,
+so only the id maps are kept in memory. Rows that exist in the target but not
+in the bundle are left alone.
+
+Bulk writes skip signals, so the import bumps the catalog version and
+recounts the site statistics itself once it commits.
+"""
+import io
+import json
+import re
+import tarfile
+import tempfile
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from . import images, site_stats
+from .catalog import bump_catalog_version
+from .models import CodeExample, Course, InteractiveExercise, Lesson, Module, Technology, WorkflowDiagram
+
+FORMAT = 'devoops-course-bundle'
+VERSION = 1
+MANIFEST = 'manifest.json'
+RECORDS = 'records.jsonl'
+MEDIA_PREFIX = 'media/'
+SPOOL_BYTES = 8 * 1024 * 1024
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.webp')
+
+
+class BundleError(Exception):
+    pass
+
+
+@dataclass
+class Table:
+    model: type
+    key: tuple
+    course: str
+    rich_text: tuple = ()
+    files: tuple = ()
+
+    @property
+    def label(self):
+        return self.model._meta.model_name
+
+    @property
+    def fields(self):
+        """Copied columns: everything but the id and automatic timestamps."""
+        return [
+            field.attname for field in self.model._meta.concrete_fields
+            if not field.primary_key and not getattr(field, 'auto_now', False) and not getattr(field, 'auto_now_add', False)
+        ]
+
+    @property
+    def parents(self):
+        """``{fk attname: parent model}``"""
+        return {
+            field.attname: field.related_model for field in self.model._meta.concrete_fields
+            if field.is_relation and field.attname in self.fields
+        }
+
+
+# Parents first, so their ids are remapped before any child refers to them.
+TABLES = [
+    Table(Technology, ('name',), 'course__id', files=('logo',)),
+    Table(WorkflowDiagram, ('technology_id', 'order'), 'technology__course__id'),
+    Table(Course, ('technology_id',), 'id'),
+    Table(Module, ('course_id', 'order'), 'course_id'),
+    Table(Lesson, ('module_id', 'order'), 'module__course_id', rich_text=('content',)),
+    Table(CodeExample, ('lesson_id', 'order'), 'lesson__module__course_id', rich_text=('explanation',)),
+    Table(InteractiveExercise, ('lesson_id', 'order'), 'lesson__module__course_id', rich_text=('instructions',)),
+]
+TABLES_BY_LABEL = {table.label: table for table in TABLES}
+
+
+def _media_pattern():
+    return re.compile(re.escape(settings.MEDIA_URL) + r'''([^"'\s<>()?#]+)''')
+
+
+def _add_member(tar, name, fileobj, size):
+    info = tarfile.TarInfo(name)
+    info.size = size
+    info.mtime = int(time.time())
+    tar.addfile(info, fileobj)
+
+
+def export(course_ids, output, chunk_size=None):
+    """Write a bundle of ``course_ids`` to the binary file object ``output``; returns the manifest."""
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    course_ids = list(course_ids)
+    pattern = _media_pattern()
+    media, counts = set(), {}
+
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES) as records:
+        for table in TABLES:
+            rows = (
+                table.model.objects.filter(**{f'{table.course}__in': course_ids})
+                .order_by('pk').values('pk', *table.fields).iterator(chunk_size=chunk_size)
+            )
+            count = 0
+            for row in rows:
+                pk = row.pop('pk')
+                for field in table.rich_text:
+                    media.update(pattern.findall(row[field] or ''))
+                for field in table.files:
+                    if row[field]:
+                        media.add(row[field])
+                record = {'m': table.label, 'pk': pk, 'f': row}
+                if table.model is Course:
+                    record['prerequisites'] = list(
+                        Course.prerequisites.through.objects.filter(from_course_id=pk)
+                        .values_list('to_course__technology__name', flat=True)
+                    )
+                records.write(json.dumps(record, cls=DjangoJSONEncoder).encode() + b'\n')
+                count += 1
+            counts[table.label] = count
+
+        media = sorted(name for name in media if default_storage.exists(name))
+        manifest = {
+            'format': FORMAT,
+            'version': VERSION,
+            'exported_at': time.time(),
+            'courses': list(Course.objects.filter(id__in=course_ids).values_list('title', flat=True)),
+            'counts': counts,
+            'media': media,
+        }
+        payload = json.dumps(manifest, indent=2).encode()
+
+        with tarfile.open(fileobj=output, mode='w|gz') as tar:
+            _add_member(tar, MANIFEST, io.BytesIO(payload), len(payload))
+            size = records.tell()
+            records.seek(0)
+            _add_member(tar, RECORDS, records, size)
+            for name in media:
+                with default_storage.open(name, 'rb') as source:
+                    _add_member(tar, MEDIA_PREFIX + name, source, default_storage.size(name))
+    return manifest
+
+
+class _Importer:
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.pk_maps = defaultdict(dict)
+        self.claimed = defaultdict(set)
+        self.created = defaultdict(int)
+        self.updated = defaultdict(int)
+        self.prerequisites = {}
+        self.pending = []
+        self.pending_table = None
+
+    def add(self, record):
+        table = TABLES_BY_LABEL.get(record.get('m'))
+        if table is None:
+            raise BundleError(f'Unknown record type {record.get("m")!r}')
+        if table is not self.pending_table:
+            self.flush()
+            self.pending_table = table
+        self.pending.append(record)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.upsert(self.pending_table, self.pending)
+        self.pending = []
+
+    def upsert(self, table, records):
+        fields = table.fields
+        for record in records:
+            values = record['f']
+            for attname, parent in table.parents.items():
+                if values[attname] is not None:
+                    try:
+                        values[attname] = self.pk_maps[parent][values[attname]]
+                    except KeyError:
+                        raise BundleError(f'{table.label} {record["pk"]} refers to a {parent._meta.model_name} not in the bundle')
+
+        keys = [tuple(record['f'][k] for k in table.key) for record in records]
+        # Keys need not be unique (several examples at order 0); match them up in id order.
+        existing = defaultdict(list)
+        for pk, *key in (
+            table.model.objects.filter(**{f'{table.key[0]}__in': {key[0] for key in keys}})
+            .order_by('pk').values_list('pk', *table.key)
+        ):
+            if pk not in self.claimed[table.model]:
+                existing[tuple(key)].append(pk)
+
+        to_update, to_create, created_for = [], [], []
+        for record, key in zip(records, keys):
+            pk = existing[key].pop(0) if existing[key] else None
+            if pk is None:
+                to_create.append(table.model(**record['f']))
+                created_for.append(record)
+            else:
+                to_update.append(table.model(pk=pk, **record['f']))
+                self.pk_maps[table.model][record['pk']] = pk
+            if table.model is Course:
+                self.prerequisites[record['pk']] = record.get('prerequisites', [])
+
+        # An INSERT ... ON CONFLICT (id) DO UPDATE is far cheaper than bulk_update's CASE per column.
+        table.model.objects.bulk_create(
+            to_update, batch_size=self.batch_size, update_conflicts=True, unique_fields=['pk'], update_fields=fields,
+        )
+        table.model.objects.bulk_create(to_create, batch_size=self.batch_size)
+        for record, instance in zip(created_for, to_create):
+            self.pk_maps[table.model][record['pk']] = instance.pk
+        self.claimed[table.model].update(self.pk_maps[table.model][record['pk']] for record in records)
+        self.created[table.label] += len(to_create)
+        self.updated[table.label] += len(to_update)
+
+    def link_prerequisites(self):
+        through = Course.prerequisites.through
+        course_pks = [self.pk_maps[Course][pk] for pk in self.prerequisites]
+        names = {name for required in self.prerequisites.values() for name in required}
+        by_name = dict(Course.objects.filter(technology__name__in=names).values_list('technology__name', 'pk'))
+        through.objects.filter(from_course_id__in=course_pks).delete()
+        through.objects.bulk_create([
+            through(from_course_id=self.pk_maps[Course][pk], to_course_id=by_name[name])
+            for pk, required in self.prerequisites.items() for name in required if name in by_name
+        ], batch_size=self.batch_size)
+
+
+def load(fileobj, batch_size=None):
+    """Import a bundle from the binary file object ``fileobj``; returns ``(manifest, created, updated, media)``."""
+    importer = _Importer(batch_size or settings.BUNDLE_IMPORT_BATCH_SIZE)
+    manifest, media = None, []
+    with transaction.atomic(), tarfile.open(fileobj=fileobj, mode='r|gz') as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+            if member.name == MANIFEST:
+                try:
+                    manifest = json.load(tar.extractfile(member))
+                except ValueError:
+                    raise BundleError(f'Unreadable {MANIFEST}')
+                if not isinstance(manifest, dict) or manifest.get('format') != FORMAT or manifest.get('version') != VERSION:
+                    raise BundleError(f'Not a version {VERSION} course bundle')
+            elif manifest is None:
+                raise BundleError(f'{MANIFEST} must come first')
+            elif member.name == RECORDS:
+                for line in tar.extractfile(member):
+                    importer.add(json.loads(line))
+                importer.flush()
+                importer.link_prerequisites()
+            elif member.name.startswith(MEDIA_PREFIX):
+                name = member.name[len(MEDIA_PREFIX):]
+                if name not in manifest['media']:
+                    raise BundleError(f'Unexpected media file {name!r}')
+                if not default_storage.exists(name):
+                    default_storage.save(name, File(tar.extractfile(member), name=name))
+                    media.append(name)
+        if manifest is None:
+            raise BundleError('Empty bundle')
+
+        transaction.on_commit(bump_catalog_version)
+        transaction.on_commit(site_stats.reconcile)
+        for name in media:
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                images.schedule(name)
+    return manifest, dict(importer.created), dict(importer.updated), media
@@ -0,0 +1,64 @@
+"""
+Catalog version: one number that changes whenever course content changes.
+
+Anything derived from the catalog alone (the prerequisite graph, rendered
+fragments, anonymous pages) is cached under a key that includes
+``catalog_version()``, so a single bump retires every entry at once instead of
+tracking individual keys. The version lives in the "catalog" cache and is
+bumped after commit by the signal handlers below; code that bypasses signals
+(``bulk_create``, ``QuerySet.update``, raw SQL) must call
+``bump_catalog_version()`` itself.
+"""
+import time
+
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .models import CodeExample, Course, InteractiveExercise, Lesson, Module, Technology, WorkflowDiagram
+
+VERSION_KEY = 'catalog:version'
+CATALOG_MODELS = (Technology, Course, Module, Lesson, CodeExample, InteractiveExercise, WorkflowDiagram)
+
+
+def catalog_version():
+    cache = caches['catalog']
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # A lost version (eviction, cache flush) must not resurrect old entries,
+        # so start from the clock rather than from zero.
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    caches['catalog'].set(VERSION_KEY, time.time_ns(), None)
+
+
+def lesson_course_ids():
+    """``{lesson id: course id}`` for every lesson, cached per catalog version."""
+    key = f'lessons:courses:{catalog_version()}'
+    mapping = caches['catalog'].get(key)
+    if mapping is None:
+        mapping = dict(Lesson.objects.values_list('id', 'module__course_id'))
+        caches['catalog'].set(key, mapping)
+    return mapping
+
+
+def _bump_on_commit(sender, **kwargs):
+    # Bumping before commit would let a concurrent reader cache the old rows
+    # under the new version.
+    transaction.on_commit(bump_catalog_version)
+
+
+for model in CATALOG_MODELS:
+    post_save.connect(_bump_on_commit, sender=model, dispatch_uid=f'catalog_version_save_{model.__name__}')
+    post_delete.connect(_bump_on_commit, sender=model, dispatch_uid=f'catalog_version_delete_{model.__name__}')
+
+
+@receiver(m2m_changed, sender=Course.prerequisites.through, dispatch_uid='catalog_version_prerequisites')
+def _prerequisites_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        _bump_on_commit(sender)
@@ -0,0 +1,72 @@
+"""
+Conditional GET (ETag / Last-Modified) for catalog and lesson pages.
+
+``ConditionalPageMixin`` works out a page's validators before the view does
+any work, from data that is already cached:
+
+* the catalog version;
+* for signed-in learners, their id, progress version and CSRF cookie (so a
+  cached page never carries a stale form token);
+* ``RELEASE_VERSION``, so new templates never match old ETags.
+
+A matching ``If-None-Match`` / ``If-Modified-Since`` gets a bare 304 without
+touching the database for the page itself. Otherwise the rendered page carries
+the ETag and ``Last-Modified``. Versions are the nanosecond clock at the time of
+the bump, so the newer one doubles as the modification time. Authenticated
+responses are ``private``, and all of them must be revalidated (``no-cache``).
+"""
+import hashlib
+
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .analytics import progress_version
+from .catalog import catalog_version
+
+
+def page_validators(request):
+    """``(etag, last-modified timestamp)`` for the current learner's view of the catalog."""
+    versions = [catalog_version()]
+    parts = [settings.RELEASE_VERSION, str(versions[0])]
+    if request.user.is_authenticated:
+        versions.append(progress_version(request.user.pk))
+        parts += [
+            str(request.user.pk),
+            str(versions[1]),
+            request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+        ]
+    etag = '"%s"' % hashlib.md5(':'.join(parts).encode()).hexdigest()
+    return etag, max(versions) // 1_000_000_000
+
+
+class ConditionalPageMixin:
+    """Answer GET/HEAD with 304 when the client's copy is still current."""
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return super().dispatch(request, *args, **kwargs)
+
+        etag, last_modified = page_validators(request)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is not None:
+            if response.status_code == 304:
+                self.not_modified(request, *args, **kwargs)
+            return self._add_validators(request, response, etag, last_modified)
+
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code == 200:
+            self._add_validators(request, response, etag, last_modified)
+        return response
+
+    def not_modified(self, request, *args, **kwargs):
+        """Hook for side effects a full render would have had (a 304 skips the view)."""
+
+    def _add_validators(self, request, response, etag, last_modified):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        if request.user.is_authenticated:
+            patch_cache_control(response, no_cache=True, private=True)
+        else:
+            patch_cache_control(response, no_cache=True)
+        return response
@@ -0,0 +1,183 @@
+"""
+Streaming exports of learner data for staff and the reporting team.
+
+Each dataset is a ``values_list`` query read with ``iterator(chunk_size=...)``,
+so rows are fetched and encoded a chunk at a time and memory stays flat however
+large the table is. ``stream()`` yields CSV or JSON Lines bytes in batches of
+about ``EXPORT_BUFFER_BYTES``, optionally gzip-compressed on the fly. The HTTP
+endpoint and ``python manage.py export_learning_data`` share it.
+
+Django drains a synchronous streaming body into a list before sending it under
+ASGI (``SERVER_PROFILE=asgi``). So the endpoint serves ASGI requests from
+``astream()``, which pulls one batch at a time from ``stream()`` in a worker
+thread.
+
+Filters: ``course`` (id), ``since`` / ``until`` (dates, inclusive; applied to
+each dataset's own timestamp) and ``cohort`` (the learners' sign-up month,
+``YYYY-MM``).
+"""
+import contextvars
+import csv
+import json
+import zlib
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+
+from devoops_lms.routers import use_replica
+from users.models import UserProgress
+
+from .models import LearningEvent, UserExerciseAttempt
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson',
+}
+
+
+@dataclass
+class Dataset:
+    model: type
+    columns: tuple
+    timestamp: str
+    course: str
+    user: str = 'user'
+    order_by: str = 'pk'
+
+    def queryset(self, filters):
+        queryset = self.model.objects.all()
+        if filters.get('course'):
+            queryset = queryset.filter(**{self.course: filters['course']})
+        if filters.get('since'):
+            queryset = queryset.filter(**{f'{self.timestamp}__gte': _start_of(filters['since'])})
+        if filters.get('until'):
+            queryset = queryset.filter(**{f'{self.timestamp}__lt': _start_of(filters['until'] + timedelta(days=1))})
+        if filters.get('cohort'):
+            year, month = filters['cohort']
+            queryset = queryset.filter(**{
+                f'{self.user}__date_joined__year': year,
+                f'{self.user}__date_joined__month': month,
+            })
+        return queryset.order_by(self.order_by).values_list(*self.columns)
+
+
+DATASETS = {
+    'progress': Dataset(
+        UserProgress,
+        columns=('id', 'user_id', 'user__username', 'course_id', 'progress_percentage',
+                 'started_at', 'updated_at', 'last_accessed_lesson_id'),
+        timestamp='updated_at',
+        course='course',
+    ),
+    # Completion rows have no timestamp of their own; dates filter on the progress record.
+    'completed_lessons': Dataset(
+        UserProgress.completed_lessons.through,
+        columns=('userprogress__user_id', 'userprogress__course_id', 'lesson_id', 'lesson__title'),
+        timestamp='userprogress__updated_at',
+        course='userprogress__course',
+        user='userprogress__user',
+    ),
+    'attempts': Dataset(
+        UserExerciseAttempt,
+        columns=('id', 'user_id', 'user__username', 'exercise_id', 'exercise__lesson__module__course_id',
+                 'is_correct', 'score', 'attempted_at', 'completed_at'),
+        timestamp='attempted_at',
+        course='exercise__lesson__module__course',
+    ),
+    'learning_events': Dataset(
+        LearningEvent,
+        columns=('id', 'occurred_at', 'user_id', 'kind', 'object_id', 'course_id'),
+        timestamp='occurred_at',
+        course='course_id',
+    ),
+}
+
+
+def _start_of(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def parse_filters(course=None, since=None, until=None, cohort=None):
+    """Validate raw filter strings; raises ValueError with a readable message."""
+    filters = {}
+    if course:
+        filters['course'] = int(course)
+    for name, value in (('since', since), ('until', until)):
+        if value:
+            filters[name] = date.fromisoformat(value)
+    if cohort:
+        year, _, month = cohort.partition('-')
+        if not (year.isdigit() and month.isdigit() and 1 <= int(month) <= 12):
+            raise ValueError(f'cohort must look like 2026-01, not {cohort!r}')
+        filters['cohort'] = (int(year), int(month))
+    return filters
+
+
+class _Line:
+    """File-like target for csv.writer that hands back each encoded row."""
+
+    def write(self, value):
+        return value
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _lines(dataset, fmt, filters, chunk_size):
+    rows = dataset.queryset(filters).iterator(chunk_size=chunk_size)
+    if fmt == 'csv':
+        writer = csv.writer(_Line())
+        yield writer.writerow(dataset.columns)
+        for row in rows:
+            yield writer.writerow(row)
+    else:
+        for row in rows:
+            yield json.dumps(dict(zip(dataset.columns, map(_encode, row)))) + '\n'
+
+
+def stream(name, fmt='csv', filters=None, compress=False, chunk_size=None):
+    """Yield the export as bytes, in batches, optionally gzip-compressed."""
+    dataset = DATASETS[name]
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    gzip = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    # Iteration happens after the view returns, so the replica scope is set here.
+    with use_replica():
+        buffer, size = [], 0
+        for line in _lines(dataset, fmt, filters or {}, chunk_size):
+            buffer.append(line)
+            size += len(line)
+            if size >= settings.EXPORT_BUFFER_BYTES:
+                data = ''.join(buffer).encode()
+                buffer, size = [], 0
+                data = gzip.compress(data) if gzip else data
+                if data:
+                    yield data
+        data = ''.join(buffer).encode()
+        if gzip:
+            data = gzip.compress(data) + gzip.flush()
+        if data:
+            yield data
+
+
+async def astream(name, fmt='csv', filters=None, compress=False, chunk_size=None):
+    """``stream()`` as an async iterator, one batch per hop to the worker thread."""
+    batches = stream(name, fmt, filters, compress, chunk_size)
+    # Every step runs in one context, so the replica scope set inside stream() can be reset there.
+    context = contextvars.copy_context()
+    step = sync_to_async(context.run)
+    try:
+        while (data := await step(next, batches, None)) is not None:
+            yield data
+    finally:
+        await step(batches.close)
+
+
+def filename(name, fmt, compress=False):
+    stamp = timezone.localdate().isoformat()
+    return f'{name}-{stamp}.{fmt}' + ('.gz' if compress else '')
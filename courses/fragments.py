@@ -0,0 +1,54 @@
+"""
+Versioned template fragment cache.
+
+``{% fragment "name" [user=...] [vary_on ...] %}...{% endfragment %}`` (after
+``{% load fragments %}``) caches the rendered block in the "fragments" cache
+under ``fragment_key()``: the fragment name, the catalog version and, for a
+signed-in ``user``, their id and progress version. Catalog edits and the
+learner's own progress or exercise attempts therefore retire stale fragments
+without explicit invalidation; the timeout only bounds how long unused entries
+are kept.
+
+Lazy querysets in the context are evaluated inside the block, so a hit skips
+their queries as well as the rendering. Hits, misses and render time per
+fragment name are aggregated with the request metrics and printed by
+``python manage.py request_metrics``.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from devoops_lms.instrumentation import recorder
+
+from .analytics import progress_version
+from .catalog import catalog_version
+
+
+def fragment_key(name, user=None, vary_on=()):
+    parts = ['fragment', name, str(catalog_version())]
+    if user is not None and user.is_authenticated:
+        parts += [str(user.pk), str(progress_version(user.pk))]
+    if vary_on:
+        parts.append(hashlib.md5(':'.join(str(value) for value in vary_on).encode()).hexdigest())
+    return ':'.join(parts)
+
+
+def get_or_render(name, render, user=None, vary_on=()):
+    """Cached output of ``render()``, rendering and storing it on a miss."""
+    if not settings.FRAGMENT_CACHE_ENABLED:
+        return render()
+    cache = caches['fragments']
+    key = fragment_key(name, user, vary_on)
+    html = cache.get(key)
+    if html is not None:
+        recorder.record_fragment(name, hit=True)
+        return html
+
+    started = time.perf_counter()
+    html = render()
+    render_ms = (time.perf_counter() - started) * 1000
+    cache.set(key, html, settings.FRAGMENT_CACHE_SECONDS)
+    recorder.record_fragment(name, hit=False, render_ms=render_ms)
+    return html
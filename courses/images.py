@@ -0,0 +1,227 @@
+"""
+Responsive image derivatives.
+
+Technology logos, profile pictures and CKEditor uploads are resized to each of
+``IMAGE_DERIVATIVE_WIDTHS`` narrower than the original and encoded in every
+format of ``IMAGE_DERIVATIVE_FORMATS`` that Pillow supports. Derivatives are
+content-addressed: they are stored under ``derived/<sha256 of the original>/``,
+so the same screenshot uploaded twice is only encoded once. A
+``ResponsiveImage`` row maps the original's storage name to that digest.
+
+Uploads call ``schedule()``, which hands the work to a per-process thread pool
+of ``IMAGE_WORKERS`` after the upload's transaction commits (inline when it is
+0). ``python manage.py image_derivatives`` backfills existing files.
+
+Templates use ``{% load images %}``: ``{{ image|srcset:"webp" }}`` for one
+image and ``{{ html|responsive_images }}`` to turn ``<img>`` tags in rich text
+into ``<picture>`` elements. Images without derivatives yet are left as they
+are.
+"""
+import hashlib
+import html
+import io
+import json
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.db.models.signals import post_init, post_save
+from PIL import Image, ImageOps, features
+
+from devoops_lms.media import ContentAddressedStorage
+
+from .models import ResponsiveImage, Technology
+
+logger = logging.getLogger(__name__)
+
+DERIVED_PREFIX = 'derived'
+CACHE_PREFIX = 'image:'
+MIME_TYPES = {'avif': 'image/avif', 'webp': 'image/webp'}
+IMG_TAG = re.compile(r'<img\b[^>]*>', re.IGNORECASE)
+SRC_ATTR = re.compile(r'\ssrc\s*=\s*"([^"]+)"', re.IGNORECASE)
+
+_executor = None
+
+
+def file_digest(fileobj, chunk_size=64 * 1024):
+    """SHA-256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: fileobj.read(chunk_size), b''):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def derivative_name(digest, width, fmt):
+    return f'{DERIVED_PREFIX}/{digest[:2]}/{digest}/{width}.{fmt}'
+
+
+def _manifest_name(digest):
+    return f'{DERIVED_PREFIX}/{digest[:2]}/{digest}/manifest.json'
+
+
+def _formats():
+    return [fmt for fmt in settings.IMAGE_DERIVATIVE_FORMATS if features.check(fmt)]
+
+
+def _encode(image, fmt):
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt.upper(), quality=settings.IMAGE_DERIVATIVE_QUALITY[fmt])
+    return buffer.getvalue()
+
+
+def _render(digest, source):
+    """Write every derivative of ``source`` under ``digest``; returns the manifest."""
+    with Image.open(source) as original:
+        image = ImageOps.exif_transpose(original)
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+    widths = [width for width in settings.IMAGE_DERIVATIVE_WIDTHS if width < image.width] or [image.width]
+    formats = _formats()
+    for width in widths:
+        resized = image if width == image.width else image.resize(
+            (width, max(1, round(image.height * width / image.width))), Image.Resampling.LANCZOS,
+        )
+        for fmt in formats:
+            name = derivative_name(digest, width, fmt)
+            if not default_storage.exists(name):
+                default_storage.save(name, ContentFile(_encode(resized, fmt)))
+    manifest = {'width': image.width, 'height': image.height, 'widths': widths, 'formats': formats}
+    # Written last: its presence means the digest's derivatives are complete.
+    default_storage.save(_manifest_name(digest), ContentFile(json.dumps(manifest).encode()))
+    return manifest
+
+
+def generate(name):
+    """Derivatives for the stored file ``name``, reusing them if its content was seen before."""
+    with default_storage.open(name, 'rb') as source:
+        digest = file_digest(source)
+        manifest_name = _manifest_name(digest)
+        if default_storage.exists(manifest_name):
+            with default_storage.open(manifest_name, 'rb') as existing:
+                manifest = json.load(existing)
+        else:
+            source.seek(0)
+            manifest = _render(digest, source)
+    image, _ = ResponsiveImage.objects.update_or_create(name=name, defaults={'digest': digest, **manifest})
+    caches['default'].delete(CACHE_PREFIX + name)
+    return image
+
+
+def _generate_logged(name):
+    try:
+        generate(name)
+    except Exception:
+        logger.exception('Could not generate derivatives for %s', name)
+    finally:
+        close_old_connections()
+
+
+def schedule(name):
+    """Generate derivatives for ``name`` in the background once the upload has committed."""
+    global _executor
+    if not name:
+        return
+    if not settings.IMAGE_WORKERS:
+        transaction.on_commit(lambda: _generate_logged(name))
+        return
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.IMAGE_WORKERS, thread_name_prefix='image-derivatives')
+    transaction.on_commit(lambda: _executor.submit(_generate_logged, name))
+
+
+def lookup(names):
+    """``{name: ResponsiveImage}`` for those of ``names`` that have derivatives."""
+    names = set(names)
+    if not names:
+        return {}
+    cache = caches['default']
+    found = {key[len(CACHE_PREFIX):]: image for key, image in cache.get_many([CACHE_PREFIX + n for n in names]).items()}
+    missing = names - found.keys()
+    if missing:
+        fetched = {image.name: image for image in ResponsiveImage.objects.filter(name__in=missing)}
+        cache.set_many({CACHE_PREFIX + name: image for name, image in fetched.items()}, settings.IMAGE_LOOKUP_CACHE_SECONDS)
+        found.update(fetched)
+    return found
+
+
+def srcset(image, fmt):
+    """``"url 320w, url 640w"`` for one format of a ``ResponsiveImage``."""
+    if fmt not in image.formats:
+        return ''
+    return ', '.join(f'{default_storage.url(derivative_name(image.digest, width, fmt))} {width}w' for width in image.widths)
+
+
+def picture(img_tag, image, sizes):
+    """Wrap an ``<img>`` tag in a ``<picture>`` offering the derivatives."""
+    sources = ''.join(
+        f'<source type="{MIME_TYPES[fmt]}" srcset="{srcset(image, fmt)}" sizes="{html.escape(sizes)}">'
+        for fmt in image.formats
+    )
+    extra = ''
+    if not re.search(r'\swidth\s*=', img_tag, re.IGNORECASE):
+        extra += f' width="{image.width}" height="{image.height}"'
+    if not re.search(r'\sloading\s*=', img_tag, re.IGNORECASE):
+        extra += ' loading="lazy" decoding="async"'
+    return f'<picture>{sources}{img_tag[:-1].rstrip("/").rstrip()}{extra}></picture>'
+
+
+def _media_name(src):
+    src = html.unescape(src)
+    return unquote(src[len(settings.MEDIA_URL):]) if src.startswith(settings.MEDIA_URL) else None
+
+
+def rewrite_html(content, sizes=None):
+    """Rich text with each uploaded ``<img>`` turned into a responsive ``<picture>``."""
+    tags = {}
+    for tag in IMG_TAG.findall(content):
+        match = SRC_ATTR.search(tag)
+        name = _media_name(match.group(1)) if match else None
+        if name:
+            tags[tag] = name
+    images = lookup(tags.values())
+    if not images:
+        return content
+    sizes = sizes or settings.IMAGE_CONTENT_SIZES
+    return IMG_TAG.sub(
+        lambda m: picture(m.group(0), images[tags[m.group(0)]], sizes) if tags.get(m.group(0)) in images else m.group(0),
+        content,
+    )
+
+
+class EditorUploadStorage(ContentAddressedStorage):
+    """CKEditor upload storage: deduplicated blobs, with derivatives scheduled for each upload."""
+
+    def save(self, name, content, max_length=None):
+        name = super().save(name, content, max_length)
+        schedule(settings.MEDIA_BLOB_PATH + name)
+        return name
+
+
+IMAGE_FIELDS = {Technology: 'logo', get_user_model(): 'profile_picture'}
+
+
+def _remember_image(sender, instance, **kwargs):
+    field = IMAGE_FIELDS[sender]
+    # None when the field was deferred; the next save then schedules it again.
+    instance._image_name = getattr(instance, field).name if field in instance.__dict__ else None
+
+
+def _image_saved(sender, instance, **kwargs):
+    field = IMAGE_FIELDS[sender]
+    if field not in instance.__dict__:
+        return
+    name = getattr(instance, field).name
+    if name and name != instance._image_name:
+        schedule(name)
+    instance._image_name = name
+
+
+for _model in IMAGE_FIELDS:
+    post_init.connect(_remember_image, sender=_model, dispatch_uid=f'images_init_{_model.__name__}')
+    post_save.connect(_image_saved, sender=_model, dispatch_uid=f'images_save_{_model.__name__}')
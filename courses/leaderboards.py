@@ -0,0 +1,181 @@
+"""
+Leaderboards maintained incrementally as exercise attempts are scored.
+
+A learner's score is the sum of their current ``UserExerciseAttempt.score``.
+Each save or delete of an attempt applies the change in score to the global,
+course and phase scopes in one upsert. ``LeaderboardEntry`` rows are indexed on
+``(scope, period, -score, user)``, so a top-N page is an index range read and a
+rank is one index lookup plus a count of the entries above it. No request ever
+aggregates the attempts table.
+
+Every scope also has a weekly period keyed by ISO week. Weekly boards count
+points gained that week (drops in score are ignored), start empty on Monday,
+and weeks older than ``LEADERBOARD_KEEP_WEEKS`` are deleted by the first write
+of a new week. ``python manage.py leaderboards --rebuild`` recomputes the
+all-time boards from the attempts.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .catalog import catalog_version
+from .models import InteractiveExercise, LeaderboardEntry, UserExerciseAttempt
+
+GLOBAL = 'global'
+ALL_TIME = 'all'
+WEEK = 'week'
+
+
+def course_scope(course_id):
+    return f'course:{course_id}'
+
+
+def phase_scope(phase):
+    return f'phase:{phase}'
+
+
+def week_period(when=None):
+    year, week, _ = timezone.localdate(when).isocalendar()
+    return f'{year}-W{week:02d}'
+
+
+def resolve_period(period):
+    """Map the public 'all' / 'week' choice to a stored period."""
+    return week_period() if period == WEEK else ALL_TIME
+
+
+def exercise_scopes(exercise_id):
+    """The scopes an exercise scores in, cached per catalog version."""
+    cache = caches['catalog']
+    key = f'leaderboards:scopes:{catalog_version()}:{exercise_id}'
+    scopes = cache.get(key)
+    if scopes is None:
+        course_id, phase = InteractiveExercise.objects.filter(pk=exercise_id).values_list(
+            'lesson__module__course_id', 'lesson__module__course__technology__phase'
+        ).get()
+        scopes = [GLOBAL, course_scope(course_id), phase_scope(phase)]
+        cache.set(key, scopes)
+    return scopes
+
+
+def add_points(user_id, exercise_id, delta):
+    """Apply a change in one attempt's score to every board it counts towards."""
+    if not delta:
+        return
+    scopes = exercise_scopes(exercise_id)
+    rows = [(scope, ALL_TIME, delta) for scope in scopes]
+    if delta > 0:
+        week = week_period()
+        rows += [(scope, week, delta) for scope in scopes]
+        _roll_over(week)
+    _upsert(user_id, rows)
+
+
+def _upsert(user_id, rows):
+    table = connection.ops.quote_name(LeaderboardEntry._meta.db_table)
+    now = timezone.now()
+    values = ', '.join(['(%s, %s, %s, %s, %s)'] * len(rows))
+    params = [value for scope, period, delta in rows for value in (scope, period, user_id, delta, now)]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} (scope, period, user_id, score, updated_at) VALUES {values} '
+            f'ON CONFLICT (scope, period, user_id) DO UPDATE '
+            f'SET score = {table}.score + excluded.score, updated_at = excluded.updated_at',
+            params,
+        )
+
+
+def _roll_over(week):
+    """Once per week (across processes): drop weekly boards past retention."""
+    if not caches['default'].add(f'leaderboards:rollover:{week}', True, 8 * 86400):
+        return
+    keep = {week_period(timezone.now() - timedelta(weeks=weeks)) for weeks in range(settings.LEADERBOARD_KEEP_WEEKS)}
+    LeaderboardEntry.objects.exclude(period=ALL_TIME).exclude(period__in=keep).delete()
+
+
+@receiver(post_init, sender=UserExerciseAttempt, dispatch_uid='leaderboards_init')
+def _remember_score(sender, instance, **kwargs):
+    # None when the score was deferred; that save cannot be applied incrementally.
+    instance._leaderboard_score = instance.__dict__.get('score') if instance.pk else 0
+
+
+@receiver(post_save, sender=UserExerciseAttempt, dispatch_uid='leaderboards_save')
+def _attempt_saved(sender, instance, **kwargs):
+    previous, instance._leaderboard_score = instance._leaderboard_score, instance.score
+    if previous is not None:
+        add_points(instance.user_id, instance.exercise_id, instance.score - previous)
+
+
+@receiver(post_delete, sender=UserExerciseAttempt, dispatch_uid='leaderboards_delete')
+def _attempt_deleted(sender, instance, **kwargs):
+    if instance._leaderboard_score is not None:
+        add_points(instance.user_id, instance.exercise_id, -instance._leaderboard_score)
+
+
+def _with_ranks(entries, first_rank=1, previous=None):
+    """Competition ranking (1, 2, 2, 4) over entries sorted by score."""
+    ranked = []
+    for position, entry in enumerate(entries):
+        if previous is None or entry['score'] != previous['score']:
+            rank = first_rank + position
+        ranked.append({**entry, 'rank': rank})
+        previous = entry
+    return ranked
+
+
+def top(scope=GLOBAL, period=ALL_TIME, limit=10, cached=True):
+    """The ``limit`` best learners, cached for LEADERBOARD_CACHE_SECONDS."""
+    cache = caches['default']
+    key = f'leaderboards:top:{scope}:{period}:{limit}'
+    entries = cache.get(key) if cached else None
+    if entries is None:
+        entries = _with_ranks(
+            LeaderboardEntry.objects.filter(scope=scope, period=period, score__gt=0)
+            .order_by('-score', 'user_id')
+            .values('user_id', 'user__username', 'score')[:limit]
+        )
+        cache.set(key, entries, settings.LEADERBOARD_CACHE_SECONDS)
+    return entries
+
+
+def rank(user_id, scope=GLOBAL, period=ALL_TIME):
+    """``{'rank', 'score', 'total'}`` for one learner, or None before they score."""
+    entries = LeaderboardEntry.objects.filter(scope=scope, period=period, score__gt=0)
+    score = entries.filter(user_id=user_id).values_list('score', flat=True).first()
+    if score is None:
+        return None
+    counts = entries.aggregate(above=Count('id', filter=Q(score__gt=score)), total=Count('id'))
+    return {'rank': counts['above'] + 1, 'score': score, 'total': counts['total']}
+
+
+@transaction.atomic
+def rebuild():
+    """Recompute every all-time board from the attempts; returns the row count."""
+    totals = [
+        (GLOBAL, UserExerciseAttempt.objects.values('user_id').annotate(total=Sum('score')), None),
+        ('course', UserExerciseAttempt.objects.values('user_id', 'exercise__lesson__module__course_id')
+         .annotate(total=Sum('score')), 'exercise__lesson__module__course_id'),
+        ('phase', UserExerciseAttempt.objects.values('user_id', 'exercise__lesson__module__course__technology__phase')
+         .annotate(total=Sum('score')), 'exercise__lesson__module__course__technology__phase'),
+    ]
+    LeaderboardEntry.objects.filter(period=ALL_TIME).delete()
+    created = 0
+    for kind, rows, field in totals:
+        created += len(LeaderboardEntry.objects.bulk_create(
+            (
+                LeaderboardEntry(
+                    scope=kind if field is None else f'{kind}:{row[field]}',
+                    period=ALL_TIME, user_id=row['user_id'], score=row['total'],
+                )
+                for row in rows.iterator()
+                if row['total']
+            ),
+            batch_size=1000,
+        ))
+    return created
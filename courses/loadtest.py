@@ -0,0 +1,336 @@
+"""
+Asyncio load generator that replays learner journeys against a running server.
+
+Only the standard library is used: ``HTTPSession`` is a minimal keep-alive
+HTTP/1.1 client with a cookie jar, enough to log in through allauth and
+drive the LMS the way a browser would. ``python manage.py loadtest`` wires it
+up; see that command for options.
+"""
+import asyncio
+import json
+import random
+import re
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from urllib.parse import urlencode, urlsplit
+
+from devoops_lms.metrics import summarize
+
+CSRF_INPUT_RE = re.compile(rb'name="csrfmiddlewaretoken" value="([^"]+)"')
+AUTOCOMPLETE_TERMS = ['docker', 'kubernetes', 'terraform', 'jenkins', 'git', 'prometheus']
+# Relative weights of the JSON endpoints in run_endpoint_load(): bursty
+# autocomplete first, then progress polling and grading.
+ENDPOINT_MIX = (('search_suggestions', 5), ('get_course_progress', 2), ('submit_quiz_answer', 2),
+                ('validate_exercise', 1))
+# A learner whose login keeps failing waits LOGIN_BACKOFF_SECONDS, doubling up to
+# LOGIN_BACKOFF_MAX_SECONDS, and gives up after MAX_LOGIN_FAILURES in a row.
+LOGIN_BACKOFF_SECONDS = 1.0
+LOGIN_BACKOFF_MAX_SECONDS = 30.0
+MAX_LOGIN_FAILURES = 5
+
+
+class LoginFailed(Exception):
+    pass
+
+
+class HTTPSession:
+    """One virtual browser: a persistent connection plus cookies."""
+
+    def __init__(self, base_url, timeout=30.0):
+        parts = urlsplit(base_url)
+        if parts.scheme != 'http':
+            raise ValueError('Only plain http:// targets are supported')
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self.cookies = {}
+        self._reader = self._writer = None
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except OSError:
+                pass
+        self._reader = self._writer = None
+
+    async def request(self, method, path, body=b'', headers=None):
+        """Send one request; return (status, headers, body). Retries once on a stale connection."""
+        for attempt in (1, 2):
+            if self._writer is None:
+                self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+            try:
+                return await asyncio.wait_for(self._exchange(method, path, body, headers or {}), self.timeout)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                await self.close()
+                if attempt == 2:
+                    raise
+            except Exception:
+                await self.close()
+                raise
+
+    async def _exchange(self, method, path, body, headers):
+        lines = [
+            f'{method} {path} HTTP/1.1',
+            f'Host: {self.host}:{self.port}',
+            'Connection: keep-alive',
+            'Accept-Encoding: identity',
+            f'Content-Length: {len(body)}',
+        ]
+        if self.cookies:
+            lines.append('Cookie: ' + '; '.join(f'{name}={value}' for name, value in self.cookies.items()))
+        lines.extend(f'{name}: {value}' for name, value in headers.items())
+        self._writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+        await self._writer.drain()
+
+        status_line = await self._reader.readuntil(b'\r\n')
+        status = int(status_line.split()[1])
+        response_headers = {}
+        while True:
+            line = await self._reader.readuntil(b'\r\n')
+            if line == b'\r\n':
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            name, value = name.strip().lower(), value.strip()
+            if name == 'set-cookie':
+                cookie_name, _, cookie_value = value.split(';', 1)[0].partition('=')
+                self.cookies[cookie_name.strip()] = cookie_value.strip()
+            else:
+                response_headers[name] = value
+
+        if method == 'HEAD' or status in (204, 304):
+            payload = b''
+        elif response_headers.get('transfer-encoding', '').lower() == 'chunked':
+            payload = await self._read_chunked()
+        elif 'content-length' in response_headers:
+            payload = await self._reader.readexactly(int(response_headers['content-length']))
+        else:
+            payload = await self._reader.read()
+            response_headers['connection'] = 'close'
+
+        if response_headers.get('connection', '').lower() == 'close':
+            await self.close()
+        return status, response_headers, payload
+
+    async def _read_chunked(self):
+        chunks = []
+        while True:
+            size = int((await self._reader.readuntil(b'\r\n')).split(b';')[0], 16)
+            if size == 0:
+                await self._reader.readuntil(b'\r\n')
+                return b''.join(chunks)
+            chunks.append(await self._reader.readexactly(size))
+            await self._reader.readexactly(2)
+
+
+@dataclass
+class LoadStats:
+    latencies: dict = field(default_factory=lambda: defaultdict(list))
+    errors: dict = field(default_factory=lambda: defaultdict(int))
+    journeys: int = 0
+    aborted: list = field(default_factory=list)
+    started: float = field(default_factory=time.perf_counter)
+
+    def report(self):
+        elapsed = time.perf_counter() - self.started
+        names = sorted(set(self.latencies) | set(self.errors))
+        per_url = {name: summarize(self.latencies[name], elapsed, self.errors[name]) for name in names}
+        total = sum(len(values) for values in self.latencies.values())
+        errors = sum(self.errors.values())
+        return {
+            'elapsed_s': round(elapsed, 2),
+            'requests': total,
+            'rps': round(total / elapsed, 1) if elapsed else 0.0,
+            'errors': errors,
+            'error_rate': round(errors / total, 4) if total else 0.0,
+            'journeys': self.journeys,
+            'aborted_learners': sorted(self.aborted),
+            'urls': per_url,
+        }
+
+
+@dataclass
+class Catalog:
+    """IDs the journeys navigate through, read from the target's database."""
+    courses: list
+    lessons_by_course: dict
+    exercises: list
+
+
+class LearnerJourney:
+    """login -> dashboard -> course -> lessons -> complete -> exercise -> search."""
+
+    def __init__(self, session, stats, catalog, username, password, think_time=(0.5, 2.0), lessons_per_visit=3):
+        self.session = session
+        self.stats = stats
+        self.catalog = catalog
+        self.username = username
+        self.password = password
+        self.think_time = think_time
+        self.lessons_per_visit = lessons_per_visit
+        self.logged_in = False
+        self.login_failures = 0
+
+    async def call(self, name, method, path, body=b'', headers=None, expected=(200,)):
+        start = time.perf_counter()
+        try:
+            status, response_headers, payload = await self.session.request(method, path, body, headers)
+        except Exception:
+            self.stats.errors[name] += 1
+            return None
+        self.stats.latencies[name].append((time.perf_counter() - start) * 1000)
+        if status not in expected:
+            self.stats.errors[name] += 1
+        return status, response_headers, payload
+
+    async def think(self):
+        low, high = self.think_time
+        if high > 0:
+            await asyncio.sleep(random.uniform(low, high))
+
+    def csrf_headers(self, extra=None):
+        headers = {'X-CSRFToken': self.session.cookies.get('csrftoken', ''), 'Referer': self.referer()}
+        headers.update(extra or {})
+        return headers
+
+    def referer(self):
+        return f'http://{self.session.host}:{self.session.port}/'
+
+    async def login(self):
+        result = await self.call('account_login', 'GET', '/accounts/login/')
+        if result is None:
+            return False
+        match = CSRF_INPUT_RE.search(result[2])
+        token = match.group(1).decode() if match else self.session.cookies.get('csrftoken', '')
+        body = urlencode({'login': self.username, 'password': self.password, 'csrfmiddlewaretoken': token}).encode()
+        result = await self.call(
+            'account_login', 'POST', '/accounts/login/', body,
+            {'Content-Type': 'application/x-www-form-urlencoded', 'Referer': self.referer()},
+            expected=(302,),
+        )
+        self.logged_in = result is not None and result[0] == 302
+        return self.logged_in
+
+    async def run(self):
+        if not self.logged_in:
+            if not await self.login():
+                # Do not turn a bad password or a down login page into a login flood.
+                self.login_failures += 1
+                if self.login_failures >= MAX_LOGIN_FAILURES:
+                    raise LoginFailed(self.username)
+                await asyncio.sleep(min(LOGIN_BACKOFF_MAX_SECONDS, LOGIN_BACKOFF_SECONDS * 2 ** (self.login_failures - 1)))
+                return
+            self.login_failures = 0
+        await self.think()
+        await self.call('dashboard', 'GET', '/dashboard/')
+        await self.think()
+
+        course_id = random.choice(self.catalog.courses)
+        await self.call('course_detail', 'GET', f'/courses/{course_id}/')
+        await self.think()
+
+        lessons = self.catalog.lessons_by_course.get(course_id, [])
+        visited = lessons[:self.lessons_per_visit] if len(lessons) <= self.lessons_per_visit else \
+            sorted(random.sample(lessons, self.lessons_per_visit))
+        for lesson_id in visited:
+            await self.call('lesson_detail', 'GET', f'/courses/lesson/{lesson_id}/')
+            await self.think()
+        if visited:
+            await self.call(
+                'mark_lesson_complete', 'POST', f'/courses/lesson/{visited[-1]}/complete/',
+                b'action=complete',
+                self.csrf_headers({
+                    'Content-Type': 'application/x-www-form-urlencoded',
+                    'X-Requested-With': 'XMLHttpRequest',
+                }),
+            )
+            await self.think()
+
+        if self.catalog.exercises:
+            await self.endpoint('validate_exercise')
+            await self.think()
+
+        term = random.choice(AUTOCOMPLETE_TERMS)
+        for length in range(2, len(term) + 1):
+            # Keystrokes arrive faster than page navigations
+            await self.endpoint('search_suggestions', term[:length])
+            await asyncio.sleep(random.uniform(0.05, 0.15) if self.think_time[1] > 0 else 0)
+        await self.call('search', 'GET', f'/courses/search/?q={term}')
+        self.stats.journeys += 1
+
+    async def endpoint(self, name, term=None):
+        """One request to a JSON endpoint."""
+        if name == 'search_suggestions':
+            term = term or random.choice(AUTOCOMPLETE_TERMS)[:random.randint(2, 4)]
+            return await self.call(name, 'GET', f'/courses/search/suggestions/?q={term}')
+        if name == 'get_course_progress':
+            return await self.call(name, 'GET', f'/courses/course/{random.choice(self.catalog.courses)}/progress/')
+        exercise_id = random.choice(self.catalog.exercises)
+        if name == 'submit_quiz_answer':
+            path, payload = f'/courses/exercise/{exercise_id}/quiz/', {'answer': random.choice('abcd')}
+        else:
+            path = f'/courses/exercise/{exercise_id}/validate/'
+            payload = {'code': 'git init\ngit add .\ngit commit -m "init"'}
+        return await self.call(
+            name, 'POST', path, json.dumps(payload).encode(),
+            self.csrf_headers({'Content-Type': 'application/json'}),
+        )
+
+
+async def run_load(base_url, catalog, credentials, concurrency, duration=None, journeys=None,
+                   think_time=(0.5, 2.0), ramp_up=0.0, timeout=30.0):
+    """
+    Run ``concurrency`` virtual learners until ``duration`` seconds or ``journeys`` each.
+
+    A learner that cannot log in ``MAX_LOGIN_FAILURES`` times in a row stops and
+    is listed under ``aborted_learners`` in the report.
+    """
+    stats = LoadStats()
+    deadline = time.perf_counter() + duration if duration else None
+
+    async def learner(index):
+        if ramp_up:
+            await asyncio.sleep(ramp_up * index / concurrency)
+        username, password = credentials[index % len(credentials)]
+        session = HTTPSession(base_url, timeout=timeout)
+        journey = LearnerJourney(session, stats, catalog, username, password, think_time)
+        completed = 0
+        try:
+            while (deadline is None or time.perf_counter() < deadline) and (journeys is None or completed < journeys):
+                await journey.run()
+                completed += 1
+        except LoginFailed:
+            stats.aborted.append(username)
+        finally:
+            await session.close()
+
+    await asyncio.gather(*(learner(index) for index in range(concurrency)))
+    return stats.report()
+
+
+async def run_endpoint_load(base_url, catalog, cookie_jars, concurrency, duration, timeout=30.0):
+    """
+    Keep ``concurrency`` connections busy on the JSON endpoints for ``duration`` seconds.
+
+    There is no think time: every connection sends its next request as soon as
+    the previous one answers, so the result measures connection capacity.
+    ``cookie_jars`` holds pre-authenticated session and CSRF cookies.
+    """
+    stats = LoadStats()
+    deadline = time.perf_counter() + duration
+    names = [name for name, weight in ENDPOINT_MIX for _ in range(weight)]
+
+    async def client(index):
+        session = HTTPSession(base_url, timeout=timeout)
+        session.cookies.update(cookie_jars[index % len(cookie_jars)])
+        journey = LearnerJourney(session, stats, catalog, None, None, think_time=(0, 0))
+        try:
+            while time.perf_counter() < deadline:
+                await journey.endpoint(random.choice(names))
+        finally:
+            await session.close()
+
+    await asyncio.gather(*(client(index) for index in range(concurrency)))
+    return stats.report()
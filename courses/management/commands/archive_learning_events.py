@@ -0,0 +1,46 @@
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from courses import activity, exports
+from courses.models import LearningEvent
+
+
+class Command(BaseCommand):
+    help = (
+        'Archive whole months of the learning event log to gzipped JSON Lines and delete them. '
+        'Months older than LEARNING_EVENTS_KEEP_MONTHS are archived, oldest first.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output-dir', default='.', help='Directory for learning-events-YYYY-MM.jsonl.gz files')
+        parser.add_argument('--keep-months', type=int, default=settings.LEARNING_EVENTS_KEEP_MONTHS,
+                            help='Recent months (including this one) left in the table')
+        parser.add_argument('--dry-run', action='store_true', help='List the months that would be archived')
+
+    def handle(self, *args, **options):
+        activity.flush()
+        today = timezone.localdate()
+        months_back = today.year * 12 + today.month - 1 - max(options['keep_months'] - 1, 0)
+        cutoff, _ = activity.month_bounds(months_back // 12, months_back % 12 + 1)
+        output_dir = Path(options['output_dir'])
+
+        archived = 0
+        for month in LearningEvent.objects.filter(occurred_at__lt=cutoff).dates('occurred_at', 'month'):
+            start, end = activity.month_bounds(month.year, month.month)
+            path = output_dir / f'learning-events-{month:%Y-%m}.jsonl.gz'
+            if options['dry_run']:
+                self.stdout.write(f'Would archive {month:%Y-%m} to {path}')
+                continue
+
+            filters = {'since': start.date(), 'until': (end - timedelta(days=1)).date()}
+            with open(path, 'wb') as output:
+                for chunk in exports.stream('learning_events', 'jsonl', filters, compress=True):
+                    output.write(chunk)
+            deleted, _ = LearningEvent.objects.filter(occurred_at__gte=start, occurred_at__lt=end).delete()
+            self.stdout.write(f'Archived {deleted} events from {month:%Y-%m} to {path}')
+            archived += deleted
+        self.stdout.write(f'{archived} events archived.')
@@ -0,0 +1,102 @@
+import json
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test import Client
+from django.urls import reverse
+
+from courses.models import Lesson
+from courses.synthetic import create_catalog, create_learners, temporary_database
+from devoops_lms.metrics import summarize
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the lesson-complete and dashboard paths against a throwaway copy of the '
+        'active DATABASE_PROFILE. Run once per profile and compare the numbers.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=8, help='Concurrent learner threads')
+        parser.add_argument('--iterations', type=int, default=50, help='Complete+dashboard rounds per thread')
+        parser.add_argument('--json', dest='json_path', help='Also write the results to this file')
+
+    def handle(self, *args, **options):
+        profile = settings.DATABASE_PROFILE
+        self.stdout.write(f'Profile: {profile} ({connection.vendor})')
+
+        with temporary_database():
+            results = self.run_benchmark(options['concurrency'], options['iterations'])
+
+        results['profile'] = profile
+        for name in ('mark_lesson_complete', 'dashboard'):
+            row = results[name]
+            self.stdout.write(
+                f"{name:22} {row['rps']:8.1f} req/s  p50 {row['p50_ms']:7.2f} ms  "
+                f"p95 {row['p95_ms']:7.2f} ms  errors {row['errors']}"
+            )
+        self.stdout.write(f"{'total':22} {results['total_rps']:8.1f} req/s")
+
+        if options['json_path']:
+            Path(options['json_path']).write_text(json.dumps(results, indent=2))
+
+    def run_benchmark(self, concurrency, iterations):
+        create_catalog()
+        users = create_learners(concurrency, prefix='bench')
+        lesson_ids = list(Lesson.objects.values_list('id', flat=True))
+        connections.close_all()
+
+        latencies = {'mark_lesson_complete': [], 'dashboard': []}
+        errors = {'mark_lesson_complete': 0, 'dashboard': 0}
+        lock = threading.Lock()
+        barrier = threading.Barrier(concurrency + 1)
+
+        def learner(user, offset):
+            client = Client()
+            client.force_login(user)
+            local = {'mark_lesson_complete': [], 'dashboard': []}
+            local_errors = {'mark_lesson_complete': 0, 'dashboard': 0}
+            dashboard_url = reverse('dashboard')
+            barrier.wait()
+            for i in range(iterations):
+                lesson_id = lesson_ids[(offset + i) % len(lesson_ids)]
+                action = 'complete' if (i // len(lesson_ids)) % 2 == 0 else 'incomplete'
+                for name, call in (
+                    ('mark_lesson_complete', lambda: client.post(
+                        reverse('mark_lesson_complete', args=[lesson_id]), {'action': action},
+                        HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+                    )),
+                    ('dashboard', lambda: client.get(dashboard_url)),
+                ):
+                    start = time.perf_counter()
+                    try:
+                        response = call()
+                        failed = response.status_code >= 400
+                    except Exception:
+                        failed = True
+                    local[name].append((time.perf_counter() - start) * 1000)
+                    local_errors[name] += failed
+            connections.close_all()
+            with lock:
+                for name in latencies:
+                    latencies[name].extend(local[name])
+                    errors[name] += local_errors[name]
+
+        threads = [threading.Thread(target=learner, args=(user, index * 3)) for index, user in enumerate(users)]
+        for thread in threads:
+            thread.start()
+        barrier.wait()
+        start = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        results = {name: summarize(values, elapsed, errors[name]) for name, values in latencies.items()}
+        results['total_rps'] = round(sum(len(values) for values in latencies.values()) / elapsed, 1)
+        results['concurrency'] = concurrency
+        results['iterations'] = iterations
+        return results
@@ -0,0 +1,137 @@
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from importlib.util import find_spec
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.utils.crypto import get_random_string
+
+from courses.loadtest import Catalog, run_endpoint_load
+from courses.models import InteractiveExercise
+from courses.synthetic import create_catalog, create_learners, temporary_database
+
+SERVER_MODULES = {'wsgi': ['gunicorn'], 'asgi': ['gunicorn', 'uvicorn_worker']}
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare concurrent-connection capacity of the JSON endpoints under the WSGI and ASGI '
+        'deployment profiles (gunicorn.conf.py) against a throwaway copy of the database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', default='wsgi,asgi', help='Comma-separated SERVER_PROFILE values')
+        parser.add_argument('--levels', default='8,32,128', help='Comma-separated open-connection counts')
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds per level')
+        parser.add_argument('--workers', type=int, default=2, help='Gunicorn worker processes')
+        parser.add_argument('--threads', type=int, default=4, help='Threads per WSGI worker')
+        parser.add_argument('--json', dest='json_path', help='Also write the results to this file')
+
+    def handle(self, *args, **options):
+        profiles = [profile for profile in options['profiles'].split(',') if profile]
+        levels = [int(level) for level in options['levels'].split(',') if level]
+        for profile in profiles:
+            missing = [module for module in SERVER_MODULES[profile] if find_spec(module) is None]
+            if missing:
+                raise CommandError(f"{profile} needs {', '.join(missing)}; pip install '.[asgi]'")
+
+        results = {}
+        with temporary_database():
+            catalog, cookie_jars = self.seed(max(levels))
+            env = self.server_env(options)
+            for profile in profiles:
+                results[profile] = self.run_profile(profile, env, catalog, cookie_jars, levels, options)
+
+        self.stdout.write(
+            f"\n{'profile':8} {'conns':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}"
+        )
+        for profile, rows in results.items():
+            for level, report in rows.items():
+                latencies = [row for row in report['urls'].values()]
+                worst_p95 = max((row['p95_ms'] for row in latencies), default=0.0)
+                worst_p99 = max((row['p99_ms'] for row in latencies), default=0.0)
+                median = max((row['p50_ms'] for row in latencies), default=0.0)
+                self.stdout.write(
+                    f"{profile:8} {level:6} {report['rps']:8.1f} {median:8.1f} {worst_p95:8.1f} "
+                    f"{worst_p99:8.1f} {report['error_rate']:7.2%}"
+                )
+        self.stdout.write('Latency columns show the slowest endpoint at each level.')
+
+        if options['json_path']:
+            Path(options['json_path']).write_text(json.dumps(results, indent=2))
+
+    def seed(self, learners):
+        courses = create_catalog()
+        users = create_learners(learners, prefix='server')
+        catalog = Catalog(
+            courses=[course.pk for course in courses],
+            lessons_by_course={},
+            exercises=list(InteractiveExercise.objects.values_list('id', flat=True)),
+        )
+        cookie_jars = []
+        for user in users:
+            client = Client()
+            client.force_login(user)
+            jar = {name: morsel.value for name, morsel in client.cookies.items()}
+            jar[settings.CSRF_COOKIE_NAME] = get_random_string(32)
+            cookie_jars.append(jar)
+        connections.close_all()
+        return catalog, cookie_jars
+
+    def server_env(self, options):
+        env = dict(os.environ, WEB_CONCURRENCY=str(options['workers']), GUNICORN_THREADS=str(options['threads']))
+        name = str(connection.settings_dict['NAME'])
+        if connection.vendor == 'sqlite':
+            env['SQLITE_PATH'] = name
+        else:
+            env['POSTGRES_DB'] = name
+        return env
+
+    def run_profile(self, profile, env, catalog, cookie_jars, levels, options):
+        port = _free_port()
+        log_path = Path(settings.BASE_DIR) / 'var' / f'benchmark-{profile}.log'
+        log_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(log_path, 'wb') as log:
+            server = subprocess.Popen(
+                [sys.executable, '-m', 'gunicorn', '-c', str(Path(settings.BASE_DIR) / 'gunicorn.conf.py'),
+                 '--bind', f'127.0.0.1:{port}'],
+                cwd=settings.BASE_DIR, env=dict(env, SERVER_PROFILE=profile), stdout=log, stderr=log,
+            )
+            try:
+                self.wait_for_port(port, server, log_path)
+                rows = {}
+                for level in levels:
+                    self.stdout.write(f'{profile}: {level} connections for {options["duration"]:.0f} s')
+                    rows[level] = asyncio.run(run_endpoint_load(
+                        f'http://127.0.0.1:{port}', catalog, cookie_jars, level, options['duration'],
+                    ))
+                return rows
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+
+    def wait_for_port(self, port, server, log_path, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f'Server exited during startup; see {log_path}')
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError(f'Server did not start within {timeout} s; see {log_path}')
@@ -0,0 +1,75 @@
+import json
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from courses.benchmarks import run_benchmarks, seed_dataset
+from courses.synthetic import temporary_database
+
+
+class Command(BaseCommand):
+    help = (
+        'Hit every named URL as anonymous and authenticated users on a fixed synthetic dataset, '
+        'record latency percentiles and query counts to JSON and compare against a baseline'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20, help='Measured requests per scenario')
+        parser.add_argument('--output', default='benchmarks/baseline.json', help='Where to write the results')
+        parser.add_argument('--compare', help='Baseline JSON to compare against (defaults to --output if it exists)')
+        parser.add_argument('--threshold', type=float, default=20.0,
+                            help='Flag p95 regressions larger than this percentage')
+
+    def handle(self, *args, **options):
+        output = Path(options['output'])
+        if not output.is_absolute():
+            output = settings.BASE_DIR / output
+        compare = Path(options['compare']) if options['compare'] else output
+        baseline = json.loads(compare.read_text()) if compare.exists() else None
+
+        with temporary_database():
+            results = run_benchmarks(seed_dataset(), repeat=options['repeat'])
+
+        self.report(results, baseline, options['threshold'])
+
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps({
+            'commit': self.git_commit(),
+            'recorded_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'repeat': options['repeat'],
+            'scenarios': results,
+        }, indent=2) + '\n')
+        self.stdout.write(f'Results written to {output}')
+
+    def report(self, results, baseline, threshold):
+        previous = (baseline or {}).get('scenarios', {})
+        if baseline:
+            self.stdout.write(f"Comparing with {baseline.get('commit') or 'unknown commit'}")
+        self.stdout.write(f"{'scenario':40} {'queries':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  change")
+        for name, row in results.items():
+            change = ''
+            before = previous.get(name)
+            if before:
+                delta = row['queries'] - before['queries']
+                if delta:
+                    change += f'queries {delta:+d} '
+                if before['p95_ms']:
+                    pct = (row['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100
+                    change += f'p95 {pct:+.0f}%'
+                    if pct > threshold:
+                        change = self.style.WARNING(change + ' REGRESSION')
+            self.stdout.write(
+                f"{name:40} {row['queries']:8} {row['p50_ms']:8.2f} {row['p95_ms']:8.2f} {row['p99_ms']:8.2f}  {change}"
+            )
+
+    def git_commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,123 @@
+import platform
+import re
+import shutil
+import stat
+import subprocess
+import urllib.parse
+import urllib.request
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+# Third-party assets served from our own origin instead of public CDNs.
+# CSS files are scanned for relative url(...) references (fonts etc.),
+# which are vendored alongside them.
+VENDOR_ASSETS = [
+    (
+        'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css',
+        'vendor/fontawesome/css/all.min.css',
+    ),
+    (
+        'https://cdnjs.cloudflare.com/ajax/libs/highlight.js/11.8.0/styles/github-dark.min.css',
+        'vendor/highlightjs/styles/github-dark.min.css',
+    ),
+    (
+        'https://cdnjs.cloudflare.com/ajax/libs/highlight.js/11.8.0/highlight.min.js',
+        'vendor/highlightjs/highlight.min.js',
+    ),
+    (
+        'https://cdn.jsdelivr.net/npm/mermaid@10.6.1/dist/mermaid.min.js',
+        'vendor/mermaid/mermaid.min.js',
+    ),
+]
+
+TAILWIND_RELEASE_URL = 'https://github.com/tailwindlabs/tailwindcss/releases/download/v{version}/{binary}'
+
+CSS_URL_RE = re.compile(r'url\(\s*[\'"]?([^\'")]+)[\'"]?\s*\)')
+
+
+class Command(BaseCommand):
+    help = 'Vendor third-party assets, build the purged Tailwind CSS and collect fingerprinted static files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Re-download vendored assets that already exist')
+        parser.add_argument('--skip-vendor', action='store_true', help='Do not download third-party assets')
+        parser.add_argument('--skip-tailwind', action='store_true', help='Do not rebuild css/app.css')
+        parser.add_argument('--no-collect', action='store_true', help='Do not run collectstatic afterwards')
+
+    def handle(self, *args, **options):
+        static_dir = Path(settings.STATICFILES_DIRS[0])
+
+        if not options['skip_vendor']:
+            for url, relative_path in VENDOR_ASSETS:
+                self.vendor(url, static_dir / relative_path, force=options['force'])
+
+        if not options['skip_tailwind']:
+            self.build_tailwind(static_dir)
+
+        if not options['no_collect']:
+            # Fingerprinting and gzip/brotli variants happen in the storage's post_process
+            call_command('collectstatic', interactive=False, verbosity=options['verbosity'])
+
+        self.stdout.write(self.style.SUCCESS('Static assets built.'))
+
+    def vendor(self, url, target, force=False):
+        if target.exists() and not force:
+            self.stdout.write(f'  = {target.relative_to(settings.BASE_DIR)}')
+            return
+        self.download(url, target)
+        self.stdout.write(f'  + {target.relative_to(settings.BASE_DIR)}')
+
+        if target.suffix == '.css':
+            for reference in CSS_URL_RE.findall(target.read_text(encoding='utf-8')):
+                if reference.startswith(('data:', 'http:', 'https:', '//', '#')):
+                    continue
+                reference = reference.split('?')[0].split('#')[0]
+                dependency = (target.parent / reference).resolve()
+                if force or not dependency.exists():
+                    self.download(urllib.parse.urljoin(url, reference), dependency)
+
+    def download(self, url, target):
+        target.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            with urllib.request.urlopen(url, timeout=60) as response, open(target, 'wb') as fh:
+                shutil.copyfileobj(response, fh)
+        except OSError as exc:
+            raise CommandError(f'Could not download {url}: {exc}')
+
+    def build_tailwind(self, static_dir):
+        cli = self.tailwind_cli()
+        source = static_dir / 'src' / 'app.css'
+        output = static_dir / 'css' / 'app.css'
+        output.parent.mkdir(parents=True, exist_ok=True)
+
+        result = subprocess.run(
+            [cli, '-c', str(settings.BASE_DIR / 'tailwind.config.js'), '-i', str(source), '-o', str(output), '--minify'],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            raise CommandError(f'Tailwind build failed:\n{result.stderr}')
+        self.stdout.write(f'  + {output.relative_to(settings.BASE_DIR)} ({output.stat().st_size // 1024} KB)')
+
+    def tailwind_cli(self):
+        """Locate the Tailwind CLI, downloading the standalone binary if needed."""
+        found = shutil.which(settings.TAILWIND_CLI)
+        if found:
+            return found
+
+        system = {'Linux': 'linux', 'Darwin': 'macos', 'Windows': 'windows'}.get(platform.system())
+        arch = {'x86_64': 'x64', 'amd64': 'x64', 'arm64': 'arm64', 'aarch64': 'arm64'}.get(platform.machine().lower())
+        if not system or not arch:
+            raise CommandError('No standalone Tailwind CLI for this platform; set TAILWIND_CLI to an installed binary.')
+
+        binary = f'tailwindcss-{system}-{arch}' + ('.exe' if system == 'windows' else '')
+        target = Path(settings.ASSETS_CACHE_DIR) / f'{settings.TAILWIND_VERSION}-{binary}'
+        if not target.exists():
+            self.stdout.write(f'Downloading Tailwind CLI v{settings.TAILWIND_VERSION}...')
+            self.download(TAILWIND_RELEASE_URL.format(version=settings.TAILWIND_VERSION, binary=binary), target)
+            target.chmod(target.stat().st_mode | stat.S_IEXEC)
+        return str(target)
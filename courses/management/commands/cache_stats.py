@@ -0,0 +1,35 @@
+import json
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Show hit ratio, evictions and size for every configured cache alias'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--json', action='store_true', help='Print machine-readable JSON')
+
+    def handle(self, *args, **options):
+        stats = {}
+        for alias in settings.CACHES:
+            cache = caches[alias]
+            stats[alias] = cache.stats() if hasattr(cache, 'stats') else {'backend': type(cache).__name__}
+
+        if options['json']:
+            self.stdout.write(json.dumps(stats, indent=2))
+            return
+
+        self.stdout.write(f"{'alias':12} {'backend':28} {'hits':>10} {'misses':>10} {'ratio':>7} "
+                          f"{'evictions':>10} {'entries':>9} {'bytes':>12}")
+        for alias, row in stats.items():
+            ratio = row.get('hit_ratio')
+            self.stdout.write(
+                f"{alias:12} {row['backend']:28} {self._fmt(row.get('hits')):>10} {self._fmt(row.get('misses')):>10} "
+                f"{'-' if ratio is None else f'{ratio:.1%}':>7} {self._fmt(row.get('evictions')):>10} "
+                f"{self._fmt(row.get('entries')):>9} {self._fmt(row.get('bytes')):>12}"
+            )
+
+    def _fmt(self, value):
+        return '-' if value is None else f'{value:,}'
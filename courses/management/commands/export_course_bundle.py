@@ -0,0 +1,38 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from courses import bundles
+from courses.models import Course
+
+
+class Command(BaseCommand):
+    help = (
+        'Write courses with their modules, lessons, code examples, exercises, workflow diagrams '
+        'and referenced media to a single .tar.gz bundle for import_course_bundle.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('courses', nargs='*', type=int, help='Course ids (default: every course)')
+        parser.add_argument('--output', '-o', default='-', help="File to write, or '-' for stdout")
+        parser.add_argument('--chunk-size', type=int, help='Rows per database round trip')
+
+    def handle(self, *args, **options):
+        course_ids = options['courses'] or list(Course.objects.values_list('id', flat=True))
+        missing = set(course_ids) - set(Course.objects.filter(id__in=course_ids).values_list('id', flat=True))
+        if missing:
+            raise CommandError(f'No course with id {", ".join(map(str, sorted(missing)))}')
+
+        started = time.perf_counter()
+        if options['output'] == '-':
+            manifest = bundles.export(course_ids, sys.stdout.buffer, options['chunk_size'])
+            sys.stdout.buffer.flush()
+            return
+        with open(options['output'], 'wb') as output:
+            manifest = bundles.export(course_ids, output, options['chunk_size'])
+        counts = ', '.join(f'{count} {label}' for label, count in manifest['counts'].items())
+        self.stdout.write(
+            f'Wrote {options["output"]}: {counts}, {len(manifest["media"])} media files '
+            f'in {time.perf_counter() - started:.1f}s'
+        )
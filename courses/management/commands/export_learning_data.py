@@ -0,0 +1,48 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from courses import exports
+
+
+class Command(BaseCommand):
+    help = (
+        'Stream learner progress, completed lessons or exercise attempts as CSV or JSON Lines. '
+        'Memory use stays flat regardless of table size.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=sorted(exports.DATASETS))
+        parser.add_argument('--format', dest='fmt', choices=sorted(exports.FORMATS), default='csv')
+        parser.add_argument('--output', '-o', default='-', help="File to write, or '-' for stdout")
+        parser.add_argument('--gzip', action='store_true', help='Compress the output with gzip')
+        parser.add_argument('--course', help='Only this course id')
+        parser.add_argument('--since', help='From this date (YYYY-MM-DD, inclusive)')
+        parser.add_argument('--until', help='Up to this date (YYYY-MM-DD, inclusive)')
+        parser.add_argument('--cohort', help='Learners who signed up in this month (YYYY-MM)')
+        parser.add_argument('--chunk-size', type=int, help='Rows per database round trip')
+
+    def handle(self, *args, **options):
+        try:
+            filters = exports.parse_filters(
+                options['course'], options['since'], options['until'], options['cohort']
+            )
+        except ValueError as e:
+            raise CommandError(f'Invalid filter: {e}')
+
+        chunks = exports.stream(
+            options['dataset'], options['fmt'], filters,
+            compress=options['gzip'], chunk_size=options['chunk_size'],
+        )
+        if options['output'] == '-':
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+            return
+
+        written = 0
+        with open(options['output'], 'wb') as output:
+            for chunk in chunks:
+                output.write(chunk)
+                written += len(chunk)
+        self.stderr.write(f"Wrote {written} bytes to {options['output']}")
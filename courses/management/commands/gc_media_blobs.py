@@ -0,0 +1,82 @@
+import os
+import re
+import shutil
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django_ckeditor_5.fields import CKEditor5Field
+
+from courses import images
+from courses.models import ResponsiveImage
+from devoops_lms.media import TEMP_DIR, ContentAddressedStorage
+
+
+def rich_text_fields():
+    """``(model, field name)`` for every CKEditor field in the courses app (lessons, examples, exercises, forum)."""
+    for model in apps.get_app_config('courses').get_models():
+        for field in model._meta.get_fields():
+            if isinstance(field, CKEditor5Field):
+                yield model, field.name
+
+
+def referenced_blobs(base_url):
+    pattern = re.compile(re.escape(base_url) + r'([0-9a-f]{2}/[0-9a-f]{64}(?:\.[a-z0-9]{1,10})?)')
+    referenced = set()
+    for model, field in rich_text_fields():
+        for text in model.objects.exclude(**{field: ''}).values_list(field, flat=True).iterator(chunk_size=500):
+            referenced.update(pattern.findall(text or ''))
+    return referenced
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete content-addressed media blobs that no lesson, code example, exercise or forum post '
+        'refers to, together with their image derivatives. Blobs newer than --min-age-hours are kept, '
+        'since an editor may still be about to save the text that uses them.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-age-hours', type=float, default=settings.MEDIA_BLOB_GC_MIN_AGE_HOURS,
+                            help='Only delete blobs (and stray temporary files) at least this old')
+        parser.add_argument('--dry-run', action='store_true', help='List what would be deleted')
+
+    def handle(self, *args, **options):
+        storage = ContentAddressedStorage()
+        cutoff = time.time() - options['min_age_hours'] * 3600
+        referenced = referenced_blobs(storage.base_url)
+
+        unreferenced = [
+            name for name in storage.blobs()
+            if name not in referenced and os.path.getmtime(storage.path(name)) < cutoff
+        ]
+        freed = sum(storage.size(name) for name in unreferenced)
+        for name in unreferenced:
+            self.stdout.write(f'{"Would delete" if options["dry_run"] else "Deleting"} {name}')
+        if options['dry_run']:
+            self.stdout.write(f'{len(unreferenced)} unreferenced blobs ({freed} bytes).')
+            return
+
+        for name in unreferenced:
+            storage.delete(name)
+        image_names = [settings.MEDIA_BLOB_PATH + name for name in unreferenced]
+        digests = set(ResponsiveImage.objects.filter(name__in=image_names).values_list('digest', flat=True))
+        ResponsiveImage.objects.filter(name__in=image_names).delete()
+        caches['default'].delete_many([images.CACHE_PREFIX + name for name in image_names])
+        digests -= set(ResponsiveImage.objects.filter(digest__in=digests).values_list('digest', flat=True))
+        for digest in digests:
+            shutil.rmtree(default_storage.path(f'{images.DERIVED_PREFIX}/{digest[:2]}/{digest}'), ignore_errors=True)
+
+        temp_dir = storage.path(TEMP_DIR)
+        if os.path.isdir(temp_dir):
+            for filename in os.listdir(temp_dir):
+                path = os.path.join(temp_dir, filename)
+                if os.path.getmtime(path) < cutoff:
+                    os.unlink(path)
+        self.stdout.write(
+            f'Deleted {len(unreferenced)} blobs ({freed} bytes) and derivatives of {len(digests)} images; '
+            f'{len(referenced)} referenced blobs kept.'
+        )
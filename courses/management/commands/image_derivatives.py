@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from courses import images
+from courses.models import ResponsiveImage, Technology
+from devoops_lms.media import TEMP_DIR
+
+
+def _walk(storage, path=''):
+    directories, files = storage.listdir(path)
+    for name in files:
+        yield f'{path}{name}'
+    for directory in directories:
+        yield from _walk(storage, f'{path}{directory}/')
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate responsive WebP/AVIF derivatives for technology logos, profile pictures and '
+        'editor uploads that do not have them yet (all of them with --force).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Regenerate images that already have derivatives')
+
+    def handle(self, *args, **options):
+        names = set(Technology.objects.exclude(logo='').values_list('logo', flat=True))
+        names |= set(get_user_model().objects.exclude(profile_picture='').values_list('profile_picture', flat=True))
+        uploads = images.EditorUploadStorage()
+        if uploads.exists(''):
+            names |= {settings.MEDIA_BLOB_PATH + name for name in _walk(uploads) if not name.startswith(TEMP_DIR + '/')}
+        if not options['force']:
+            names -= set(ResponsiveImage.objects.filter(name__in=names).values_list('name', flat=True))
+
+        failed = 0
+        for name in sorted(names):
+            try:
+                image = images.generate(name)
+            except Exception as exc:
+                failed += 1
+                self.stderr.write(f'{name}: {exc}')
+                continue
+            self.stdout.write(f'{name}: {len(image.widths)} widths x {", ".join(image.formats)} ({image.digest[:12]})')
+        self.stdout.write(self.style.SUCCESS(f'Processed {len(names) - failed} images, {failed} failed'))
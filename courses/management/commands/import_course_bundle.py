@@ -0,0 +1,36 @@
+import sys
+import tarfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from courses import bundles
+
+
+class Command(BaseCommand):
+    help = (
+        'Load a bundle written by export_course_bundle. Existing rows are matched by technology name '
+        'and order within their parent and updated; everything else is inserted.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('bundle', help="Bundle file, or '-' for stdin")
+        parser.add_argument('--batch-size', type=int, help='Rows per bulk insert/update')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            if options['bundle'] == '-':
+                manifest, created, updated, media = bundles.load(sys.stdin.buffer, options['batch_size'])
+            else:
+                with open(options['bundle'], 'rb') as bundle:
+                    manifest, created, updated, media = bundles.load(bundle, options['batch_size'])
+        except (bundles.BundleError, tarfile.TarError, OSError, EOFError) as e:
+            raise CommandError(f'Could not import {options["bundle"]}: {e}')
+
+        for label in manifest['counts']:
+            self.stdout.write(f'{label}: {created.get(label, 0)} created, {updated.get(label, 0)} updated')
+        self.stdout.write(
+            f'Imported {", ".join(manifest["courses"])} ({len(media)} new media files) '
+            f'in {time.perf_counter() - started:.1f}s'
+        )
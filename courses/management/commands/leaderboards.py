@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from courses import leaderboards
+
+
+class Command(BaseCommand):
+    help = (
+        'Show or repair the incrementally maintained leaderboards. --rebuild recomputes the '
+        'all-time boards from exercise attempts (after bulk imports or manual SQL).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help='Recompute all-time boards from attempts')
+        parser.add_argument('--scope', default=leaderboards.GLOBAL, help="'global', 'course:<id>' or 'phase:<n>'")
+        parser.add_argument('--week', action='store_true', help="Show this week's board instead of all time")
+        parser.add_argument('--top', type=int, default=10, help='Rows to show')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            created = leaderboards.rebuild()
+            self.stdout.write(f'Rebuilt all-time leaderboards: {created} entries.')
+
+        period = leaderboards.resolve_period(leaderboards.WEEK if options['week'] else leaderboards.ALL_TIME)
+        self.stdout.write(f"\n{options['scope']} ({period})")
+        for entry in leaderboards.top(options['scope'], period, options['top'], cached=False):
+            self.stdout.write(f"{entry['rank']:>5}  {entry['score']:>7}  {entry['user__username']}")
@@ -0,0 +1,112 @@
+import asyncio
+import json
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.loadtest import Catalog, run_load
+from courses.models import Course, InteractiveExercise, Lesson
+from courses.synthetic import DEFAULT_PASSWORD
+
+
+class Command(BaseCommand):
+    help = (
+        'Replay realistic learner sessions against a running server: login, dashboard, course, '
+        'lessons, lesson completion, exercise validation and search autocomplete.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Base URL of the server under test')
+        parser.add_argument('--concurrency', type=int, default=10, help='Concurrent virtual learners')
+        parser.add_argument('--duration', type=float, default=60.0, help='Seconds to run (0 = until --journeys)')
+        parser.add_argument('--journeys', type=int, help='Stop each learner after this many journeys')
+        parser.add_argument('--think-min', type=float, default=0.5, help='Minimum think time between pages (s)')
+        parser.add_argument('--think-max', type=float, default=2.0, help='Maximum think time; 0 disables thinking')
+        parser.add_argument('--ramp-up', type=float, default=0.0, help='Seconds over which learners start')
+        parser.add_argument('--timeout', type=float, default=30.0, help='Per-request timeout (s)')
+        parser.add_argument('--user-prefix', default='loadtest', help='Usernames are <prefix><n>')
+        parser.add_argument('--password', default=DEFAULT_PASSWORD)
+        parser.add_argument(
+            '--create-users', action='store_true',
+            help='Create any missing <prefix>0..<concurrency-1> accounts and set --password on the existing ones',
+        )
+        parser.add_argument('--json', dest='json_path', help='Also write the report to this file')
+
+    def handle(self, *args, **options):
+        if not options['duration'] and not options['journeys']:
+            raise CommandError('Pass --duration or --journeys so the run ends.')
+
+        catalog = self.load_catalog()
+        credentials = self.credentials(options)
+        self.stdout.write(
+            f"Target {options['url']}: {options['concurrency']} learners, "
+            f"{len(catalog.courses)} courses, {len(credentials)} accounts"
+        )
+
+        report = asyncio.run(run_load(
+            options['url'], catalog, credentials,
+            concurrency=options['concurrency'],
+            duration=options['duration'] or None,
+            journeys=options['journeys'],
+            think_time=(options['think_min'], options['think_max']),
+            ramp_up=options['ramp_up'],
+            timeout=options['timeout'],
+        ))
+        self.print_report(report)
+        if options['json_path']:
+            Path(options['json_path']).write_text(json.dumps(report, indent=2))
+
+    def load_catalog(self):
+        courses = list(Course.objects.filter(is_active=True).values_list('id', flat=True))
+        if not courses:
+            raise CommandError('No active courses to browse; seed the catalog first.')
+        lessons_by_course = {}
+        for lesson_id, course_id in Lesson.objects.filter(module__course__in=courses).order_by(
+                'module__order', 'order').values_list('id', 'module__course_id'):
+            lessons_by_course.setdefault(course_id, []).append(lesson_id)
+        exercises = list(InteractiveExercise.objects.filter(
+            lesson__module__course__in=courses, exercise_type='code',
+        ).values_list('id', flat=True))
+        return Catalog(courses, lessons_by_course, exercises)
+
+    def credentials(self, options):
+        prefix, password = options['user_prefix'], options['password']
+        count = options['concurrency']
+        User = get_user_model()
+        if options['create_users']:
+            wanted = [f'{prefix}{index}' for index in range(count)]
+            template = User(username='template')
+            template.set_password(password)
+            existing = set(User.objects.filter(username__in=wanted).values_list('username', flat=True))
+            # Never delete: the accounts may be real learners with progress and attempts behind them.
+            User.objects.filter(username__in=existing).update(password=template.password)
+            User.objects.bulk_create([
+                User(username=username, email=f'{username}@example.com', password=template.password)
+                for username in wanted if username not in existing
+            ])
+            return [(username, password) for username in wanted]
+        usernames = sorted(User.objects.filter(
+            username__startswith=prefix).values_list('username', flat=True))[:count]
+        if not usernames:
+            raise CommandError(f'No accounts named {prefix}<n>; pass --create-users.')
+        return [(username, password) for username in usernames]
+
+    def print_report(self, report):
+        self.stdout.write(
+            f"\n{report['requests']} requests in {report['elapsed_s']} s: {report['rps']} req/s, "
+            f"{report['journeys']} journeys, error rate {report['error_rate']:.2%}\n"
+        )
+        if report['aborted_learners']:
+            self.stderr.write(
+                f"Gave up on {len(report['aborted_learners'])} learners that could not log in: "
+                + ', '.join(report['aborted_learners'])
+            )
+        self.stdout.write(
+            f"{'url name':22} {'count':>7} {'rps':>7} {'p50':>8} {'p90':>8} {'p95':>8} {'p99':>8} {'errors':>7}"
+        )
+        for name, row in report['urls'].items():
+            self.stdout.write(
+                f"{name:22} {row['requests']:7d} {row.get('rps', 0.0):7.1f} {row['p50_ms']:8.1f} "
+                f"{row['p90_ms']:8.1f} {row['p95_ms']:8.1f} {row['p99_ms']:8.1f} {row['errors']:7d}"
+            )
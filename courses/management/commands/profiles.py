@@ -0,0 +1,46 @@
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from devoops_lms.profiling import PROFILE_SUFFIX, UNSAFE_NAME_RE, read_profile
+
+
+class Command(BaseCommand):
+    help = 'Summarise collapsed-stack profiles written by ProfilingMiddleware'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--view', help='Only profiles for this URL name (e.g. lesson_detail)')
+        parser.add_argument('--top', type=int, default=25, help='Show this many frames by self samples')
+        parser.add_argument('--merge', metavar='PATH', help='Write the merged stacks to PATH for flamegraph tools')
+
+    def handle(self, *args, **options):
+        pattern = f"{UNSAFE_NAME_RE.sub('_', options['view'])}.*" if options['view'] else '*'
+        paths = sorted(Path(settings.PROFILER_DIR).glob(pattern + PROFILE_SUFFIX))
+        if not paths:
+            self.stdout.write('No profiles found.')
+            return
+
+        stacks = Counter()
+        for path in paths:
+            stacks.update(read_profile(path))
+        total = sum(stacks.values())
+
+        own, inclusive = Counter(), Counter()
+        for stack, count in stacks.items():
+            frames = stack.split(';')
+            own[frames[-1]] += count
+            for frame in set(frames):
+                inclusive[frame] += count
+
+        self.stdout.write(f'{len(paths)} profiles, {total} samples\n')
+        self.stdout.write(f"{'self %':>7} {'total %':>8}  frame")
+        for frame, count in own.most_common(options['top']):
+            self.stdout.write(f'{100 * count / total:7.1f} {100 * inclusive[frame] / total:8.1f}  {frame}')
+
+        if options['merge']:
+            Path(options['merge']).write_text(
+                ''.join(f'{stack} {count}\n' for stack, count in stacks.most_common())
+            )
+            self.stdout.write(f"\nMerged stacks written to {options['merge']}")
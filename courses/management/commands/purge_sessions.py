@@ -0,0 +1,39 @@
+import time
+
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete expired rows from django_session in small batches so the purge never holds '
+        'the write lock for long. Use --loop to keep running as a background worker.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Sessions deleted per transaction')
+        parser.add_argument('--pause', type=float, default=0.05, help='Seconds to sleep between batches')
+        parser.add_argument('--loop', action='store_true', help='Run forever, purging every --interval seconds')
+        parser.add_argument('--interval', type=int, default=3600, help='Seconds between purges with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            deleted = self.purge(options['batch_size'], options['pause'])
+            self.stdout.write(f'Purged {deleted} expired sessions.')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def purge(self, batch_size, pause):
+        now = timezone.now()
+        deleted = 0
+        while True:
+            keys = list(
+                Session.objects.filter(expire_date__lt=now).values_list('session_key', flat=True)[:batch_size]
+            )
+            if not keys:
+                return deleted
+            deleted += Session.objects.filter(session_key__in=keys).delete()[0]
+            if pause:
+                time.sleep(pause)
@@ -0,0 +1,80 @@
+import json
+import shutil
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from devoops_lms.instrumentation import load_aggregates, load_fragment_aggregates, recorder
+
+
+class Command(BaseCommand):
+    help = 'Dump per-URL request timing, query and N+1 histograms collected by RequestMetricsMiddleware'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sort', choices=['count', 'p95', 'queries', 'db'], default='p95')
+        parser.add_argument('--slow', type=int, default=10, help='Show this many recent slow/N+1 samples')
+        parser.add_argument('--json', action='store_true', help='Print merged histograms as JSON')
+        parser.add_argument('--reset', action='store_true', help='Delete collected metrics files and exit')
+
+    def handle(self, *args, **options):
+        if options['reset']:
+            shutil.rmtree(settings.REQUEST_METRICS_DIR, ignore_errors=True)
+            recorder.reset()
+            self.stdout.write('Request metrics cleared.')
+            return
+
+        views, slow = load_aggregates()
+        fragments = load_fragment_aggregates()
+        if options['json']:
+            def serialize(groups):
+                return {
+                    name: {key: value.to_dict() if hasattr(value, 'to_dict') else value for key, value in group.items()}
+                    for name, group in groups.items()
+                }
+
+            self.stdout.write(json.dumps({
+                'views': serialize(views),
+                'fragments': serialize(fragments),
+                'slow': slow,
+            }, indent=2))
+            return
+
+        sort_keys = {
+            'count': lambda item: item[1]['wall_ms'].total,
+            'p95': lambda item: item[1]['wall_ms'].quantile(95),
+            'queries': lambda item: item[1]['queries'].mean,
+            'db': lambda item: item[1]['db_ms'].mean,
+        }
+        self.stdout.write(
+            f"{'view':40} {'count':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8} "
+            f"{'db ms':>7} {'tpl ms':>7} {'n+1':>5} {'5xx':>5}"
+        )
+        for name, view in sorted(views.items(), key=sort_keys[options['sort']], reverse=True):
+            wall = view['wall_ms']
+            self.stdout.write(
+                f"{name[:40]:40} {wall.total:7} {wall.quantile(50):8.0f} {wall.quantile(95):8.0f} "
+                f"{wall.quantile(99):8.0f} {view['queries'].mean:8.1f} {view['db_ms'].mean:7.1f} "
+                f"{view['template_ms'].mean:7.1f} {view['n_plus_one']:5} {view['errors']:5}"
+            )
+
+        if fragments:
+            self.stdout.write(f"\n{'fragment':40} {'hits':>7} {'misses':>7} {'ratio':>7} {'render p50':>11} {'render p95':>11}")
+            for name, fragment in sorted(fragments.items()):
+                lookups = fragment['hits'] + fragment['misses']
+                render = fragment['render_ms']
+                self.stdout.write(
+                    f"{name[:40]:40} {fragment['hits']:7} {fragment['misses']:7} {fragment['hits'] / lookups:7.1%} "
+                    f"{render.quantile(50):9.1f}ms {render.quantile(95):9.1f}ms"
+                )
+
+        if slow and options['slow']:
+            self.stdout.write('\nRecent slow / N+1 requests:')
+            for sample in slow[-options['slow']:]:
+                when = datetime.fromtimestamp(sample['at']).strftime('%Y-%m-%d %H:%M:%S')
+                self.stdout.write(
+                    f"  {when} {sample['view']}: {sample['wall_ms']} ms, {sample['queries']} queries, "
+                    f"{sample['db_ms']} ms in DB"
+                )
+                for signature, count in sample['duplicates']:
+                    self.stdout.write(f'      x{count} {signature[:160]}')
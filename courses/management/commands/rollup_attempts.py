@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from courses import rollups
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the daily per-exercise, per-lesson and per-course attempt rollups for the days touched by '
+        'attempts modified since the last high-water mark. Use --loop to keep running as a background worker.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help='Recompute every day from scratch')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Attempts read per round trip')
+        parser.add_argument('--loop', action='store_true', help='Run forever, refreshing every --interval seconds')
+        parser.add_argument('--interval', type=int, default=300, help='Seconds between refreshes with --loop')
+
+    def handle(self, *args, **options):
+        rebuild = options['rebuild']
+        while True:
+            days, count = rollups.refresh(rebuild=rebuild, chunk_size=options['chunk_size'])
+            scope = 'all days' if days is None else f'{len(days)} changed days'
+            self.stdout.write(f'Rolled up {count} attempts ({scope}).')
+            if not options['loop']:
+                break
+            rebuild = False
+            time.sleep(options['interval'])
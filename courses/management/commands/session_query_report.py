@@ -0,0 +1,60 @@
+import tempfile
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from courses.models import Lesson
+from courses.synthetic import create_catalog, create_learners, temporary_database
+from devoops_lms.testing import isolated_caches
+
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+
+
+class Command(BaseCommand):
+    help = 'Count per-request queries on the lesson and dashboard pages under each session engine'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=5, help='Warm requests measured per page')
+
+    def handle(self, *args, **options):
+        with temporary_database():
+            create_catalog(phases=1, technologies_per_phase=1, exercises_per_lesson=0)
+            user = create_learners(1, prefix='session')[0]
+            lesson = Lesson.objects.first()
+            pages = {
+                'lesson_detail': reverse('lesson_detail', args=[lesson.pk]),
+                'dashboard': reverse('dashboard'),
+            }
+
+            self.stdout.write(f"{'engine':16} {'page':14} {'queries':>8} {'session':>8}")
+            baseline = {}
+            for name, engine in SESSION_ENGINES.items():
+                # Each engine starts from empty caches of its own, never the host's live sessions.
+                with tempfile.TemporaryDirectory() as cache_dir, \
+                        override_settings(SESSION_ENGINE=engine, CACHES=isolated_caches(cache_dir)):
+                    client = Client()
+                    client.force_login(user)
+                    for page, url in pages.items():
+                        client.get(url)  # warm up: progress row, session cache fill
+                        total = session = 0
+                        for _ in range(options['requests']):
+                            with CaptureQueriesContext(connection) as ctx:
+                                client.get(url)
+                            total += len(ctx.captured_queries)
+                            session += sum('django_session' in query['sql'] for query in ctx.captured_queries)
+                        total /= options['requests']
+                        session /= options['requests']
+                        baseline.setdefault(page, total)
+                        saved = baseline[page] - total
+                        self.stdout.write(
+                            f'{name:16} {page:14} {total:8.1f} {session:8.1f}'
+                            + (f'   (-{saved:.1f} vs db)' if saved else '')
+                        )
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from courses import site_stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Show the home page statistics, or --reconcile them with a full recount. '
+        'Use --loop to keep reconciling as a background worker.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reconcile', action='store_true', help='Recount everything from the source tables')
+        parser.add_argument('--loop', action='store_true', help='Run forever, reconciling every --interval seconds')
+        parser.add_argument('--interval', type=int, default=900, help='Seconds between reconciliations with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            stats = site_stats.reconcile() if options['reconcile'] or options['loop'] else site_stats.get()
+            self.stdout.write(
+                f'{stats.technologies} technologies, {stats.courses} courses, {stats.lessons} lessons '
+                f'({stats.content_hours}h), {stats.learners} learners, {stats.exercises_solved} exercises solved '
+                f'(reconciled {stats.reconciled_at:%Y-%m-%d %H:%M})'
+            )
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,77 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0005_leaderboardentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('position', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CourseDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('attempts', models.IntegerField(default=0)),
+                ('successes', models.IntegerField(default=0)),
+                ('score_sum', models.IntegerField(default=0)),
+                ('median_solve_seconds', models.FloatField(blank=True, null=True)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='courses.course')),
+            ],
+            options={
+                'verbose_name_plural': 'Course daily stats',
+                'ordering': ['-day'],
+                'abstract': False,
+                'constraints': [models.UniqueConstraint(fields=('course', 'day'), name='unique_course_day')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ExerciseDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('attempts', models.IntegerField(default=0)),
+                ('successes', models.IntegerField(default=0)),
+                ('score_sum', models.IntegerField(default=0)),
+                ('median_solve_seconds', models.FloatField(blank=True, null=True)),
+                ('exercise', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='courses.interactiveexercise')),
+            ],
+            options={
+                'verbose_name_plural': 'Exercise daily stats',
+                'ordering': ['-day'],
+                'abstract': False,
+                'constraints': [models.UniqueConstraint(fields=('exercise', 'day'), name='unique_exercise_day')],
+            },
+        ),
+        migrations.CreateModel(
+            name='LessonDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('attempts', models.IntegerField(default=0)),
+                ('successes', models.IntegerField(default=0)),
+                ('score_sum', models.IntegerField(default=0)),
+                ('median_solve_seconds', models.FloatField(blank=True, null=True)),
+                ('lesson', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='courses.lesson')),
+            ],
+            options={
+                'verbose_name_plural': 'Lesson daily stats',
+                'ordering': ['-day'],
+                'abstract': False,
+                'constraints': [models.UniqueConstraint(fields=('lesson', 'day'), name='unique_lesson_day')],
+            },
+        ),
+    ]
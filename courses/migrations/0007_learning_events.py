@@ -0,0 +1,67 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:39
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+LESSON_COMPLETED, EXERCISE_SUBMITTED, EXERCISE_PASSED = 2, 3, 4
+
+
+def backfill(apps, schema_editor):
+    """Seed the log from existing attempts and completions so streaks carry over.
+
+    Completions have no timestamp of their own; the progress row's
+    ``updated_at`` is the closest one available.
+    """
+    LearningEvent = apps.get_model('courses', 'LearningEvent')
+    UserExerciseAttempt = apps.get_model('courses', 'UserExerciseAttempt')
+    UserProgress = apps.get_model('users', 'UserProgress')
+
+    def rows():
+        attempts = UserExerciseAttempt.objects.values_list(
+            'user_id', 'exercise_id', 'exercise__lesson__module__course_id', 'attempted_at', 'is_correct', 'completed_at',
+        )
+        for user_id, exercise_id, course_id, attempted_at, is_correct, completed_at in attempts.iterator(chunk_size=2000):
+            yield LearningEvent(occurred_at=attempted_at, user_id=user_id, kind=EXERCISE_SUBMITTED, object_id=exercise_id, course_id=course_id)
+            if is_correct:
+                yield LearningEvent(occurred_at=completed_at or attempted_at, user_id=user_id, kind=EXERCISE_PASSED, object_id=exercise_id, course_id=course_id)
+        completions = UserProgress.completed_lessons.through.objects.values_list(
+            'userprogress__user_id', 'lesson_id', 'userprogress__course_id', 'userprogress__updated_at',
+        )
+        for user_id, lesson_id, course_id, updated_at in completions.iterator(chunk_size=2000):
+            yield LearningEvent(occurred_at=updated_at, user_id=user_id, kind=LESSON_COMPLETED, object_id=lesson_id, course_id=course_id)
+
+    batch = []
+    for event in rows():
+        batch.append(event)
+        if len(batch) >= 2000:
+            LearningEvent.objects.bulk_create(batch)
+            batch = []
+    LearningEvent.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0006_attempt_rollups'),
+        ('users', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LearningEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('occurred_at', models.DateTimeField()),
+                ('kind', models.PositiveSmallIntegerField(choices=[(1, 'Lesson viewed'), (2, 'Lesson completed'), (3, 'Exercise submitted'), (4, 'Exercise passed')])),
+                ('object_id', models.PositiveIntegerField(help_text='Lesson or exercise id, depending on kind')),
+                ('course_id', models.PositiveIntegerField(blank=True, null=True)),
+                ('user', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'occurred_at'], name='learning_event_user_time_idx'), models.Index(fields=['occurred_at'], name='learning_event_time_idx')],
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:50
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+
+def create_singleton(apps, schema_editor):
+    Lesson = apps.get_model('courses', 'Lesson')
+    lessons = Lesson.objects.aggregate(count=Count('id'), minutes=Sum('duration_minutes'))
+    apps.get_model('courses', 'SiteStatistics').objects.create(
+        pk=1,
+        technologies=apps.get_model('courses', 'Technology').objects.count(),
+        courses=apps.get_model('courses', 'Course').objects.filter(is_active=True).count(),
+        lessons=lessons['count'],
+        content_minutes=lessons['minutes'] or 0,
+        learners=apps.get_model(settings.AUTH_USER_MODEL).objects.count(),
+        exercises_solved=apps.get_model('courses', 'UserExerciseAttempt').objects.filter(is_correct=True).count(),
+        reconciled_at=timezone.now(),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0007_learning_events'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SiteStatistics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('technologies', models.IntegerField(default=0)),
+                ('courses', models.IntegerField(default=0)),
+                ('lessons', models.IntegerField(default=0)),
+                ('content_minutes', models.IntegerField(default=0)),
+                ('learners', models.IntegerField(default=0)),
+                ('exercises_solved', models.IntegerField(default=0)),
+                ('reconciled_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Site statistics',
+            },
+        ),
+        migrations.RunPython(create_singleton, migrations.RunPython.noop),
+    ]
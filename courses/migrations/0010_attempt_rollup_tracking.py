@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0009_responsive_images'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userexerciseattempt',
+            name='rollup_day',
+            field=models.DateField(blank=True, editable=False, help_text='Day this attempt is counted under in the daily rollups', null=True),
+        ),
+        migrations.AddField(
+            model_name='userexerciseattempt',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
@@ -53,8 +53,11 @@ class Course(models.Model):
     def get_absolute_url(self):
         return reverse('course_detail', kwargs={'pk': self.pk})
     
-    def lesson_count(self):
+    def lessons_count(self):
         return Lesson.objects.filter(module__course=self).count()
+
+    async def alessons_count(self):
+        return await Lesson.objects.filter(module__course=self).acount()
     
     def total_duration(self):
         from django.db.models import Sum
@@ -202,16 +205,15 @@ class InteractiveExercise(models.Model):
             return 'txt'
     
     def get_total_attempts(self):
-        """Get total number of attempts for this exercise"""
-        return self.attempts.count()
+        """Get total number of attempts for this exercise (as of the last rollup)"""
+        return self.daily_stats.aggregate(total=models.Sum('attempts'))['total'] or 0
     
     def get_success_rate(self):
-        """Calculate success rate for this exercise"""
-        total_attempts = self.get_total_attempts()
-        if total_attempts == 0:
+        """Calculate success rate for this exercise (as of the last rollup)"""
+        totals = self.daily_stats.aggregate(attempts=models.Sum('attempts'), successes=models.Sum('successes'))
+        if not totals['attempts']:
             return 0
-        successful_attempts = self.attempts.filter(is_correct=True).count()
-        return (successful_attempts / total_attempts) * 100
+        return (totals['successes'] / totals['attempts']) * 100
 
 class UserExerciseAttempt(models.Model):
     user = models.ForeignKey('users.CustomUser', on_delete=models.CASCADE)
@@ -300,6 +302,9 @@ class UserExerciseAttempt(models.Model):
     score = models.IntegerField(default=0)
     attempted_at = models.DateTimeField(auto_now_add=True)
     completed_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    rollup_day = models.DateField(null=True, blank=True, editable=False,
+                                  help_text="Day this attempt is counted under in the daily rollups")
     
     class Meta:
         unique_together = ['user', 'exercise']
@@ -323,3 +328,166 @@ class UserExerciseAttempt(models.Model):
         if self.completed_at and self.attempted_at:
             return self.completed_at - self.attempted_at
         return None
+
+
+class LiveEvent(models.Model):
+    """Short-lived per-user update, tailed by devoops_lms.events for the SSE stream"""
+    KIND_CHOICES = [
+        ('progress', 'Course progress'),
+        ('grade', 'Exercise graded'),
+        ('streak', 'Learning streak'),
+    ]
+
+    user = models.ForeignKey('users.CustomUser', on_delete=models.CASCADE, related_name='live_events')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    data = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.kind} for {self.user_id} (#{self.pk})"
+
+
+class LeaderboardEntry(models.Model):
+    """Running score per learner, maintained incrementally by courses.leaderboards"""
+    scope = models.CharField(max_length=32, help_text="'global', 'course:<id>' or 'phase:<n>'")
+    period = models.CharField(max_length=10, help_text="'all' or an ISO week such as '2026-W07'")
+    user = models.ForeignKey('users.CustomUser', on_delete=models.CASCADE, related_name='leaderboard_entries')
+    score = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'period', 'user'], name='unique_leaderboard_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['scope', 'period', '-score', 'user'], name='leaderboard_rank_idx'),
+        ]
+        verbose_name_plural = 'Leaderboard entries'
+
+    def __str__(self):
+        return f"{self.scope} {self.period}: {self.user_id} ({self.score} pts)"
+
+
+class DailyAttemptStats(models.Model):
+    """Per-day exercise attempt aggregates, written by courses.rollups"""
+    day = models.DateField()
+    attempts = models.IntegerField(default=0)
+    successes = models.IntegerField(default=0)
+    score_sum = models.IntegerField(default=0)
+    median_solve_seconds = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        abstract = True
+        ordering = ['-day']
+
+    @property
+    def success_rate(self):
+        return (self.successes / self.attempts) * 100 if self.attempts else 0
+
+    @property
+    def mean_score(self):
+        return self.score_sum / self.attempts if self.attempts else 0
+
+
+class ExerciseDailyStats(DailyAttemptStats):
+    exercise = models.ForeignKey(InteractiveExercise, on_delete=models.CASCADE, related_name='daily_stats')
+
+    class Meta(DailyAttemptStats.Meta):
+        constraints = [models.UniqueConstraint(fields=['exercise', 'day'], name='unique_exercise_day')]
+        verbose_name_plural = 'Exercise daily stats'
+
+
+class LessonDailyStats(DailyAttemptStats):
+    lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name='daily_stats')
+
+    class Meta(DailyAttemptStats.Meta):
+        constraints = [models.UniqueConstraint(fields=['lesson', 'day'], name='unique_lesson_day')]
+        verbose_name_plural = 'Lesson daily stats'
+
+
+class CourseDailyStats(DailyAttemptStats):
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='daily_stats')
+
+    class Meta(DailyAttemptStats.Meta):
+        constraints = [models.UniqueConstraint(fields=['course', 'day'], name='unique_course_day')]
+        verbose_name_plural = 'Course daily stats'
+
+
+class RollupWatermark(models.Model):
+    """How far an incremental rollup has read its source table"""
+    name = models.CharField(max_length=50, unique=True)
+    position = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.position}"
+
+
+class LearningEvent(models.Model):
+    """Append-only activity log, written in batches by courses.activity"""
+    LESSON_VIEWED = 1
+    LESSON_COMPLETED = 2
+    EXERCISE_SUBMITTED = 3
+    EXERCISE_PASSED = 4
+    KIND_CHOICES = [
+        (LESSON_VIEWED, 'Lesson viewed'),
+        (LESSON_COMPLETED, 'Lesson completed'),
+        (EXERCISE_SUBMITTED, 'Exercise submitted'),
+        (EXERCISE_PASSED, 'Exercise passed'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    occurred_at = models.DateTimeField()
+    # No database constraint: batched inserts never wait on locks against user rows.
+    user = models.ForeignKey(
+        'users.CustomUser', on_delete=models.CASCADE, related_name='+', db_index=False, db_constraint=False
+    )
+    kind = models.PositiveSmallIntegerField(choices=KIND_CHOICES)
+    # Plain ids rather than foreign keys: catalog edits never touch the log.
+    object_id = models.PositiveIntegerField(help_text='Lesson or exercise id, depending on kind')
+    course_id = models.PositiveIntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'occurred_at'], name='learning_event_user_time_idx'),
+            models.Index(fields=['occurred_at'], name='learning_event_time_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.object_id} by {self.user_id} at {self.occurred_at}"
+
+
+class SiteStatistics(models.Model):
+    """Singleton row of site-wide counts for the home page, kept by courses.site_stats"""
+    technologies = models.IntegerField(default=0)
+    courses = models.IntegerField(default=0)
+    lessons = models.IntegerField(default=0)
+    content_minutes = models.IntegerField(default=0)
+    learners = models.IntegerField(default=0)
+    exercises_solved = models.IntegerField(default=0)
+    reconciled_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'Site statistics'
+
+    def __str__(self):
+        return f"Site statistics (reconciled {self.reconciled_at})"
+
+    @property
+    def content_hours(self):
+        return round(self.content_minutes / 60)
+
+
+class ResponsiveImage(models.Model):
+    """Resized WebP/AVIF derivatives of one uploaded image, generated by courses.images"""
+    name = models.CharField(max_length=255, unique=True, help_text="Storage name of the original upload")
+    digest = models.CharField(max_length=64, db_index=True, help_text="SHA-256 of the original; derivatives live under it")
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    widths = models.JSONField(default=list)
+    formats = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
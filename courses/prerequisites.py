@@ -0,0 +1,209 @@
+"""
+Course prerequisite graph, loaded once per catalog version.
+
+``Course.prerequisites`` points from a course to the courses it requires.
+``PrerequisiteGraph`` reads every course and edge in two queries and orders the
+courses topologically, breaking ties by phase and order (roadmap order). For
+each course it keeps a bitmap (a Python int) of all its transitive
+prerequisites, so "is this unlocked for a learner" is one AND against the
+bitmap of the courses they have completed, and no query is needed per course or
+per user.
+
+``prerequisite_graph()`` serves the graph for the current catalog version from
+a per-process copy, then the "catalog" cache, then the database. The admin
+rejects prerequisite changes that would create a cycle (``check_prerequisites``).
+"""
+import heapq
+import logging
+from collections import defaultdict
+
+from django.core.cache import caches
+
+from .catalog import catalog_version
+from .models import Course
+
+logger = logging.getLogger(__name__)
+
+COMPLETED = 'completed'
+UNLOCKED = 'unlocked'
+BLOCKED = 'blocked'
+
+
+class PrerequisiteCycle(Exception):
+    def __init__(self, cycle):
+        self.cycle = cycle
+        super().__init__(f"Prerequisite cycle: {' -> '.join(map(str, cycle))}")
+
+
+def topological_order(keys, requires):
+    """Order ``keys`` (course id -> sort key) so prerequisites come first.
+
+    Returns ``(order, leftover)``; ``leftover`` holds the courses on or behind a
+    cycle, which cannot be ordered.
+    """
+    pending = {course_id: len(requires[course_id]) for course_id in keys}
+    dependents = defaultdict(list)
+    for course_id in keys:
+        for required in requires[course_id]:
+            dependents[required].append(course_id)
+    ready = [(keys[course_id], course_id) for course_id, count in pending.items() if count == 0]
+    heapq.heapify(ready)
+    order = []
+    while ready:
+        _, course_id = heapq.heappop(ready)
+        order.append(course_id)
+        for dependent in dependents[course_id]:
+            pending[dependent] -= 1
+            if pending[dependent] == 0:
+                heapq.heappush(ready, (keys[dependent], dependent))
+    leftover = sorted((course_id for course_id, count in pending.items() if count), key=keys.get)
+    return order, leftover
+
+
+def find_cycle(nodes, requires):
+    """One cycle among ``nodes`` as a list of ids ending where it started, or None."""
+    state = {}
+    for start in nodes:
+        if start in state:
+            continue
+        path, stack = [], [(start, iter(sorted(requires[start])))]
+        state[start] = 'active'
+        path.append(start)
+        while stack:
+            node, edges = stack[-1]
+            for required in edges:
+                if state.get(required) == 'active':
+                    return path[path.index(required):] + [required]
+                if required not in state:
+                    state[required] = 'active'
+                    path.append(required)
+                    stack.append((required, iter(sorted(requires[required]))))
+                    break
+            else:
+                state[node] = 'done'
+                path.pop()
+                stack.pop()
+    return None
+
+
+class PrerequisiteGraph:
+    """Immutable snapshot of the course DAG with its transitive closure."""
+
+    def __init__(self, courses, edges):
+        keys, self.titles, active = {}, {}, set()
+        for course_id, title, phase, order, is_active in courses:
+            keys[course_id] = (phase, order, course_id)
+            self.titles[course_id] = title
+            if is_active:
+                active.add(course_id)
+        requires = defaultdict(set)
+        for course_id, required in edges:
+            if course_id in keys and required in keys:
+                requires[course_id].add(required)
+
+        order, leftover = topological_order(keys, requires)
+        if leftover:
+            # Saved outside the admin; edges pointing forward in the order are ignored.
+            logger.error('Prerequisite cycle: %s', find_cycle(leftover, requires))
+        self.order = order + leftover
+        self.index = {course_id: position for position, course_id in enumerate(self.order)}
+        self.requires = {
+            course_id: sorted(requires[course_id], key=self.index.get) for course_id in self.order
+        }
+        self.ancestors = []
+        for position, course_id in enumerate(self.order):
+            bits = 0
+            for required in self.requires[course_id]:
+                required_position = self.index[required]
+                if required_position < position:
+                    bits |= self.ancestors[required_position] | (1 << required_position)
+            self.ancestors.append(bits)
+        self.active = self.mask(active)
+
+    @classmethod
+    def load(cls):
+        courses = Course.objects.values_list(
+            'id', 'title', 'technology__phase', 'technology__order', 'is_active'
+        )
+        edges = Course.prerequisites.through.objects.values_list('from_course_id', 'to_course_id')
+        return cls(courses, edges)
+
+    def mask(self, course_ids):
+        bits = 0
+        for course_id in course_ids:
+            position = self.index.get(course_id)
+            if position is not None:
+                bits |= 1 << position
+        return bits
+
+    def _ids(self, bits):
+        return [self.order[position] for position in range(bits.bit_length()) if bits >> position & 1]
+
+    def active_ids(self):
+        """Active courses in prerequisite order."""
+        return self._ids(self.active)
+
+    def missing(self, course_id, completed):
+        """Active prerequisites of ``course_id`` (direct or not) not yet completed, in order."""
+        position = self.index.get(course_id)
+        if position is None:
+            return []
+        return self._ids(self.ancestors[position] & self.active & ~self.mask(completed))
+
+    def status(self, completed):
+        """``{course_id: COMPLETED | UNLOCKED | BLOCKED}`` for every active course."""
+        done = self.mask(completed)
+        result = {}
+        for position, course_id in enumerate(self.order):
+            if not self.active >> position & 1:
+                continue
+            if done >> position & 1:
+                result[course_id] = COMPLETED
+            elif self.ancestors[position] & self.active & ~done:
+                result[course_id] = BLOCKED
+            else:
+                result[course_id] = UNLOCKED
+        return result
+
+    def next_recommended(self, completed, started=()):
+        """The first unlocked course the learner has started, else the first unlocked one."""
+        status = self.status(completed)
+        unlocked = [course_id for course_id in self.order if status.get(course_id) == UNLOCKED]
+        started = set(started)
+        for course_id in unlocked:
+            if course_id in started:
+                return course_id
+        return unlocked[0] if unlocked else None
+
+
+_local = (None, None)
+
+
+def prerequisite_graph():
+    """The graph for the current catalog version."""
+    global _local
+    version = catalog_version()
+    local_version, graph = _local
+    if local_version == version:
+        return graph
+    cache = caches['catalog']
+    key = f'prerequisites:{version}'
+    graph = cache.get(key)
+    if graph is None:
+        graph = PrerequisiteGraph.load()
+        cache.set(key, graph)
+    _local = (version, graph)
+    return graph
+
+
+def check_prerequisites(course, prerequisites):
+    """Raise PrerequisiteCycle if giving ``course`` these prerequisites would create a cycle."""
+    if course.pk is None:
+        return  # Nothing can require a course that does not exist yet.
+    requires = defaultdict(set)
+    for course_id, required in Course.prerequisites.through.objects.values_list('from_course_id', 'to_course_id'):
+        requires[course_id].add(required)
+    requires[course.pk] = {required.pk for required in prerequisites}
+    cycle = find_cycle([course.pk], requires)
+    if cycle:
+        raise PrerequisiteCycle(cycle)
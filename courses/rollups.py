@@ -0,0 +1,130 @@
+"""
+Daily exercise-attempt rollups per exercise, lesson and course.
+
+``refresh()`` finds the attempts modified since its high-water mark (by the
+indexed ``updated_at``), works out which days they touch, recomputes the
+aggregates for those days from every attempt on them (attempts, successes,
+score sum, median seconds from ``attempted_at`` to ``completed_at`` for solved
+attempts), and replaces them in ``ExerciseDailyStats``, ``LessonDailyStats``
+and ``CourseDailyStats``, all in one transaction. The admin and reports read
+the rollups rather than scanning the attempts table.
+
+An attempt row is updated in place on every retry. It counts on the day of its
+``attempted_at``, and ``rollup_day`` records the day it was last counted on. A
+retry can move it to a later day or change its outcome without moving it, so
+both the old and the new day are recomputed. Deleted attempts are only dropped
+by ``--rebuild``. Run ``python manage.py rollup_attempts`` from cron, or with
+``--loop``.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from statistics import median
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import CourseDailyStats, ExerciseDailyStats, LessonDailyStats, RollupWatermark, UserExerciseAttempt
+
+WATERMARK = 'exercise_attempts'
+LEVELS = (
+    (ExerciseDailyStats, 'exercise_id'),
+    (LessonDailyStats, 'lesson_id'),
+    (CourseDailyStats, 'course_id'),
+)
+# Re-read a little before the mark: a row saved just before the last run may have committed after it.
+OVERLAP = timedelta(minutes=1)
+
+
+class _Totals:
+    __slots__ = ('attempts', 'successes', 'score_sum', 'solve_seconds')
+
+    def __init__(self):
+        self.attempts = self.successes = self.score_sum = 0
+        self.solve_seconds = []
+
+    def add(self, is_correct, score, attempted_at, completed_at):
+        self.attempts += 1
+        self.score_sum += score
+        if is_correct:
+            self.successes += 1
+            if completed_at and attempted_at and completed_at >= attempted_at:
+                self.solve_seconds.append((completed_at - attempted_at).total_seconds())
+
+    def fields(self):
+        return {
+            'attempts': self.attempts,
+            'successes': self.successes,
+            'score_sum': self.score_sum,
+            'median_solve_seconds': median(self.solve_seconds) if self.solve_seconds else None,
+        }
+
+
+def _day_ranges(days):
+    """``Q`` matching ``attempted_at`` on any of ``days``, one range per run of consecutive days."""
+    query = Q()
+    days = sorted(days)
+    while days:
+        first = last = days.pop(0)
+        while days and days[0] == last + timedelta(days=1):
+            last = days.pop(0)
+        query |= Q(
+            attempted_at__gte=timezone.make_aware(datetime.combine(first, time.min)),
+            attempted_at__lt=timezone.make_aware(datetime.combine(last + timedelta(days=1), time.min)),
+        )
+    return query
+
+
+def refresh(rebuild=False, chunk_size=2000):
+    """Bring the rollups up to date; returns ``(days recomputed or None for all, attempts read)``."""
+    with transaction.atomic():
+        watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(name=WATERMARK)
+        now = timezone.now()
+        rebuild = rebuild or watermark.position is None
+
+        attempts = UserExerciseAttempt.objects.all()
+        days = None
+        if not rebuild:
+            days = set()
+            changed = attempts.filter(updated_at__gte=watermark.position - OVERLAP).values_list('attempted_at', 'rollup_day')
+            for attempted_at, rollup_day in changed.iterator(chunk_size=chunk_size):
+                days.add(timezone.localdate(attempted_at))
+                if rollup_day is not None:
+                    days.add(rollup_day)
+            if not days:
+                watermark.position = now
+                watermark.save()
+                return days, 0
+            attempts = attempts.filter(_day_ranges(days))
+
+        rows = attempts.values_list(
+            'pk', 'rollup_day', 'exercise_id', 'exercise__lesson_id', 'exercise__lesson__module__course_id',
+            'is_correct', 'score', 'attempted_at', 'completed_at',
+        ).iterator(chunk_size=chunk_size)
+
+        totals = [defaultdict(_Totals) for _ in LEVELS]
+        moved = defaultdict(list)
+        count = 0
+        for pk, rollup_day, exercise_id, lesson_id, course_id, is_correct, score, attempted_at, completed_at in rows:
+            day = timezone.localdate(attempted_at)
+            for level, object_id in zip(totals, (exercise_id, lesson_id, course_id)):
+                level[object_id, day].add(is_correct, score, attempted_at, completed_at)
+            if rollup_day != day:
+                moved[day].append(pk)
+            count += 1
+
+        for (model, field), level in zip(LEVELS, totals):
+            stale = model.objects.all() if days is None else model.objects.filter(day__in=days)
+            stale.delete()
+            model.objects.bulk_create(
+                [model(**{field: object_id}, day=day, **total.fields()) for (object_id, day), total in level.items()],
+                batch_size=1000,
+            )
+        # update() leaves updated_at alone, so this does not mark the rows changed again.
+        for day, pks in moved.items():
+            for offset in range(0, len(pks), chunk_size):
+                UserExerciseAttempt.objects.filter(pk__in=pks[offset:offset + chunk_size]).update(rollup_day=day)
+
+        watermark.position = now
+        watermark.save()
+    return days, count
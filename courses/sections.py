@@ -0,0 +1,54 @@
+"""
+Lazily loaded lesson sections.
+
+The lesson page ships the lesson text and navigation only; code examples and
+interactive exercises are fetched from ``lesson_sections`` when the reader
+scrolls near them. ``payload()`` builds the JSON for one lesson with a single
+prefetching query per relation and keeps it in the "catalog" cache under the
+catalog version, so it is rebuilt only after a content edit. Exercises are sent
+as HTML rendered from the same component the exercise page uses; code examples
+as plain fields that the page turns into markup.
+"""
+from django.core.cache import caches
+from django.template.loader import render_to_string
+
+from . import images
+from .catalog import catalog_version
+from .models import Lesson
+
+
+def _build(lesson_id):
+    lesson = Lesson.objects.filter(pk=lesson_id).prefetch_related('code_examples', 'interactive_exercises').first()
+    if lesson is None:
+        return None
+    return {
+        'code_examples': [
+            {
+                'title': example.title,
+                'language': example.language,
+                'code': example.code,
+                'explanation': images.rewrite_html(example.explanation) if example.explanation else '',
+            }
+            for example in lesson.code_examples.all()
+        ],
+        'exercises': [
+            {
+                'id': exercise.id,
+                'html': render_to_string('courses/components/code_background.html', {'exercise': exercise}),
+            }
+            for exercise in lesson.interactive_exercises.all()
+        ],
+    }
+
+
+def payload(lesson_id):
+    """``(catalog version, sections dict)`` for a lesson; the dict is ``None`` when it does not exist."""
+    version = catalog_version()
+    key = f'lesson:sections:{lesson_id}:{version}'
+    cache = caches['catalog']
+    sections = cache.get(key)
+    if sections is None:
+        sections = _build(lesson_id)
+        if sections is not None:
+            cache.set(key, sections)
+    return version, sections
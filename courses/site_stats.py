@@ -0,0 +1,126 @@
+"""
+Site-wide counts for the home page, kept in one ``SiteStatistics`` row.
+
+Catalog counts (technologies, active courses, lessons, content minutes) are
+recounted after commit whenever a catalog row is saved or deleted; that happens
+rarely and costs three aggregate queries. Learner and solved-exercise counts
+change all the time, so signals apply ``F()`` increments instead. Writes that
+bypass signals are caught by ``python manage.py site_stats --reconcile``
+(cron, or ``--loop``), which recounts everything.
+
+Readers go through ``get()``: a per-worker copy kept for
+``SITE_STATS_LOCAL_SECONDS``, then the shared cache, then the row. In steady
+state the home page therefore runs no queries.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Course, Lesson, SiteStatistics, Technology, UserExerciseAttempt
+
+CACHE_KEY = 'site:stats'
+SINGLETON_ID = 1
+
+_local = (0.0, None)
+
+
+def get():
+    """The current statistics row (possibly ``SITE_STATS_LOCAL_SECONDS`` old)."""
+    global _local
+    expires, stats = _local
+    now = time.monotonic()
+    if stats is not None and now < expires:
+        return stats
+    cache = caches['default']
+    stats = cache.get(CACHE_KEY)
+    if stats is None:
+        stats = SiteStatistics.objects.filter(pk=SINGLETON_ID).first() or reconcile()
+        cache.set(CACHE_KEY, stats, settings.SITE_STATS_CACHE_SECONDS)
+    _local = (now + settings.SITE_STATS_LOCAL_SECONDS, stats)
+    return stats
+
+
+def _invalidate():
+    global _local
+    _local = (0.0, None)
+    caches['default'].delete(CACHE_KEY)
+
+
+def _catalog_counts():
+    lessons = Lesson.objects.aggregate(count=Count('id'), minutes=Sum('duration_minutes'))
+    return {
+        'technologies': Technology.objects.count(),
+        'courses': Course.objects.filter(is_active=True).count(),
+        'lessons': lessons['count'],
+        'content_minutes': lessons['minutes'] or 0,
+    }
+
+
+def reconcile():
+    """Recount everything from the source tables."""
+    counts = {
+        **_catalog_counts(),
+        'learners': get_user_model().objects.count(),
+        'exercises_solved': UserExerciseAttempt.objects.filter(is_correct=True).count(),
+        'reconciled_at': timezone.now(),
+    }
+    stats, _ = SiteStatistics.objects.update_or_create(pk=SINGLETON_ID, defaults=counts)
+    transaction.on_commit(_invalidate)
+    return stats
+
+
+def refresh_catalog_counts():
+    SiteStatistics.objects.filter(pk=SINGLETON_ID).update(**_catalog_counts(), updated_at=timezone.now())
+    _invalidate()
+
+
+def increment(field, delta):
+    if delta:
+        SiteStatistics.objects.filter(pk=SINGLETON_ID).update(**{field: F(field) + delta}, updated_at=timezone.now())
+        transaction.on_commit(_invalidate)
+
+
+def _catalog_changed(sender, **kwargs):
+    transaction.on_commit(refresh_catalog_counts)
+
+
+for model in (Technology, Course, Lesson):
+    post_save.connect(_catalog_changed, sender=model, dispatch_uid=f'site_stats_save_{model.__name__}')
+    post_delete.connect(_catalog_changed, sender=model, dispatch_uid=f'site_stats_delete_{model.__name__}')
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL, dispatch_uid='site_stats_user_saved')
+def _user_saved(sender, instance, created, **kwargs):
+    if created:
+        increment('learners', 1)
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL, dispatch_uid='site_stats_user_deleted')
+def _user_deleted(sender, instance, **kwargs):
+    increment('learners', -1)
+
+
+@receiver(post_init, sender=UserExerciseAttempt, dispatch_uid='site_stats_attempt_init')
+def _remember_solved(sender, instance, **kwargs):
+    # None when is_correct was deferred; reconciliation covers those saves.
+    instance._site_stats_solved = instance.__dict__.get('is_correct') if instance.pk else False
+
+
+@receiver(post_save, sender=UserExerciseAttempt, dispatch_uid='site_stats_attempt_saved')
+def _attempt_saved(sender, instance, **kwargs):
+    previous, instance._site_stats_solved = instance._site_stats_solved, instance.is_correct
+    if previous is not None:
+        increment('exercises_solved', int(instance.is_correct) - int(previous))
+
+
+@receiver(post_delete, sender=UserExerciseAttempt, dispatch_uid='site_stats_attempt_deleted')
+def _attempt_deleted(sender, instance, **kwargs):
+    if instance._site_stats_solved:
+        increment('exercises_solved', -1)
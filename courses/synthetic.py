@@ -0,0 +1,143 @@
+"""
+Deterministic synthetic catalog and learners for benchmarks and tests.
+
+Everything is created in bulk so seeding stays fast even for larger sizes.
+"""
+import shutil
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.db import connection, connections
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from devoops_lms.testing import isolated_caches
+
+from . import activity
+from .catalog import bump_catalog_version
+from .models import Course, InteractiveExercise, Lesson, Module, Technology, WorkflowDiagram
+
+DEFAULT_PASSWORD = 'bench-pass-123'
+
+
+def create_catalog(phases=3, technologies_per_phase=2, modules_per_course=2, lessons_per_module=4,
+                   exercises_per_lesson=1):
+    """Create technologies, courses, modules, lessons and exercises; return the courses.
+
+    Every course requires all courses of the previous phase.
+    """
+    categories = [key for key, _ in Technology.TECHNOLOGY_CATEGORIES]
+    technologies = Technology.objects.bulk_create([
+        Technology(
+            name=f'Tech {phase}.{order}',
+            category=categories[(phase + order) % len(categories)],
+            description=f'Synthetic technology {phase}.{order} for benchmarking',
+            phase=phase,
+            order=order,
+        )
+        for phase in range(1, phases + 1)
+        for order in range(1, technologies_per_phase + 1)
+    ])
+    courses = Course.objects.bulk_create([
+        Course(
+            technology=tech,
+            title=f'{tech.name} Fundamentals',
+            description=f'Learn {tech.name} from scratch',
+            difficulty='beginner',
+            estimated_duration=5,
+        )
+        for tech in technologies
+    ])
+    Course.prerequisites.through.objects.bulk_create([
+        Course.prerequisites.through(from_course=course, to_course=required)
+        for course in courses
+        for required in courses
+        if required.technology.phase == course.technology.phase - 1
+    ])
+    WorkflowDiagram.objects.bulk_create([
+        WorkflowDiagram(
+            technology=tech,
+            title=f'{tech.name} workflow',
+            description='Synthetic workflow',
+            diagram_data='graph TD; A-->B;',
+            order=1,
+        )
+        for tech in technologies
+    ])
+    modules = Module.objects.bulk_create([
+        Module(course=course, title=f'Module {order}', description='Synthetic module', order=order)
+        for course in courses
+        for order in range(1, modules_per_course + 1)
+    ])
+    lessons = Lesson.objects.bulk_create([
+        Lesson(
+            module=module,
+            title=f'{module.course.title} {module.order}.{order}',
+            content='<p>Synthetic lesson content.</p>',
+            lesson_type='theory',
+            order=order,
+            duration_minutes=15,
+        )
+        for module in modules
+        for order in range(1, lessons_per_module + 1)
+    ])
+    InteractiveExercise.objects.bulk_create([
+        InteractiveExercise(
+            lesson=lesson,
+            title=f'Exercise {order}',
+            exercise_type='code',
+            instructions='<p>Initialise a repository.</p>',
+            solution_code='git init',
+            options={'correct_answer': 'a'},
+            order=order,
+        )
+        for lesson in lessons
+        for order in range(1, exercises_per_lesson + 1)
+    ])
+    bump_catalog_version()
+    return courses
+
+
+def create_learners(count, prefix='learner'):
+    """Create ``count`` users sharing DEFAULT_PASSWORD."""
+    User = get_user_model()
+    template = User(username='template')
+    template.set_password(DEFAULT_PASSWORD)
+    return User.objects.bulk_create([
+        User(username=f'{prefix}{index}', email=f'{prefix}{index}@example.com', password=template.password)
+        for index in range(count)
+    ])
+
+
+@contextmanager
+def temporary_database():
+    """
+    Run the block against a freshly migrated throwaway copy of the default database.
+
+    SQLite uses a real file rather than the in-memory test database, so
+    benchmarks see journaling and locking behaviour. Every cache alias is
+    swapped for an empty SQLite file in the same temporary directory: synthetic
+    pages, fragments and sessions must never reach the host's live caches.
+    """
+    tmpdir = tempfile.mkdtemp(prefix='devoops-bench-')
+    test_settings = connection.settings_dict.setdefault('TEST', {})
+    old_test_name = test_settings.get('NAME')
+    if connection.vendor == 'sqlite':
+        test_settings['NAME'] = str(Path(tmpdir) / 'benchmark.sqlite3')
+
+    setup_test_environment()
+    # create_test_db() returns the test database's name; the real one is restored from here.
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        with override_settings(CACHES=isolated_caches(Path(tmpdir) / 'cache')):
+            yield
+    finally:
+        # Events buffered for the throwaway database must not be flushed at exit into the real one's place.
+        activity.discard()
+        connections.close_all()
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        test_settings['NAME'] = old_test_name
+        teardown_test_environment()
+        shutil.rmtree(tmpdir, ignore_errors=True)
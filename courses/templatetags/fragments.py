@@ -0,0 +1,46 @@
+from django import template
+
+from courses.fragments import get_or_render
+
+register = template.Library()
+
+
+class FragmentNode(template.Node):
+    def __init__(self, nodelist, name, user, vary_on):
+        self.nodelist = nodelist
+        self.name = name
+        self.user = user
+        self.vary_on = vary_on
+
+    def render(self, context):
+        return get_or_render(
+            self.name.resolve(context),
+            lambda: self.nodelist.render(context),
+            user=self.user.resolve(context) if self.user else None,
+            vary_on=[value.resolve(context) for value in self.vary_on],
+        )
+
+
+@register.tag('fragment')
+def do_fragment(parser, token):
+    """
+    Cache the enclosed block, keyed on the catalog version::
+
+        {% fragment "course_grid" user=user page_obj.number %}...{% endfragment %}
+
+    ``user=`` adds the learner's id and progress version to the key; any
+    further arguments are resolved and added as well.
+    """
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' needs a fragment name")
+    nodelist = parser.parse(('endfragment',))
+    parser.delete_first_token()
+
+    user, vary_on = None, []
+    for bit in bits[2:]:
+        if bit.startswith('user='):
+            user = parser.compile_filter(bit[len('user='):])
+        else:
+            vary_on.append(parser.compile_filter(bit))
+    return FragmentNode(nodelist, parser.compile_filter(bits[1]), user, vary_on)
@@ -0,0 +1,26 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from courses import images
+
+register = template.Library()
+
+
+@register.filter
+def srcset(image_file, fmt='webp'):
+    """
+    ``srcset`` value for an ImageField's derivatives in one format::
+
+        <source type="image/webp" srcset="{{ technology.logo|srcset:'webp' }}">
+
+    Empty until the derivatives exist.
+    """
+    name = getattr(image_file, 'name', image_file)
+    image = images.lookup([name]).get(name) if name else None
+    return images.srcset(image, fmt) if image else ''
+
+
+@register.filter(is_safe=True)
+def responsive_images(content, sizes=None):
+    """Wrap uploaded ``<img>`` tags in rich text in ``<picture>`` elements with WebP/AVIF sources."""
+    return mark_safe(images.rewrite_html(str(content), sizes))
@@ -1,3 +1,814 @@
-from django.test import TestCase
+import asyncio
+import csv
+import gzip
+import io
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.signals import request_finished
+from django.db import connection
+from django.forms.models import model_to_dict
+from django.template import Context, Template
+from django.test import LiveServerTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+
+from devoops_lms.assets import IMMUTABLE_CACHE_CONTROL
+from devoops_lms.instrumentation import recorder
+from devoops_lms.media import ContentAddressedStorage
+from devoops_lms.testing import ClearCachesMixin
+from users.models import CustomUser, UserProgress
+
+from . import activity, bundles, exports, images, leaderboards, loadtest, rollups, site_stats
+from .admin import CourseAdminForm
+from .analytics import current_phase, phase_progress
+from .catalog import bump_catalog_version, catalog_version
+from .benchmarks import AUDIENCES, QUERY_BUDGETS, SCENARIOS, measure, seed_dataset
+from .fragments import fragment_key
+from .loadtest import Catalog, run_load
+from .management.commands.loadtest import Command as LoadTestCommand
+from .models import (
+    CodeExample,
+    Course,
+    CourseDailyStats,
+    ExerciseDailyStats,
+    InteractiveExercise,
+    LeaderboardEntry,
+    LearningEvent,
+    Lesson,
+    LiveEvent,
+    LessonDailyStats,
+    ResponsiveImage,
+    RollupWatermark,
+    Technology,
+    UserExerciseAttempt,
+)
+from .prerequisites import BLOCKED, COMPLETED, UNLOCKED, prerequisite_graph
+from .synthetic import DEFAULT_PASSWORD, create_catalog, create_learners
+
+
+class QueryBudgetTests(ClearCachesMixin, TestCase):
+    """Fail when a view exceeds its query budget in courses.benchmarks.QUERY_BUDGETS."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.dataset = seed_dataset()
+
+    def test_every_named_url_is_covered(self):
+        from devoops_lms.urls import urlpatterns as project_patterns
+        from .urls import urlpatterns as course_patterns
+
+        named = {pattern.name for pattern in [*project_patterns, *course_patterns] if getattr(pattern, 'name', None)}
+        self.assertEqual(named - {scenario.url_name for scenario in SCENARIOS}, set())
+
+    def test_query_budgets(self):
+        for scenario in SCENARIOS:
+            for audience in AUDIENCES:
+                with self.subTest(scenario=scenario.name, audience=audience):
+                    response, queries, _ = measure(scenario, audience, self.dataset)
+                    self.assertEqual(response.status_code, scenario.expected_status[audience])
+                    budget = QUERY_BUDGETS[(scenario.name, audience)]
+                    self.assertLessEqual(
+                        len(queries), budget,
+                        f'{len(queries)} queries (budget {budget}):\n'
+                        + '\n'.join(query['sql'] for query in queries),
+                    )
+
+
+class AsyncEndpointTests(TestCase):
+    """The JSON endpoints are async views; drive them through the ASGI request path."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.dataset = seed_dataset()
+
+    def setUp(self):
+        self.async_client.force_login(self.dataset['user'])
+
+    async def test_search_suggestions(self):
+        response = await self.async_client.get('/courses/search/suggestions/', {'q': 'Tech 1.1'})
+        texts = [suggestion['text'] for suggestion in response.json()['suggestions']]
+        self.assertIn('Tech 1.1 Fundamentals', texts)
+        self.assertIn('Tech 1.1', texts)
+
+    async def test_get_course_progress(self):
+        response = await self.async_client.get(f"/courses/course/{self.dataset['course']}/progress/")
+        self.assertEqual(response.json(), {'progress_percentage': 37, 'completed_lessons': 3, 'total_lessons': 8})
+
+    async def test_validate_exercise_records_attempt(self):
+        response = await self.async_client.post(
+            f"/courses/exercise/{self.dataset['exercise']}/validate/", {'code': 'git  init'},
+            content_type='application/json',
+        )
+        self.assertTrue(response.json()['success'])
+        attempt = await UserExerciseAttempt.objects.aget(
+            user=self.dataset['user'], exercise_id=self.dataset['exercise'],
+        )
+        self.assertTrue(attempt.is_correct)
+
+    async def test_submit_quiz_answer(self):
+        response = await self.async_client.post(
+            f"/courses/exercise/{self.dataset['exercise']}/quiz/", {'answer': 'b'},
+            content_type='application/json',
+        )
+        self.assertEqual(response.json()['answers'], {'user_answer': 'b', 'correct_answer': 'a'})
+
+    async def test_anonymous_requests_redirect_to_login(self):
+        await self.async_client.alogout()
+        response = await self.async_client.get(f"/courses/course/{self.dataset['course']}/progress/")
+        self.assertEqual(response.status_code, 302)
+
+
+class LoadTestHarnessTests(ClearCachesMixin, LiveServerTestCase):
+    def test_learner_journey_against_live_server(self):
+        courses = create_catalog(phases=1, technologies_per_phase=1)
+        users = create_learners(2, prefix='loadtest')
+        catalog = Catalog(
+            courses=[course.pk for course in courses],
+            lessons_by_course={courses[0].pk: list(Lesson.objects.values_list('id', flat=True))},
+            exercises=list(InteractiveExercise.objects.values_list('id', flat=True)),
+        )
+        # The live server threads share one in-memory SQLite connection, so
+        # learners run one after another here.
+        report = asyncio.run(run_load(
+            self.live_server_url, catalog, [(user.username, DEFAULT_PASSWORD) for user in users],
+            concurrency=1, journeys=2, think_time=(0, 0),
+        ))
+
+        self.assertEqual(report['journeys'], 2)
+        self.assertEqual(report['errors'], 0, report['urls'])
+        for name in ('account_login', 'dashboard', 'course_detail', 'lesson_detail',
+                     'mark_lesson_complete', 'validate_exercise', 'search_suggestions', 'search'):
+            self.assertIn(name, report['urls'])
+        self.assertTrue(UserProgress.objects.filter(user=users[0], completed_lessons__isnull=False).exists())
+
+    def test_learner_backs_off_and_gives_up_when_login_fails(self):
+        course = create_catalog(phases=1, technologies_per_phase=1)[0]
+        user = create_learners(1, prefix='badlogin')[0]
+        catalog = Catalog(courses=[course.pk], lessons_by_course={}, exercises=[])
+        with mock.patch.object(loadtest, 'LOGIN_BACKOFF_SECONDS', 0):
+            report = asyncio.run(run_load(
+                self.live_server_url, catalog, [(user.username, 'wrong')], concurrency=1, journeys=50, think_time=(0, 0),
+            ))
+        self.assertEqual(report['aborted_learners'], [user.username])
+        self.assertEqual(report['urls']['account_login']['errors'], loadtest.MAX_LOGIN_FAILURES)
+
+    def test_create_users_keeps_existing_accounts(self):
+        course = create_catalog(phases=1, technologies_per_phase=1)[0]
+        existing = create_learners(1, prefix='loadtest')[0]
+        UserProgress.objects.create(user=existing, course=course)
+        options = {'user_prefix': 'loadtest', 'password': 'new-pass', 'concurrency': 2, 'create_users': True}
+        credentials = LoadTestCommand().credentials(options)
+
+        self.assertEqual(credentials, [('loadtest0', 'new-pass'), ('loadtest1', 'new-pass')])
+        existing.refresh_from_db()
+        self.assertTrue(existing.check_password('new-pass'))
+        self.assertTrue(UserProgress.objects.filter(user=existing).exists())
+        self.assertTrue(CustomUser.objects.get(username='loadtest1').check_password('new-pass'))
+
+
+class PrerequisiteGraphTests(ClearCachesMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # Three phases of two courses; each course requires the whole previous phase.
+        cls.courses = create_catalog(phases=3, technologies_per_phase=2, modules_per_course=1, lessons_per_module=1)
+
+    def ids(self, *indexes):
+        return [self.courses[index].pk for index in indexes]
+
+    def test_status_uses_transitive_prerequisites(self):
+        graph = prerequisite_graph()
+        self.assertEqual(graph.order, self.ids(0, 1, 2, 3, 4, 5))
+        self.assertEqual(graph.missing(self.courses[4].pk, set()), self.ids(0, 1, 2, 3))
+
+        status = graph.status(set(self.ids(0, 1)))
+        self.assertEqual([status[pk] for pk in self.ids(0, 2, 4)], [COMPLETED, UNLOCKED, BLOCKED])
+        self.assertEqual(graph.next_recommended(set(self.ids(0, 1)), started=self.ids(3)), self.courses[3].pk)
+        self.assertEqual(graph.next_recommended(set(self.ids(0, 1))), self.courses[2].pk)
+
+    def test_inactive_prerequisites_are_skipped(self):
+        self.courses[0].is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.courses[0].save()
+        self.assertEqual(prerequisite_graph().missing(self.courses[2].pk, set()), self.ids(1))
+
+    def test_graph_is_cached_until_the_catalog_changes(self):
+        prerequisite_graph()
+        with self.assertNumQueries(0):
+            graph = prerequisite_graph()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.courses[1].prerequisites.add(self.courses[0])
+        self.assertIsNot(prerequisite_graph(), graph)
+        self.assertEqual(prerequisite_graph().missing(self.courses[1].pk, set()), self.ids(0))
+
+    def test_admin_rejects_a_cycle(self):
+        first = self.courses[0]
+        data = {**model_to_dict(first), 'prerequisites': [self.courses[4].pk]}
+        form = CourseAdminForm(data=data, instance=first)
+        self.assertFalse(form.is_valid())
+        self.assertIn('would create a cycle', form.errors['prerequisites'][0])
+        self.assertIn(first.title, form.errors['prerequisites'][0])
+
+
+class PhaseProgressTests(ClearCachesMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.courses = create_catalog(phases=3, technologies_per_phase=2, modules_per_course=1, lessons_per_module=1)
+        cls.user = create_learners(1, prefix='phases')[0]
+        UserProgress.objects.create(user=cls.user, course=cls.courses[0], progress_percentage=100)
+        cls.progress = UserProgress.objects.create(user=cls.user, course=cls.courses[2], progress_percentage=40)
+
+    def test_grouped_per_phase(self):
+        phases = phase_progress(self.user)
+        self.assertEqual(list(phases), [1, 2, 3])
+        self.assertEqual((phases[1].completed, phases[1].percent), (1, 50))
+        self.assertEqual((phases[2].enrolled, phases[2].average_progress, phases[2].percent), (1, 40, 0))
+        self.assertEqual(phases[3].enrolled, 0)
+        self.assertEqual(current_phase(phases), 2)
+
+    def test_cached_until_progress_changes(self):
+        phase_progress(self.user)
+        with self.assertNumQueries(0):
+            phase_progress(self.user)
+        self.progress.progress_percentage = 100
+        with self.captureOnCommitCallbacks(execute=True):
+            self.progress.save()
+        with self.assertNumQueries(1):
+            phases = phase_progress(self.user)
+        self.assertEqual(phases[2].completed, 1)
+
+
+class LeaderboardTests(ClearCachesMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.courses = create_catalog(phases=2, technologies_per_phase=1, modules_per_course=1, lessons_per_module=1)
+        cls.exercises = list(InteractiveExercise.objects.order_by('lesson__module__course__technology__phase'))
+        cls.users = create_learners(3, prefix='board')
+
+    def score(self, user, exercise, points):
+        attempt, _ = UserExerciseAttempt.objects.get_or_create(user=user, exercise=exercise)
+        attempt.score = points
+        attempt.save()
+        return attempt
+
+    def board(self, scope=leaderboards.GLOBAL, period=leaderboards.ALL_TIME):
+        return [(entry['rank'], entry['user_id'], entry['score'])
+                for entry in leaderboards.top(scope, period, cached=False)]
+
+    def test_scores_are_applied_incrementally_per_scope(self):
+        first, second, third = self.users
+        self.score(first, self.exercises[0], 10)
+        self.score(second, self.exercises[0], 5)
+        self.score(second, self.exercises[1], 5)
+        self.score(third, self.exercises[1], 3)
+
+        self.assertEqual(self.board(), [(1, first.pk, 10), (1, second.pk, 10), (3, third.pk, 3)])
+        self.assertEqual(self.board(leaderboards.phase_scope(2)), [(1, second.pk, 5), (2, third.pk, 3)])
+        self.assertEqual(self.board(leaderboards.course_scope(self.courses[0].pk)), [(1, first.pk, 10), (2, second.pk, 5)])
+        self.assertEqual(leaderboards.rank(third.pk), {'rank': 3, 'score': 3, 'total': 3})
+
+    def test_weekly_board_ignores_drops_and_rebuild_matches(self):
+        first, second, _ = self.users
+        attempt = self.score(first, self.exercises[0], 10)
+        self.score(second, self.exercises[1], 4)
+        attempt.score = 2
+        attempt.save()
+        UserExerciseAttempt.objects.get(user=second).delete()
+
+        self.assertEqual(self.board(), [(1, first.pk, 2)])
+        self.assertEqual(self.board(period=leaderboards.week_period()), [(1, first.pk, 10), (2, second.pk, 4)])
+
+        incremental = self.board(leaderboards.course_scope(self.courses[0].pk))
+        leaderboards.rebuild()
+        self.assertEqual(self.board(), [(1, first.pk, 2)])
+        self.assertEqual(self.board(leaderboards.course_scope(self.courses[0].pk)), incremental)
+
+    def test_old_weeks_are_dropped_on_rollover(self):
+        LeaderboardEntry.objects.create(scope=leaderboards.GLOBAL, period='2000-W01', user=self.users[0], score=5)
+        self.score(self.users[1], self.exercises[0], 1)
+        self.assertFalse(LeaderboardEntry.objects.filter(period='2000-W01').exists())
+
+    def test_leaderboard_page(self):
+        self.score(self.users[0], self.exercises[0], 7)
+        self.client.force_login(self.users[0])
+        response = self.client.get('/courses/leaderboard/', {'scope': leaderboards.phase_scope(1), 'period': 'week'})
+        self.assertEqual(response.context['my_rank']['rank'], 1)
+        self.assertContains(response, self.users[0].username)
+
+    def test_inactive_courses_get_no_board(self):
+        Course.objects.filter(pk=self.courses[1].pk).update(is_active=False)
+        bump_catalog_version()
+        self.client.force_login(self.users[0])
+        inactive = leaderboards.course_scope(self.courses[1].pk)
+        response = self.client.get('/courses/leaderboard/', {'scope': inactive})
+        scopes = dict(response.context['scopes'])
+        self.assertNotIn(inactive, scopes)
+        self.assertNotIn(leaderboards.phase_scope(2), scopes)
+        self.assertIn(leaderboards.course_scope(self.courses[0].pk), scopes)
+        self.assertEqual(response.context['scope'], leaderboards.GLOBAL)
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.dataset = seed_dataset()
+        cls.staff = create_learners(1, prefix='staff')[0]
+        cls.staff.is_staff = True
+        cls.staff.save()
+
+    def setUp(self):
+        self.client.force_login(self.staff)
+
+    def download(self, path, **params):
+        response = self.client.get(path, params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_csv_streams_in_chunks_and_gzips(self):
+        with self.settings(EXPORT_BUFFER_BYTES=10):
+            chunks = list(exports.stream('progress', 'csv', chunk_size=1))
+        self.assertGreater(len(chunks), 1)
+        rows = list(csv.reader(b''.join(chunks).decode().splitlines()))
+        self.assertEqual(rows[0], list(exports.DATASETS['progress'].columns))
+        self.assertEqual(len(rows), 1 + UserProgress.objects.count())
+
+        compressed = self.download('/courses/export/progress.csv', gzip='1')
+        self.assertEqual(gzip.decompress(compressed), b''.join(chunks))
+
+    async def test_asgi_requests_stream_asynchronously(self):
+        await self.async_client.aforce_login(self.staff)
+        with self.settings(EXPORT_BUFFER_BYTES=10):
+            expected = await sync_to_async(lambda: b''.join(exports.stream('attempts', 'csv')))()
+            response = await self.async_client.get('/courses/export/attempts.csv')
+            self.assertTrue(response.is_async)
+            chunks = [chunk async for chunk in response.streaming_content]
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(b''.join(chunks), expected)
+
+    def test_jsonl_filters(self):
+        course = self.dataset['course']
+        lines = self.download('/courses/export/completed_lessons.jsonl', course=course).decode().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertEqual({json.loads(line)['userprogress__course_id'] for line in lines}, {course})
+
+        today = timezone.localdate()
+        self.assertEqual(self.download('/courses/export/attempts.jsonl', until=str(today - timedelta(days=1))), b'')
+        self.assertEqual(len(self.download('/courses/export/attempts.jsonl', cohort=today.strftime('%Y-%m')).splitlines()), 1)
+
+    def test_bad_filter_and_non_staff(self):
+        self.assertEqual(self.client.get('/courses/export/attempts.csv', {'since': 'yesterday'}).status_code, 400)
+        self.assertEqual(self.client.get('/courses/export/users.csv').status_code, 404)
+        self.client.force_login(self.dataset['user'])
+        self.assertEqual(self.client.get('/courses/export/attempts.csv').status_code, 302)
+
+    def test_command_writes_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'attempts.csv.gz'
+            call_command('export_learning_data', 'attempts', '--gzip', '-o', str(path), stderr=StringIO())
+            self.assertEqual(gzip.decompress(path.read_bytes()).count(b'\n'), 2)
+
+
+class AttemptRollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.course = create_catalog(phases=1, technologies_per_phase=1, modules_per_course=1, lessons_per_module=2)[0]
+        cls.exercises = list(InteractiveExercise.objects.order_by('lesson__order'))
+        cls.users = create_learners(3, prefix='rollup')
+
+    def attempt(self, user, exercise, days_ago=0, solve_seconds=None, score=0):
+        attempted_at = timezone.now() - timedelta(days=days_ago)
+        attempt = UserExerciseAttempt.objects.create(user=user, exercise=exercise, score=score)
+        UserExerciseAttempt.objects.filter(pk=attempt.pk).update(
+            attempted_at=attempted_at,
+            is_correct=solve_seconds is not None,
+            completed_at=None if solve_seconds is None else attempted_at + timedelta(seconds=solve_seconds),
+        )
+        return attempt
+
+    def test_rollups_per_level(self):
+        first, second = self.exercises
+        self.attempt(self.users[0], first, solve_seconds=30, score=10)
+        self.attempt(self.users[1], first, solve_seconds=90, score=10)
+        self.attempt(self.users[2], first, score=2)
+        self.attempt(self.users[0], second, days_ago=2, solve_seconds=10, score=10)
+        rollups.refresh()
+
+        stats = ExerciseDailyStats.objects.get(exercise=first)
+        self.assertEqual((stats.attempts, stats.successes, stats.score_sum), (3, 2, 22))
+        self.assertEqual(stats.median_solve_seconds, 60)
+        self.assertEqual(CourseDailyStats.objects.filter(course=self.course).count(), 2)
+        self.assertEqual(LessonDailyStats.objects.get(lesson=second.lesson).median_solve_seconds, 10)
+        self.assertAlmostEqual(first.get_success_rate(), 200 / 3)
+
+        self.client.force_login(CustomUser.objects.create_superuser('rollup-admin', 'admin@example.com', 'pw'))
+        self.assertContains(self.client.get('/admin/courses/interactiveexercise/'), '66.7%')
+
+    def test_retries_recompute_the_old_and_new_day(self):
+        exercise = self.exercises[0]
+        moved = self.attempt(self.users[0], exercise, days_ago=3)
+        regraded = self.attempt(self.users[1], exercise, days_ago=2)
+        rollups.refresh()
+        self.assertEqual(exercise.get_total_attempts(), 2)
+
+        # A code retry moves attempted_at to now; a quiz retry only changes the outcome.
+        moved.refresh_from_db()
+        moved.attempted_at = timezone.now()
+        moved.save()
+        regraded.refresh_from_db()
+        regraded.is_correct = True
+        regraded.save()
+        RollupWatermark.objects.update(position=timezone.now())
+
+        days, count = rollups.refresh()
+        today, two_days_ago = timezone.localdate(), timezone.localdate() - timedelta(days=2)
+        self.assertEqual(days, {today, two_days_ago, today - timedelta(days=3)})
+        self.assertEqual(count, 2)
+        self.assertEqual(exercise.get_total_attempts(), 2)
+        self.assertEqual(exercise.get_success_rate(), 50)
+        self.assertEqual(sorted(ExerciseDailyStats.objects.values_list('day', flat=True)), [two_days_ago, today])
+        self.assertEqual(UserExerciseAttempt.objects.get(pk=moved.pk).rollup_day, today)
+
+class LearningEventTests(ClearCachesMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.course = create_catalog(phases=1, technologies_per_phase=1, modules_per_course=1, lessons_per_module=1)[0]
+        cls.lesson = Lesson.objects.get()
+        cls.exercise = InteractiveExercise.objects.get()
+        cls.user = create_learners(1, prefix='events')[0]
+
+    def setUp(self):
+        super().setUp()
+        activity.discard()
+
+    def test_views_log_events_and_dashboard_reads_them(self):
+        self.client.force_login(self.user)
+        self.client.get(f'/courses/lesson/{self.lesson.pk}/')
+        self.client.post(f'/courses/lesson/{self.lesson.pk}/complete/', {'action': 'complete'})
+        self.client.post(f'/courses/exercise/{self.exercise.pk}/quiz/',
+                         json.dumps({'answer': self.exercise.options['correct_answer']}),
+                         content_type='application/json')
+
+        response = self.client.get('/dashboard/')
+        kinds = [event.kind for event in response.context['recent_activity']]
+        self.assertEqual(sorted(kinds), [
+            LearningEvent.LESSON_VIEWED, LearningEvent.LESSON_COMPLETED,
+            LearningEvent.EXERCISE_SUBMITTED, LearningEvent.EXERCISE_PASSED,
+        ])
+        self.assertContains(response, self.exercise.title)
+        self.assertEqual(response.context['streak_days'], 1)
+
+    @override_settings(EVENTS_ENABLED=True)
+    def test_first_grade_of_the_day_publishes_the_streak_including_it(self):
+        self.client.force_login(self.user)
+        self.client.post(f'/courses/exercise/{self.exercise.pk}/quiz/',
+                         json.dumps({'answer': self.exercise.options['correct_answer']}),
+                         content_type='application/json')
+        streak = LiveEvent.objects.get(user=self.user, kind='streak')
+        self.assertEqual(streak.data, {'streak_days': 1})
+        self.assertEqual(self.user.get_learning_streak(), 1)
+
+    def test_events_are_written_in_batches(self):
+        with self.settings(LEARNING_EVENTS_BATCH_SIZE=3, LEARNING_EVENTS_FLUSH_SECONDS=60):
+            for _ in range(2):
+                activity.record(self.user.pk, LearningEvent.LESSON_VIEWED, self.lesson.pk, self.course.pk)
+                request_finished.send(sender=None)
+            self.assertFalse(LearningEvent.objects.exists())
+            activity.record(self.user.pk, LearningEvent.LESSON_VIEWED, self.lesson.pk, self.course.pk)
+            with self.assertNumQueries(1):
+                request_finished.send(sender=None)
+        self.assertEqual(LearningEvent.objects.count(), 3)
+
+    def test_archive_writes_and_drops_old_months(self):
+        old = timezone.now() - timedelta(days=800)
+        activity.record(self.user.pk, LearningEvent.LESSON_VIEWED, self.lesson.pk, self.course.pk, occurred_at=old)
+        activity.record(self.user.pk, LearningEvent.LESSON_VIEWED, self.lesson.pk, self.course.pk)
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            call_command('archive_learning_events', output_dir=output_dir, stdout=StringIO())
+            [archive] = Path(output_dir).iterdir()
+            rows = [json.loads(line) for line in gzip.open(archive, 'rt')]
+        self.assertEqual(archive.name, f'learning-events-{timezone.localtime(old):%Y-%m}.jsonl.gz')
+        self.assertEqual([(row['user_id'], row['kind']) for row in rows], [(self.user.pk, LearningEvent.LESSON_VIEWED)])
+        self.assertEqual(LearningEvent.objects.count(), 1)
+
+
+class FragmentCacheTests(ClearCachesMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.course = create_catalog(phases=1, technologies_per_phase=1, modules_per_course=1, lessons_per_module=1)[0]
+        cls.user = create_learners(1, prefix='fragment')[0]
+
+    def setUp(self):
+        super().setUp()
+        recorder.reset()
+
+    def render(self, **context):
+        template = Template('{% load fragments %}{% fragment "greeting" user=user %}{{ text }}{% endfragment %}')
+        return template.render(Context({'user': self.user, **context}))
+
+    def test_fragment_is_reused_until_the_learners_progress_changes(self):
+        self.assertEqual(self.render(text='first'), 'first')
+        self.assertEqual(self.render(text='second'), 'first')
+        with self.captureOnCommitCallbacks(execute=True):
+            UserExerciseAttempt.objects.create(user=self.user, exercise=InteractiveExercise.objects.get())
+        self.assertEqual(self.render(text='third'), 'third')
+        self.assertEqual((recorder.fragments['greeting']['hits'], recorder.fragments['greeting']['misses']), (1, 2))
+
+    def test_catalog_fragments_skip_their_queries_on_a_hit(self):
+        technology = self.course.technology
+        url = f'/courses/technology/{technology.pk}/'
+        with CaptureQueriesContext(connection) as cold:
+            self.client.get(url)
+        with CaptureQueriesContext(connection) as warm:
+            self.client.get(url)
+        self.assertLess(len(warm), len(cold))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            technology.description = 'Changed'
+            technology.save()
+        self.assertIsNone(caches['fragments'].get(fragment_key('technology_workflows', vary_on=[technology.pk])))
+        with CaptureQueriesContext(connection) as changed:
+            self.client.get(url)
+        self.assertEqual(len(changed), len(cold))
+
+
+class ConditionalGetTests(ClearCachesMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.course = create_catalog(phases=1, technologies_per_phase=1, modules_per_course=1, lessons_per_module=2)[0]
+        cls.lessons = list(Lesson.objects.order_by('order'))
+        cls.user = create_learners(1, prefix='etag')[0]
+
+    def setUp(self):
+        super().setUp()
+        activity.discard()
+
+    def test_unchanged_catalog_page_is_answered_without_queries(self):
+        response = self.client.get('/courses/')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        with self.assertNumQueries(0):
+            repeat = self.client.get('/courses/', headers={'If-None-Match': response['ETag']})
+        self.assertEqual(repeat.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.course.title = 'Renamed'
+            self.course.save()
+        self.assertEqual(self.client.get('/courses/', headers={'If-None-Match': response['ETag']}).status_code, 200)
+
+    def test_revisiting_a_lesson_returns_304_but_still_counts_the_visit(self):
+        self.client.force_login(self.user)
+        first, second = (f'/courses/lesson/{lesson.pk}/' for lesson in self.lessons)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(first)  # enrols, which changes the progress version
+        etag = self.client.get(first)['ETag']
+        self.client.get(second)
+
+        response = self.client.get(first, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('private', response['Cache-Control'])
+        progress = UserProgress.objects.get(user=self.user)
+        self.assertEqual(progress.last_accessed_lesson, self.lessons[0])
+        self.assertEqual([event.object_id for event in activity.recent(self.user.pk)][:2],
+                         [self.lessons[0].pk, self.lessons[1].pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            progress.mark_lesson_complete(self.lessons[0])
+        self.assertEqual(self.client.get(first, headers={'If-None-Match': etag}).status_code, 200)
+
+
+class SiteStatisticsTests(ClearCachesMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_catalog(phases=1, technologies_per_phase=2, modules_per_course=1, lessons_per_module=2)
+        cls.user = create_learners(1, prefix='stats')[0]
+        site_stats.reconcile()  # Bulk inserts bypass the signals
+
+    def setUp(self):
+        super().setUp()
+        site_stats._invalidate()
+
+    @override_settings(PAGE_CACHE_ENABLED=False)  # measure the view, not the page cache
+    def test_home_page_reads_maintained_counts_without_queries(self):
+        self.client.get('/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/')
+        stats = response.context['site_stats']
+        self.assertEqual((stats.technologies, stats.courses, stats.lessons, stats.learners), (2, 2, 4, 1))
+        self.assertEqual(response.context['total_lessons'], 4)
+
+    def test_signals_keep_counts_current_and_reconcile_repairs_drift(self):
+        exercise = InteractiveExercise.objects.first()
+        with self.captureOnCommitCallbacks(execute=True):
+            attempt = UserExerciseAttempt.objects.create(user=self.user, exercise=exercise, is_correct=True)
+            attempt.save()
+            Lesson.objects.exclude(pk=exercise.lesson_id).first().delete()
+        stats = site_stats.get()
+        self.assertEqual((stats.lessons, stats.exercises_solved), (3, 1))
+
+        UserExerciseAttempt.objects.filter(pk=attempt.pk).update(is_correct=False)
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('site_stats', reconcile=True, stdout=StringIO())
+        self.assertEqual(site_stats.get().exercises_solved, 0)
+
+
+def _png(width, height, color='navy'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), color).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class ResponsiveImageTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        self.enterContext(override_settings(
+            MEDIA_ROOT=media, IMAGE_WORKERS=0, IMAGE_DERIVATIVE_WIDTHS=(320, 640, 1280), IMAGE_DERIVATIVE_FORMATS=('webp',),
+        ))
+        self.media = Path(media)
+        caches['default'].clear()
+
+    def _technology(self, name, content):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Technology.objects.create(
+                name=name, category='containers', description='', phase=1, order=1,
+                logo=SimpleUploadedFile(f'{name}.png', content),
+            )
+
+    def test_upload_generates_derivatives_once_per_content(self):
+        docker = self._technology('docker', _png(800, 400))
+        image = ResponsiveImage.objects.get(name=docker.logo.name)
+        self.assertEqual((image.width, image.height, image.widths, image.formats), (800, 400, [320, 640], ['webp']))
+        with Image.open(self.media / images.derivative_name(image.digest, 320, 'webp')) as derivative:
+            self.assertEqual(derivative.size, (320, 160))
+
+        derived = sorted(p for p in (self.media / images.DERIVED_PREFIX).rglob('*') if p.is_file())
+        podman = self._technology('podman', _png(800, 400))
+        self.assertEqual(ResponsiveImage.objects.get(name=podman.logo.name).digest, image.digest)
+        self.assertEqual(sorted(p for p in (self.media / images.DERIVED_PREFIX).rglob('*') if p.is_file()), derived)
+
+    def test_rich_text_images_get_picture_sources(self):
+        docker = self._technology('docker', _png(800, 400))
+        rendered = Template(
+            '{% load images %}{{ content|safe|responsive_images }}|{{ logo|srcset:"webp" }}'
+        ).render(Context({
+            'content': f'<p><img src="/media/{docker.logo.name}" alt="Docker"><img src="https://example.com/x.png"></p>',
+            'logo': docker.logo,
+        }))
+        content, srcset = rendered.split('|')
+        self.assertIn('<picture><source type="image/webp" srcset="/media/derived/', content)
+        self.assertIn('width="800" height="400" loading="lazy"', content)
+        self.assertIn('<img src="https://example.com/x.png">', content)
+        self.assertRegex(srcset, r'^/media/derived/\S+/320\.webp 320w, /media/derived/\S+/640\.webp 640w$')
+
+
+class MediaBlobTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        self.enterContext(override_settings(MEDIA_ROOT=media, IMAGE_WORKERS=0, IMAGE_DERIVATIVE_FORMATS=('webp',)))
+        self.storage = ContentAddressedStorage()
+
+    def test_identical_uploads_share_one_immutable_blob(self):
+        first = self.storage.save('docker.PNG', SimpleUploadedFile('docker.PNG', _png(40, 20)))
+        second = self.storage.save('docker-copy.png', SimpleUploadedFile('docker-copy.png', _png(40, 20)))
+        other = self.storage.save('k8s.png', SimpleUploadedFile('k8s.png', _png(40, 20, 'teal')))
+        self.assertEqual(first, second)
+        self.assertRegex(first, r'^[0-9a-f]{2}/[0-9a-f]{64}\.png$')
+        self.assertNotEqual(first, other)
+        self.assertEqual(sorted(self.storage.blobs()), sorted([first, other]))
+        self.assertEqual(os.listdir(self.storage.path('tmp')), [])
+
+        response = self.client.get(self.storage.url(first))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], IMMUTABLE_CACHE_CONTROL)
+        self.assertEqual(b''.join(response.streaming_content), _png(40, 20))
+
+    def test_reuploading_an_old_blob_protects_it_from_gc(self):
+        name = self.storage.save('old.png', SimpleUploadedFile('old.png', _png(40, 20)))
+        week_ago = timezone.now().timestamp() - 7 * 86400
+        os.utime(self.storage.path(name), (week_ago, week_ago))
+        self.storage.save('pasted-again.png', SimpleUploadedFile('pasted-again.png', _png(40, 20)))
+
+        call_command('gc_media_blobs', min_age_hours=24, stdout=StringIO())
+        self.assertEqual(list(self.storage.blobs()), [name])
+
+    def test_gc_keeps_blobs_used_in_rich_text(self):
+        create_catalog(phases=1, technologies_per_phase=1, modules_per_course=1, lessons_per_module=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            used = images.EditorUploadStorage().save('used.png', SimpleUploadedFile('used.png', _png(40, 20)))
+            unused = images.EditorUploadStorage().save('unused.png', SimpleUploadedFile('unused.png', _png(40, 20, 'red')))
+        Lesson.objects.update(content=f'<img src="{self.storage.url(used)}">')
+        self.assertEqual(ResponsiveImage.objects.count(), 2)
+
+        call_command('gc_media_blobs', min_age_hours=0, stdout=StringIO())
+        self.assertEqual(list(self.storage.blobs()), [used])
+        self.assertEqual(list(ResponsiveImage.objects.values_list('name', flat=True)), [f'uploads/{used}'])
+
+
+class CourseBundleTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        self.enterContext(override_settings(MEDIA_ROOT=media, IMAGE_WORKERS=0))
+        create_catalog(phases=1, technologies_per_phase=2, modules_per_course=2, lessons_per_module=3)
+        self.course = Course.objects.order_by('pk').first()
+        self.diagram = ContentAddressedStorage().save('k8s.png', SimpleUploadedFile('k8s.png', _png(40, 20)))
+        self.lesson = Lesson.objects.filter(module__course=self.course).order_by('pk').first()
+        Lesson.objects.filter(pk=self.lesson.pk).update(content=f'<img src="/media/uploads/{self.diagram}">')
+        self.prerequisite = Course.objects.order_by('pk').last()
+        self.course.prerequisites.add(self.prerequisite)
+
+    def _export(self):
+        output = io.BytesIO()
+        manifest = bundles.export([self.course.pk], output, chunk_size=2)
+        output.seek(0)
+        return manifest, output
+
+    def test_reimport_updates_rows_in_place(self):
+        manifest, bundle = self._export()
+        self.assertEqual(manifest['counts']['lesson'], 6)
+        self.assertEqual(manifest['media'], [f'uploads/{self.diagram}'])
+        Lesson.objects.filter(pk=self.lesson.pk).update(title='Edited on staging')
+        lessons = Lesson.objects.count()
+        version = catalog_version()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            _, created, updated, _ = bundles.load(bundle, batch_size=4)
+        self.assertEqual(sum(created.values()), 0)
+        self.assertEqual(updated['lesson'], 6)
+        self.assertEqual(Lesson.objects.count(), lessons)
+        self.assertNotEqual(Lesson.objects.get(pk=self.lesson.pk).title, 'Edited on staging')
+        self.assertNotEqual(catalog_version(), version)
+
+    def test_import_recreates_course_with_remapped_ids_and_media(self):
+        manifest, bundle = self._export()
+        examples = CodeExample.objects.filter(lesson__module__course=self.course).count()
+        self.course.delete()
+        os.unlink(ContentAddressedStorage().path(self.diagram))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            _, created, _, media = bundles.load(bundle, batch_size=4)
+        course = Course.objects.get(title=manifest['courses'][0])
+        self.assertNotEqual(course.pk, self.course.pk)
+        self.assertEqual((created['course'], created['lesson']), (1, 6))
+        self.assertEqual(CodeExample.objects.filter(lesson__module__course=course).count(), examples)
+        self.assertEqual(list(course.prerequisites.all()), [self.prerequisite])
+        self.assertEqual(media, [f'uploads/{self.diagram}'])
+        self.assertTrue(ContentAddressedStorage().exists(self.diagram))
+
+    def test_rejects_other_archives(self):
+        output = io.BytesIO()
+        with tarfile.open(fileobj=output, mode='w|gz') as tar:
+            tar.addfile(tarfile.TarInfo('manifest.json'), io.BytesIO())
+        output.seek(0)
+        with self.assertRaises(bundles.BundleError):
+            bundles.load(output)
+
+
+class LessonSectionsTests(ClearCachesMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_catalog(phases=1, technologies_per_phase=1, modules_per_course=1, lessons_per_module=1)
+        cls.lesson = Lesson.objects.get()
+        cls.exercise = cls.lesson.interactive_exercises.get()
+        CodeExample.objects.create(lesson=cls.lesson, title='Build', code='docker build -t app .', language='bash')
+        cls.user = create_learners(1, prefix='sections')[0]
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def test_lesson_page_defers_examples_and_exercises(self):
+        response = self.client.get(f'/courses/lesson/{self.lesson.pk}/')
+        self.assertContains(response, f'data-url="/courses/lesson/{self.lesson.pk}/sections/"')
+        self.assertNotContains(response, 'docker build -t app .')
+        self.assertNotContains(response, f'data-exercise-id="{self.exercise.pk}"')
+
+    def test_sections_payload_is_cached_and_revalidated(self):
+        url = f'/courses/lesson/{self.lesson.pk}/sections/'
+        response = self.client.get(url)
+        data = response.json()
+        self.assertEqual(data['code_examples'], [
+            {'title': 'Build', 'language': 'bash', 'code': 'docker build -t app .', 'explanation': ''},
+        ])
+        self.assertEqual([exercise['id'] for exercise in data['exercises']], [self.exercise.pk])
+        self.assertIn(f'data-exercise-id="{self.exercise.pk}"', data['exercises'][0]['html'])
+
+        with CaptureQueriesContext(connection) as queries:
+            again = self.client.get(url)
+        self.assertFalse([q for q in queries.captured_queries if 'courses_' in q['sql']])
+        self.assertEqual(again.json(), data)
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': response['ETag']}).status_code, 304)
+        self.assertEqual(self.client.get('/courses/lesson/999999/sections/').status_code, 404)
@@ -7,7 +7,9 @@ urlpatterns = [
     path('<int:pk>/', views.CourseDetailView.as_view(), name='course_detail'),
     path('technology/<int:pk>/', views.TechnologyDetailView.as_view(), name='technology_detail'),
     path('lesson/<int:pk>/', views.LessonDetailView.as_view(), name='lesson_detail'),
+    path('lesson/<int:lesson_id>/sections/', views.lesson_sections, name='lesson_sections'),
     path('roadmap/', views.RoadmapView.as_view(), name='roadmap'),
+    path('leaderboard/', views.LeaderboardView.as_view(), name='leaderboard'),
     
     # Progress tracking URLs
     path('lesson/<int:lesson_id>/complete/', views.mark_lesson_complete, name='mark_lesson_complete'),
@@ -19,4 +21,7 @@ urlpatterns = [
     path('exercise/<int:pk>/', views.ExerciseDetailView.as_view(), name='exercise_detail'),
     path('search/', views.SearchView.as_view(), name='search'),
     path('search/suggestions/', views.search_suggestions, name='search_suggestions'),
+    
+    # Staff exports
+    path('export/<slug:dataset>.<slug:fmt>', views.export_learning_data, name='export_learning_data'),
 ]
\ No newline at end of file
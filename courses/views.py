@@ -1,24 +1,36 @@
 import json
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.handlers.asgi import ASGIRequest
 from django.db.models import Count, Prefetch, Q
-from django.http import JsonResponse
-from django.shortcuts import get_object_or_404, redirect
+from django.http import Http404, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404, get_object_or_404, redirect
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 from django.views.generic import DetailView, ListView, TemplateView
 import json
 import re
 from .models import InteractiveExercise, UserExerciseAttempt
+from . import activity, exports, leaderboards, sections
+from .analytics import phase_course_counts, phase_progress
+from .catalog import lesson_course_ids
+from .conditional import ConditionalPageMixin
+from .prerequisites import BLOCKED, prerequisite_graph
+from devoops_lms import events
 from users.models import UserProgress
 
 
 from .models import (
     Course,
     InteractiveExercise,
+    LearningEvent,
     Lesson,
     Module,
     Technology,
@@ -27,7 +39,7 @@ from .models import (
 )
 
 
-class CourseListView(ListView):
+class CourseListView(ConditionalPageMixin, ListView):
     model = Course
     template_name = 'courses/course_list.html'
     context_object_name = 'courses'
@@ -48,7 +60,7 @@ class CourseListView(ListView):
         context['technologies_by_phase'] = technologies_by_phase
         return context
 
-class CourseDetailView(DetailView):
+class CourseDetailView(ConditionalPageMixin, DetailView):
     model = Course
     template_name = 'courses/course_detail.html'
     context_object_name = 'course'
@@ -76,7 +88,7 @@ class CourseDetailView(DetailView):
         
         return context
 
-class TechnologyDetailView(DetailView):
+class TechnologyDetailView(ConditionalPageMixin, DetailView):
     model = Technology
     template_name = 'courses/technology_detail.html'
     context_object_name = 'technology'
@@ -89,7 +101,7 @@ class TechnologyDetailView(DetailView):
         ).exclude(technology=self.object).select_related('technology')[:4]
         return context
 
-class LessonDetailView(LoginRequiredMixin, DetailView):
+class LessonDetailView(LoginRequiredMixin, ConditionalPageMixin, DetailView):
     model = Lesson
     template_name = 'courses/lesson_detail.html'
     context_object_name = 'lesson'
@@ -104,9 +116,11 @@ class LessonDetailView(LoginRequiredMixin, DetailView):
             course=course
         )
         
-        # Update last accessed lesson
-        user_progress.last_accessed_lesson = self.object
-        user_progress.save()
+        # Update last accessed lesson (not a progress change, so cached pages stay valid)
+        if user_progress.last_accessed_lesson_id != self.object.id:
+            user_progress.last_accessed_lesson = self.object
+            user_progress.save(update_fields=['last_accessed_lesson'])
+        activity.record(self.request.user.pk, LearningEvent.LESSON_VIEWED, self.object.id, course.id)
         
         # Get all lessons in the module for navigation
         module_lessons = Lesson.objects.filter(module=self.object.module).order_by('order')
@@ -128,16 +142,24 @@ class LessonDetailView(LoginRequiredMixin, DetailView):
         context['course'] = course
         
         return context
+    
+    def not_modified(self, request, pk):
+        """The page is unchanged, but the visit still counts"""
+        course_id = lesson_course_ids().get(pk)
+        UserProgress.objects.filter(user=request.user, course_id=course_id).exclude(
+            last_accessed_lesson_id=pk
+        ).update(last_accessed_lesson_id=pk)
+        activity.record(request.user.pk, LearningEvent.LESSON_VIEWED, pk, course_id)
 
-class RoadmapView(TemplateView):
+class RoadmapView(ConditionalPageMixin, TemplateView):
     template_name = 'courses/roadmap.html'
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # Group technologies by phase with their courses
+        # Group technologies by phase with their courses (reverse one-to-one joined in)
         technologies_by_phase = {}
-        for tech in Technology.objects.all().prefetch_related('course'):
+        for tech in Technology.objects.select_related('course'):
             if tech.phase not in technologies_by_phase:
                 technologies_by_phase[tech.phase] = []
             technologies_by_phase[tech.phase].append(tech)
@@ -151,20 +173,88 @@ class RoadmapView(TemplateView):
             progress_dict = {progress.course_id: progress for progress in user_progress}
             context['user_progress'] = progress_dict
             
-            # Calculate overall progress
-            total_courses = Course.objects.filter(is_active=True).count()
-            completed_courses = user_progress.filter(progress_percentage=100).count()
+            # Overall and per-phase progress from one grouped query, cached per user
+            phases = phase_progress(self.request.user)
+            total_courses = sum(stats.active_courses for stats in phases.values())
+            completed_courses = sum(stats.completed for stats in phases.values())
             context['overall_progress'] = int((completed_courses / total_courses) * 100) if total_courses > 0 else 0
+            context['phase_progress'] = {phase: stats.percent for phase, stats in phases.items()}
             
-            # Calculate phase progress
-            phase_progress = {}
-            for phase, techs in technologies_by_phase.items():
-                phase_courses = [tech.course for tech in techs if hasattr(tech, 'course')]
-                completed_in_phase = sum(1 for course in phase_courses if course.id in progress_dict and progress_dict[course.id].progress_percentage == 100)
-                phase_progress[phase] = int((completed_in_phase / len(phase_courses)) * 100) if phase_courses else 0
-            
-            context['phase_progress'] = phase_progress
+            # Prerequisite gating, answered from the cached graph
+            graph = prerequisite_graph()
+            completed = {course_id for course_id, progress in progress_dict.items() if progress.progress_percentage == 100}
+            course_status = graph.status(completed)
+            for techs in technologies_by_phase.values():
+                for tech in techs:
+                    if hasattr(tech, 'course'):
+                        tech.course.gate = course_status.get(tech.course.id)
+                        if tech.course.gate == BLOCKED:
+                            tech.course.missing_titles = [graph.titles[course_id] for course_id in graph.missing(tech.course.id, completed)]
+            context['next_course_id'] = graph.next_recommended(completed, started=progress_dict)
+        
+        percents = context.get('phase_progress', {})
+        context['roadmap_phases'] = [
+            (phase, techs, percents.get(phase, 0)) for phase, techs in technologies_by_phase.items()
+        ]
+        return context
+
+
+@staff_member_required
+def export_learning_data(request, dataset, fmt):
+    """Stream progress, completed lessons or attempts as CSV / JSON Lines for staff"""
+    if dataset not in exports.DATASETS or fmt not in exports.FORMATS:
+        raise Http404('Unknown export')
+    try:
+        filters = exports.parse_filters(
+            course=request.GET.get('course'),
+            since=request.GET.get('since'),
+            until=request.GET.get('until'),
+            cohort=request.GET.get('cohort'),
+        )
+    except ValueError as e:
+        return HttpResponseBadRequest(f'Invalid filter: {e}')
+    
+    compress = request.GET.get('gzip') == '1'
+    # Under ASGI a synchronous iterator would be read into memory before sending.
+    body = exports.astream if isinstance(request, ASGIRequest) else exports.stream
+    response = StreamingHttpResponse(
+        body(dataset, fmt, filters, compress=compress),
+        content_type='application/gzip' if compress else exports.FORMATS[fmt],
+    )
+    response['Content-Disposition'] = f'attachment; filename="{exports.filename(dataset, fmt, compress)}"'
+    return response
+
+
+class LeaderboardView(TemplateView):
+    template_name = 'courses/leaderboard.html'
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        
+        # Scope choices come from cached catalog data, not queries
+        graph = prerequisite_graph()
+        scopes = [(leaderboards.GLOBAL, 'All courses')]
+        # Inactive courses are hidden everywhere else in the catalog, so they get no boards either
+        scopes += [
+            (leaderboards.phase_scope(phase), f'Phase {phase}')
+            for phase, (_, active) in sorted(phase_course_counts().items()) if active
+        ]
+        scopes += [(leaderboards.course_scope(course_id), graph.titles[course_id]) for course_id in graph.active_ids()]
+        
+        scope = self.request.GET.get('scope', leaderboards.GLOBAL)
+        if scope not in dict(scopes):
+            scope = leaderboards.GLOBAL
+        period = leaderboards.WEEK if self.request.GET.get('period') == leaderboards.WEEK else leaderboards.ALL_TIME
+        stored_period = leaderboards.resolve_period(period)
         
+        context.update({
+            'scopes': scopes,
+            'scope': scope,
+            'period': period,
+            'entries': leaderboards.top(scope, stored_period, settings.LEADERBOARD_SIZE),
+        })
+        if self.request.user.is_authenticated:
+            context['my_rank'] = leaderboards.rank(self.request.user.pk, scope, stored_period)
         return context
     
 
@@ -206,40 +296,56 @@ def mark_lesson_complete(request, lesson_id):
         return redirect('lesson_detail', pk=lesson_id)
 
 @login_required
-def get_course_progress(request, course_id):
+async def get_course_progress(request, course_id):
     """Get progress data for a course (AJAX endpoint)"""
-    course = get_object_or_404(Course, id=course_id)
+    course = await aget_object_or_404(Course, id=course_id)
+    user = await request.auser()
     
     try:
-        user_progress = UserProgress.objects.get(user=request.user, course=course)
+        user_progress = await UserProgress.objects.aget(user=user, course=course)
         return JsonResponse({
             'progress_percentage': user_progress.progress_percentage,
-            'completed_lessons': user_progress.get_completed_lessons_count(),
-            'total_lessons': user_progress.get_total_lessons_count()
+            'completed_lessons': await user_progress.completed_lessons.acount(),
+            'total_lessons': await course.alessons_count()
         })
     except UserProgress.DoesNotExist:
         return JsonResponse({
             'progress_percentage': 0,
             'completed_lessons': 0,
-            'total_lessons': course.lessons_count()
+            'total_lessons': await course.alessons_count()
         })
 
 
+@login_required
+async def lesson_sections(request, lesson_id):
+    """Code examples and exercises for the lesson page, fetched as they scroll into view (AJAX endpoint)"""
+    version, payload = await sync_to_async(sections.payload)(lesson_id)
+    if payload is None:
+        raise Http404('Lesson not found')
+    etag = f'"{settings.RELEASE_VERSION}-{version}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse(payload)
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
 # === INTERACTIVE EXERCISE VIEWS ===
 
 @login_required
 @require_POST
 @csrf_exempt
-def validate_exercise_solution(request, exercise_id):
+async def validate_exercise_solution(request, exercise_id):
     """Validate user's code solution against test cases"""
     try:
         data = json.loads(request.body.decode('utf-8'))
         user_code = data.get('code', '').strip()
-        exercise = get_object_or_404(InteractiveExercise, id=exercise_id)
+        exercise = await aget_object_or_404(InteractiveExercise.objects.select_related('lesson__module'), id=exercise_id)
         
         # Get or create user attempt
-        attempt, created = UserExerciseAttempt.objects.get_or_create(
-            user=request.user,
+        attempt, created = await UserExerciseAttempt.objects.aget_or_create(
+            user=await request.auser(),
             exercise=exercise,
             defaults={
                 'code_submission': user_code,
@@ -272,7 +378,10 @@ def validate_exercise_solution(request, exercise_id):
         if validation_result['success']:
             attempt.completed_at = timezone.now()
         
-        attempt.save()
+        await attempt.asave()
+        # Record first: the published streak counts today's activity.
+        activity.record_attempt(attempt, exercise.lesson.module.course_id)
+        await sync_to_async(events.publish_grade)(attempt, validation_result)
         
         return JsonResponse(validation_result)
         
@@ -399,20 +508,20 @@ def validate_quiz_exercise(user_answers, exercise):
         }
 
 @login_required
-def submit_quiz_answer(request, exercise_id):
+async def submit_quiz_answer(request, exercise_id):
     """Handle quiz answer submissions"""
     if request.method == 'POST':
         try:
             data = json.loads(request.body.decode('utf-8'))
             user_answer = data.get('answer')
-            exercise = get_object_or_404(InteractiveExercise, id=exercise_id)
+            exercise = await aget_object_or_404(InteractiveExercise.objects.select_related('lesson__module'), id=exercise_id)
             
             # Validate quiz answer
             result = validate_quiz_exercise({'answer': user_answer}, exercise)
             
             # Record attempt
-            attempt, created = UserExerciseAttempt.objects.get_or_create(
-                user=request.user,
+            attempt, created = await UserExerciseAttempt.objects.aget_or_create(
+                user=await request.auser(),
                 exercise=exercise,
                 defaults={
                     'answers': {'answer': user_answer},
@@ -428,7 +537,9 @@ def submit_quiz_answer(request, exercise_id):
                 attempt.score = result['score']
                 if result['success']:
                     attempt.completed_at = timezone.now()
-                attempt.save()
+                await attempt.asave()
+            activity.record_attempt(attempt, exercise.lesson.module.course_id)
+            await sync_to_async(events.publish_grade)(attempt, result)
             
             return JsonResponse(result)
             
@@ -515,7 +626,7 @@ class SearchView(ListView):
         })
         return context
 
-def search_suggestions(request):
+async def search_suggestions(request):
     """AJAX endpoint for search suggestions"""
     query = request.GET.get('q', '').strip()
     
@@ -535,14 +646,14 @@ def search_suggestions(request):
     
     suggestions = []
     
-    for course in course_suggestions:
+    async for course in course_suggestions:
         suggestions.append({
             'type': 'course',
             'text': course['title'],
             'url': f"/courses/{course['id']}/"
         })
     
-    for tech in technology_suggestions:
+    async for tech in technology_suggestions:
         suggestions.append({
             'type': 'technology',
             'text': tech['name'],
@@ -0,0 +1,193 @@
+"""
+Static asset pipeline: fingerprinted, precompressed storage and an in-process
+handler that serves the result with long-lived cache headers.
+
+``collectstatic`` writes ``name.<hash>.ext`` plus ``.gz``/``.br`` siblings into
+STATIC_ROOT; ``StaticAssetMiddleware`` answers requests under STATIC_URL
+straight from that directory without touching the URL resolver or the database.
+"""
+import gzip
+import mimetypes
+import os
+import posixpath
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.http import FileResponse
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+
+from .media import BLOB_NAME
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always produced
+    brotli = None
+
+
+COMPRESSIBLE_EXTENSIONS = {
+    '.css', '.js', '.mjs', '.map', '.json', '.svg', '.txt', '.html', '.xml', '.ttf', '.eot', '.otf',
+}
+# Skip tiny files and variants that don't save at least 5%.
+MIN_COMPRESS_SIZE = 256
+MIN_COMPRESS_RATIO = 0.95
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+DEFAULT_CACHE_CONTROL = 'public, max-age=60'
+
+ENCODINGS = [
+    ('br', '.br'),
+    ('gzip', '.gz'),
+]
+
+
+def accepted_encodings(header):
+    """``{coding: q}`` from an ``Accept-Encoding`` header; malformed q-values count as 0."""
+    accepted = {}
+    for part in header.split(','):
+        coding, *params = [piece.strip() for piece in part.split(';')]
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding.lower()] = q
+    return accepted
+
+
+def preferred_encoding(header, available):
+    """The acceptable coding from ``available`` with the highest q, earlier ones winning ties."""
+    accepted = accepted_encodings(header)
+    best, best_q = None, 0.0
+    for coding in available:
+        q = accepted.get(coding, accepted.get('*', 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress_file(path):
+    """Write .gz (and .br when available) variants next to ``path``."""
+    path = Path(path)
+    if path.suffix.lower() not in COMPRESSIBLE_EXTENSIONS:
+        return []
+    data = path.read_bytes()
+    if len(data) < MIN_COMPRESS_SIZE:
+        return []
+
+    variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', brotli.compress(data, quality=11)))
+
+    written = []
+    for suffix, payload in variants:
+        if len(payload) < len(data) * MIN_COMPRESS_RATIO:
+            target = path.with_name(path.name + suffix)
+            target.write_bytes(payload)
+            written.append(target)
+    return written
+
+
+class PrecompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Manifest storage that also pre-generates gzip/brotli variants."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        processed_names = []
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if not isinstance(processed, Exception):
+                processed_names.append(name)
+                if hashed_name:
+                    processed_names.append(hashed_name)
+            yield name, hashed_name, processed
+
+        if dry_run:
+            return
+        for name in set(processed_names):
+            if self.exists(name):
+                compress_file(self.path(name))
+
+
+def _immutable_names():
+    """Fingerprinted file names that are safe to cache forever."""
+    hashed_files = getattr(staticfiles_storage, 'hashed_files', None) or {}
+    return set(hashed_files.values())
+
+
+class StaticAssetMiddleware:
+    """
+    Serve collected static files from STATIC_ROOT in-process.
+
+    Fingerprinted names get ``Cache-Control: immutable``; a precompressed
+    variant is picked from ``Accept-Encoding`` when one exists on disk.
+    Content-addressed media blobs (``devoops_lms.media``) are served the same
+    way, always as immutable.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.static_prefix = '/' + settings.STATIC_URL.lstrip('/')
+        self.static_root = str(settings.STATIC_ROOT) if settings.STATIC_ROOT else None
+        self.immutable = _immutable_names()
+        self.blob_prefix = '/' + (settings.MEDIA_URL + settings.MEDIA_BLOB_PATH).lstrip('/')
+        self.blob_root = os.path.join(settings.MEDIA_ROOT, settings.MEDIA_BLOB_PATH)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        response = self.match(request)
+        return response if response is not None else self.get_response(request)
+
+    async def __acall__(self, request):
+        response = self.match(request)
+        return response if response is not None else await self.get_response(request)
+
+    def match(self, request):
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        path = request.path_info
+        if self.static_root and path.startswith(self.static_prefix):
+            return self.serve(request, path[len(self.static_prefix):])
+        if path.startswith(self.blob_prefix) and BLOB_NAME.match(path[len(self.blob_prefix):]):
+            return self.serve(request, path[len(self.blob_prefix):], root=self.blob_root, immutable=True)
+        return None
+
+    def serve(self, request, name, root=None, immutable=False):
+        name = posixpath.normpath(name).lstrip('/')
+        try:
+            path = safe_join(root or self.static_root, name)
+        except Exception:
+            return None
+        if not os.path.isfile(path):
+            return None
+
+        content_type, _ = mimetypes.guess_type(path)
+        variants = {coding: suffix for coding, suffix in ENCODINGS if os.path.isfile(path + suffix)}
+        encoding = preferred_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''), variants)
+        if encoding:
+            path += variants[encoding]
+
+        stat = os.stat(path)
+        response = FileResponse(open(path, 'rb'), content_type=content_type or 'application/octet-stream')
+        response['Content-Length'] = str(stat.st_size)
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        response['Cache-Control'] = (
+            IMMUTABLE_CACHE_CONTROL if immutable or name in self.immutable else DEFAULT_CACHE_CONTROL
+        )
+        if encoding:
+            response['Content-Encoding'] = encoding
+        patch_vary_headers(response, ['Accept-Encoding'])
+        return response
@@ -0,0 +1,326 @@
+"""
+Cache backends shared by every worker on a host, with per-alias metrics.
+
+``SQLiteCache`` keeps entries in a WAL-mode SQLite file, so all gunicorn
+workers on one box see the same cache without running an extra service.
+``InstrumentedRedisCache`` and ``InstrumentedPyMemcacheCache`` wrap Django's
+built-in backends when Redis or Memcached are available.
+
+Every backend here exposes ``stats()`` (hits, misses, hit ratio, evictions,
+bytes, entries); ``python manage.py cache_stats`` prints them per alias.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.memcached import PyMemcacheCache
+from django.core.cache.backends.redis import RedisCache
+
+_MISSING = object()
+
+
+class CacheMetricsMixin:
+    """In-process hit/miss counters for a cache alias."""
+
+    def _init_metrics(self):
+        self._metrics_lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def _record(self, hits=0, misses=0):
+        with self._metrics_lock:
+            self._hits += hits
+            self._misses += misses
+
+    def _counted_get(self, get, key, default, version):
+        value = get(key, _MISSING, version)
+        self._record(hits=value is not _MISSING, misses=value is _MISSING)
+        return default if value is _MISSING else value
+
+    def _counted_get_many(self, get_many, keys, version):
+        found = get_many(keys, version=version)
+        self._record(hits=len(found), misses=len(keys) - len(found))
+        return found
+
+    def _ratio(self, hits, misses):
+        total = hits + misses
+        return round(hits / total, 4) if total else None
+
+    def stats(self):
+        return {
+            'backend': type(self).__name__,
+            'hits': self._hits,
+            'misses': self._misses,
+            'hit_ratio': self._ratio(self._hits, self._misses),
+            'evictions': None,
+            'bytes': None,
+            'entries': None,
+        }
+
+
+class SQLiteCache(CacheMetricsMixin, BaseCache):
+    """
+    Host-local shared cache stored in a SQLite file (LOCATION).
+
+    Integers are stored natively so ``incr``/``decr`` are atomic across
+    processes (used for rate limiting); everything else is pickled. Hit/miss
+    counters are accumulated in-process and flushed to a shared table every
+    few seconds so ``stats()`` reports host-wide numbers.
+    """
+
+    STATS_FLUSH_SECONDS = 5
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = Path(location)
+        self._local = threading.local()
+        self._init_metrics()
+        self._evictions = 0
+        self._sets_since_cull = 0
+        self._last_flush = time.monotonic()
+        options = params.get('OPTIONS', {})
+        self._busy_timeout_ms = int(options.get('BUSY_TIMEOUT_MS', 5000))
+        self._cull_check_interval = int(options.get('CULL_CHECK_INTERVAL', 100))
+
+    # Connection handling -------------------------------------------------
+
+    def _connection(self):
+        pid = os.getpid()
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == pid:
+            return conn
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self._path, timeout=self._busy_timeout_ms / 1000, isolation_level=None)
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('PRAGMA synchronous = NORMAL')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS cache_entries '
+            '(key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL) WITHOUT ROWID'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS cache_entries_expires ON cache_entries (expires)')
+        conn.execute('CREATE TABLE IF NOT EXISTS cache_stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+        self._local.conn = conn
+        self._local.pid = pid
+        return conn
+
+    def _encode(self, value):
+        if type(value) is int:
+            return value
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    def _decode(self, value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    def _expiry(self, timeout):
+        return self.get_backend_timeout(timeout)
+
+    # Metrics ---------------------------------------------------------------
+
+    def _record(self, hits=0, misses=0):
+        super()._record(hits, misses)
+        if time.monotonic() - self._last_flush >= self.STATS_FLUSH_SECONDS:
+            self._flush_stats()
+
+    def _flush_stats(self):
+        with self._metrics_lock:
+            deltas = {'hits': self._hits, 'misses': self._misses, 'evictions': self._evictions}
+            self._hits = self._misses = self._evictions = 0
+            self._last_flush = time.monotonic()
+        deltas = {name: value for name, value in deltas.items() if value}
+        if not deltas:
+            return
+        self._connection().executemany(
+            'INSERT INTO cache_stats (name, value) VALUES (?, ?) '
+            'ON CONFLICT(name) DO UPDATE SET value = value + excluded.value',
+            deltas.items(),
+        )
+
+    def stats(self):
+        self._flush_stats()
+        conn = self._connection()
+        totals = dict(conn.execute('SELECT name, value FROM cache_stats'))
+        entries, size = conn.execute('SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM cache_entries').fetchone()
+        hits, misses = totals.get('hits', 0), totals.get('misses', 0)
+        return {
+            'backend': type(self).__name__,
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': self._ratio(hits, misses),
+            'evictions': totals.get('evictions', 0),
+            'bytes': size,
+            'entries': entries,
+        }
+
+    # Cache API ---------------------------------------------------------------
+
+    def _get(self, key, default, version):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._connection().execute(
+            'SELECT value, expires FROM cache_entries WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return default
+        return self._decode(row[0])
+
+    def get(self, key, default=None, version=None):
+        return self._counted_get(self._get, key, default, version)
+
+    def _get_many(self, keys, version=None):
+        key_map = {self.make_and_validate_key(key, version=version): key for key in keys}
+        if not key_map:
+            return {}
+        placeholders = ', '.join('?' * len(key_map))
+        rows = self._connection().execute(
+            f'SELECT key, value FROM cache_entries WHERE key IN ({placeholders}) '
+            'AND (expires IS NULL OR expires > ?)',
+            (*key_map, time.time()),
+        )
+        return {key_map[key]: self._decode(value) for key, value in rows}
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        return self._counted_get_many(self._get_many, keys, version)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._connection().execute(
+            'INSERT OR REPLACE INTO cache_entries (key, value, expires) VALUES (?, ?, ?)',
+            (key, self._encode(value), self._expiry(timeout)),
+        )
+        self._maybe_cull()
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        conn = self._connection()
+        cursor = conn.execute(
+            'INSERT INTO cache_entries (key, value, expires) VALUES (?, ?, ?) '
+            'ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires = excluded.expires '
+            'WHERE cache_entries.expires IS NOT NULL AND cache_entries.expires <= ?',
+            (key, self._encode(value), self._expiry(timeout), time.time()),
+        )
+        self._maybe_cull()
+        return cursor.rowcount > 0
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._connection().execute(
+            'UPDATE cache_entries SET expires = ? WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self._expiry(timeout), key, time.time()),
+        )
+        return cursor.rowcount > 0
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._connection().execute('DELETE FROM cache_entries WHERE key = ?', (key,))
+        return cursor.rowcount > 0
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._connection().execute(
+            'SELECT 1 FROM cache_entries WHERE key = ? AND (expires IS NULL OR expires > ?)', (key, time.time())
+        ).fetchone()
+        return row is not None
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._connection().execute(
+            "UPDATE cache_entries SET value = value + ? "
+            "WHERE key = ? AND typeof(value) = 'integer' AND (expires IS NULL OR expires > ?) "
+            "RETURNING value",
+            (delta, key, time.time()),
+        ).fetchone()
+        if row is None:
+            raise ValueError("Key '%s' not found" % key)
+        return row[0]
+
+    def clear(self):
+        conn = self._connection()
+        conn.execute('DELETE FROM cache_entries')
+        conn.execute('DELETE FROM cache_stats')
+        with self._metrics_lock:
+            self._hits = self._misses = self._evictions = 0
+
+    def _maybe_cull(self):
+        self._sets_since_cull += 1
+        if self._sets_since_cull < self._cull_check_interval:
+            return
+        self._sets_since_cull = 0
+        self._cull()
+
+    def _cull(self):
+        conn = self._connection()
+        conn.execute('DELETE FROM cache_entries WHERE expires IS NOT NULL AND expires <= ?', (time.time(),))
+        (count,) = conn.execute('SELECT COUNT(*) FROM cache_entries').fetchone()
+        if count <= self._max_entries:
+            return
+        # Evict the entries closest to expiry (never-expiring entries last)
+        excess = count - self._max_entries + self._max_entries // self._cull_frequency
+        cursor = conn.execute(
+            'DELETE FROM cache_entries WHERE key IN ('
+            'SELECT key FROM cache_entries ORDER BY expires IS NULL, expires LIMIT ?)',
+            (excess,),
+        )
+        with self._metrics_lock:
+            self._evictions += max(cursor.rowcount, 0)
+
+    def close(self, **kwargs):
+        # Connections are per thread and reused across requests
+        pass
+
+
+class InstrumentedRedisCache(CacheMetricsMixin, RedisCache):
+    """Django's RedisCache plus ``stats()`` from counters and INFO."""
+
+    def __init__(self, server, params):
+        super().__init__(server, params)
+        self._init_metrics()
+
+    def get(self, key, default=None, version=None):
+        return self._counted_get(super().get, key, default, version)
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        return self._counted_get_many(super().get_many, keys, version)
+
+    def stats(self):
+        stats = super().stats()
+        info = self._cache.get_client().info()
+        stats.update(
+            server_hits=info.get('keyspace_hits'),
+            server_misses=info.get('keyspace_misses'),
+            evictions=info.get('evicted_keys'),
+            bytes=info.get('used_memory'),
+            entries=sum(db.get('keys', 0) for name, db in info.items() if name.startswith('db')),
+        )
+        return stats
+
+
+class InstrumentedPyMemcacheCache(CacheMetricsMixin, PyMemcacheCache):
+    """Django's PyMemcacheCache plus ``stats()`` aggregated over servers."""
+
+    def __init__(self, server, params):
+        super().__init__(server, params)
+        self._init_metrics()
+
+    def get(self, key, default=None, version=None):
+        return self._counted_get(super().get, key, default, version)
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        return self._counted_get_many(super().get_many, keys, version)
+
+    def stats(self):
+        stats = super().stats()
+        totals = {'evictions': 0, 'bytes': 0, 'curr_items': 0}
+        for client in self._cache.clients.values():
+            server_stats = client.stats()
+            for name in totals:
+                totals[name] += int(server_stats.get(name.encode(), server_stats.get(name, 0)))
+        stats.update(evictions=totals['evictions'], bytes=totals['bytes'], entries=totals['curr_items'])
+        return stats
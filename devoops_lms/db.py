@@ -0,0 +1,23 @@
+"""
+Database connection tuning.
+
+The ``connection_created`` hook applies ``settings.SQLITE_PRAGMAS`` to every
+new SQLite connection so readers keep going while a writer holds the lock.
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """Apply SQLITE_PRAGMAS to a freshly opened SQLite connection."""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    if not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+connection_created.connect(configure_sqlite, dispatch_uid='devoops_lms.db.configure_sqlite')
@@ -0,0 +1,193 @@
+"""
+In-process pub/sub for live learner updates, backed by a database table.
+
+``publish()`` inserts a ``courses.LiveEvent`` row. Every process runs a single
+``EventBroker`` tailer task while it has subscribers: it reads rows newer than
+the last one it saw every ``EVENTS_POLL_INTERVAL`` seconds (and at once after a
+publish from the same process) and fans them out to that user's subscribers.
+Database load therefore depends on the number of processes, not on the number
+of open SSE connections; idle connections only cost a queue and a keep-alive
+comment every ``EVENTS_KEEPALIVE_SECONDS``.
+
+Ids can commit out of order when writers run concurrently (PostgreSQL), so
+skipped ids are re-checked for ``EVENTS_GAP_SECONDS`` before being given up.
+"""
+import asyncio
+import contextvars
+import json
+import logging
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from courses.models import LiveEvent
+
+logger = logging.getLogger(__name__)
+
+MAX_TRACKED_GAPS = 1000
+
+
+def publish(user_id, kind, data):
+    """Queue an event for ``user_id``; delivered to subscribers after commit."""
+    if not settings.EVENTS_ENABLED:
+        return
+    event = LiveEvent.objects.create(user_id=user_id, kind=kind, data=data)
+    transaction.on_commit(broker.wake)
+    if event.id % settings.EVENTS_PRUNE_EVERY == 0:
+        cutoff = timezone.now() - timedelta(seconds=settings.EVENTS_RETENTION_SECONDS)
+        # Never empty the table: SQLite would restart ids below the tailers' position.
+        LiveEvent.objects.filter(created_at__lt=cutoff, id__lt=event.id).delete()
+
+
+def publish_progress(progress, completed_lessons):
+    publish(progress.user_id, 'progress', {
+        'course_id': progress.course_id,
+        'progress_percentage': progress.progress_percentage,
+        'completed_lessons': completed_lessons,
+    })
+    publish_streak(progress.user_id)
+
+
+def publish_grade(attempt, result):
+    publish(attempt.user_id, 'grade', {
+        'exercise_id': attempt.exercise_id,
+        'success': result['success'],
+        'score': result.get('score', 0),
+        'max_score': result.get('max_score'),
+        'message': result.get('message', ''),
+    })
+    publish_streak(attempt.user_id)
+
+
+def publish_streak(user_id):
+    """The streak only changes with the first activity of a day, so publish once per user per day."""
+    if not settings.EVENTS_ENABLED:
+        return
+    if cache.add(f'events:streak:{user_id}:{timezone.now().date()}', True, 86400):
+        # The streak queries only need the primary key; skip loading the user row.
+        user = get_user_model()(pk=user_id)
+        publish(user_id, 'streak', {'streak_days': user.get_learning_streak()})
+
+
+def format_event(event_id, kind, data):
+    return f'id: {event_id}\nevent: {kind}\ndata: {json.dumps(data)}\n\n'
+
+
+class EventBroker:
+    """Per-process fan-out of LiveEvent rows to subscriber queues."""
+
+    def __init__(self):
+        self.subscribers = defaultdict(set)
+        self.last_id = None
+        self.gaps = {}
+        self._loop = None
+        self._wake = None
+        self._task = None
+
+    def subscribe(self, user_id):
+        queue = asyncio.Queue(maxsize=settings.EVENTS_QUEUE_SIZE)
+        self.subscribers[user_id].add(queue)
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._wake = asyncio.Event()
+            # Run outside the request's context so its sync_to_async calls do
+            # not land on the request's (short-lived) thread-sensitive executor.
+            self._task = loop.create_task(self._tail(), context=contextvars.Context())
+        return queue
+
+    def unsubscribe(self, user_id, queue):
+        queues = self.subscribers.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self.subscribers[user_id]
+
+    def wake(self):
+        """Poll now instead of at the next interval; safe to call from any thread."""
+        loop, wake = self._loop, self._wake
+        if loop is not None and wake is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(wake.set)
+
+    def dispatch(self, event_id, user_id, kind, data):
+        for queue in self.subscribers.get(user_id, ()):
+            if queue.full():
+                # Slow client: drop the oldest event; it can resync with Last-Event-ID.
+                queue.get_nowait()
+            queue.put_nowait((event_id, kind, data))
+
+    async def _tail(self):
+        while self.subscribers:
+            self._wake.clear()
+            try:
+                rows = await sync_to_async(self.fetch)()
+            except DatabaseError:
+                logger.exception('Live event poll failed')
+                rows = []
+            for row in rows:
+                self.dispatch(*row)
+            try:
+                await asyncio.wait_for(self._wake.wait(), settings.EVENTS_POLL_INTERVAL)
+            except TimeoutError:
+                pass
+
+    def fetch(self):
+        """New rows since the last poll, plus any late commits into earlier gaps."""
+        try:
+            if self.last_id is None:
+                self.last_id = LiveEvent.objects.aggregate(last=Max('id'))['last'] or 0
+                return []
+            now = time.monotonic()
+            self.gaps = {event_id: deadline for event_id, deadline in self.gaps.items() if deadline > now}
+            query = Q(id__gt=self.last_id)
+            if self.gaps:
+                query |= Q(id__in=list(self.gaps))
+            rows = list(LiveEvent.objects.filter(query).order_by('id').values_list('id', 'user_id', 'kind', 'data'))
+        except DatabaseError:
+            connection.close()
+            raise
+        for event_id, *_ in rows:
+            if self.gaps.pop(event_id, None) is not None:
+                continue
+            missing = range(self.last_id + 1, event_id)
+            if len(missing) <= MAX_TRACKED_GAPS:
+                self.gaps.update(dict.fromkeys(missing, now + settings.EVENTS_GAP_SECONDS))
+            self.last_id = event_id
+        return rows
+
+
+broker = EventBroker()
+
+
+async def stream(user_id, last_event_id=None):
+    """Async generator of SSE frames for one connection."""
+    queue = broker.subscribe(user_id)
+    try:
+        yield f'retry: {settings.EVENTS_RETRY_MS}\n\n'
+        sent = 0
+        if last_event_id is not None:
+            missed = await sync_to_async(list)(
+                LiveEvent.objects.filter(user_id=user_id, id__gt=last_event_id)
+                .order_by('id').values_list('id', 'kind', 'data')
+            )
+            for event_id, kind, data in missed:
+                sent = event_id
+                yield format_event(event_id, kind, data)
+        while True:
+            try:
+                event_id, kind, data = await asyncio.wait_for(queue.get(), settings.EVENTS_KEEPALIVE_SECONDS)
+            except TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            if event_id > sent:
+                yield format_event(event_id, kind, data)
+    finally:
+        broker.unsubscribe(user_id, queue)
@@ -0,0 +1,315 @@
+"""
+Production-safe per-request instrumentation.
+
+``RequestMetricsMiddleware`` measures wall time, database query count and
+time (through ``connection.execute_wrapper``, so DEBUG is not needed),
+template render time and repeated query shapes (N+1 signatures) for every
+request. Render time is taken around the Django template backend's
+``Template.render``, so ``render()`` in function views counts as much as a
+``TemplateResponse``; templates rendered while another is rendering count once. It adds a ``Server-Timing`` header, logs slow or N+1 requests to the
+``devoops_lms.performance`` logger and aggregates per-URL-name histograms.
+
+Each worker periodically writes its aggregates to
+``REQUEST_METRICS_DIR/requests-<pid>.json``; ``python manage.py
+request_metrics`` merges and prints them.
+"""
+import contextvars
+import functools
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import Template as DjangoTemplate
+
+from .metrics import Histogram
+
+logger = logging.getLogger('devoops_lms.performance')
+
+IN_LIST_RE = re.compile(r'IN \((?:%s, )*%s\)')
+SLOW_SAMPLES_KEPT = 50
+
+_current_stats = contextvars.ContextVar('request_stats', default=None)
+
+
+def query_signature(sql):
+    """Collapse a parametrised SQL string to its shape."""
+    return IN_LIST_RE.sub('IN (...)', sql)
+
+
+class RequestStats:
+    """Measurements for a single request."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_ms = 0.0
+        self.template_ms = 0.0
+        self.signatures = Counter()
+        self.rendering = False
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_ms += (time.perf_counter() - start) * 1000
+            self.queries += 1
+            self.signatures[query_signature(sql)] += 1
+
+    def duplicates(self, threshold):
+        return [(signature, count) for signature, count in self.signatures.most_common() if count >= threshold]
+
+
+def _timed_render(render):
+    @functools.wraps(render)
+    def timed(self, *args, **kwargs):
+        stats = _current_stats.get()
+        if stats is None or stats.rendering:
+            return render(self, *args, **kwargs)
+        stats.rendering = True
+        started = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            stats.template_ms += (time.perf_counter() - started) * 1000
+            stats.rendering = False
+    timed.timed_render = True
+    return timed
+
+
+def _time_template_rendering():
+    if not getattr(DjangoTemplate.render, 'timed_render', False):
+        DjangoTemplate.render = _timed_render(DjangoTemplate.render)
+
+
+class MetricsRecorder:
+    """Per-process aggregates, flushed to disk every REQUEST_METRICS_FLUSH_SECONDS."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.views = {}
+        self.fragments = {}
+        self.slow = deque(maxlen=SLOW_SAMPLES_KEPT)
+        self.last_flush = time.monotonic()
+
+    def _view(self, name):
+        view = self.views.get(name)
+        if view is None:
+            view = self.views[name] = {
+                'wall_ms': Histogram(),
+                'db_ms': Histogram(),
+                'template_ms': Histogram(),
+                'queries': Histogram(Histogram.DEFAULT_BOUNDS[:-8]),
+                'n_plus_one': 0,
+                'errors': 0,
+            }
+        return view
+
+    def record(self, name, status, wall_ms, stats, duplicates):
+        with self.lock:
+            view = self._view(name)
+            view['wall_ms'].add(wall_ms)
+            view['db_ms'].add(stats.db_ms)
+            view['template_ms'].add(stats.template_ms)
+            view['queries'].add(stats.queries)
+            view['n_plus_one'] += bool(duplicates)
+            view['errors'] += status >= 500
+            if wall_ms >= settings.REQUEST_METRICS_SLOW_MS or duplicates:
+                self.slow.append({
+                    'view': name,
+                    'at': time.time(),
+                    'wall_ms': round(wall_ms, 1),
+                    'queries': stats.queries,
+                    'db_ms': round(stats.db_ms, 1),
+                    'duplicates': [[signature[:300], count] for signature, count in duplicates[:3]],
+                })
+            due = time.monotonic() - self.last_flush >= settings.REQUEST_METRICS_FLUSH_SECONDS
+        if due:
+            self.flush()
+
+    def record_fragment(self, name, hit, render_ms=None):
+        """Count a fragment cache lookup; misses also record the render time."""
+        with self.lock:
+            fragment = self.fragments.get(name)
+            if fragment is None:
+                fragment = self.fragments[name] = {'hits': 0, 'misses': 0, 'render_ms': Histogram()}
+            if hit:
+                fragment['hits'] += 1
+            else:
+                fragment['misses'] += 1
+                fragment['render_ms'].add(render_ms)
+
+    def snapshot(self):
+        def serialize(groups):
+            return {
+                name: {key: value.to_dict() if isinstance(value, Histogram) else value
+                       for key, value in group.items()}
+                for name, group in groups.items()
+            }
+
+        with self.lock:
+            return {
+                'pid': os.getpid(),
+                'views': serialize(self.views),
+                'fragments': serialize(self.fragments),
+                'slow': list(self.slow),
+            }
+
+    def flush(self):
+        """Atomically write this worker's cumulative aggregates."""
+        data = self.snapshot()
+        directory = Path(settings.REQUEST_METRICS_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        target = directory / f'requests-{os.getpid()}.json'
+        tmp = target.with_suffix('.tmp')
+        tmp.write_text(json.dumps(data))
+        os.replace(tmp, target)
+        with self.lock:
+            self.last_flush = time.monotonic()
+
+
+recorder = MetricsRecorder()
+
+
+def _install_wrapper(stats):
+    for connection in connections.all():
+        connection.execute_wrappers.append(stats)
+
+
+def _remove_wrapper(stats):
+    for connection in connections.all():
+        if stats in connection.execute_wrappers:
+            connection.execute_wrappers.remove(stats)
+
+
+def _merge(merged, groups):
+    for name, group in groups.items():
+        target = merged.setdefault(name, {})
+        for key, value in group.items():
+            if isinstance(value, dict):
+                histogram = Histogram.from_dict(value)
+                if key in target:
+                    target[key].merge(histogram)
+                else:
+                    target[key] = histogram
+            else:
+                target[key] = target.get(key, 0) + value
+
+
+def _load_files(directory):
+    for path in sorted(Path(directory or settings.REQUEST_METRICS_DIR).glob('requests-*.json')):
+        try:
+            yield json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+
+
+def load_aggregates(directory=None):
+    """Merge every worker's flushed aggregates into one view -> histograms dict."""
+    views, slow = {}, []
+    for data in _load_files(directory):
+        slow.extend(data.get('slow', []))
+        _merge(views, data['views'])
+    return views, sorted(slow, key=lambda sample: sample['at'])
+
+
+def load_fragment_aggregates(directory=None):
+    """Merge every worker's fragment cache hits, misses and render times."""
+    fragments = {}
+    for data in _load_files(directory):
+        _merge(fragments, data.get('fragments', {}))
+    return fragments
+
+
+class RequestMetricsMiddleware:
+    """Time every request and aggregate the result under its URL name."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        _time_template_rendering()
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not settings.REQUEST_METRICS_ENABLED:
+            return self.get_response(request)
+
+        stats = RequestStats()
+        token = _current_stats.set(stats)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(stats))
+                response = self.get_response(request)
+        finally:
+            _current_stats.reset(token)
+        wall_ms = (time.perf_counter() - start) * 1000
+        user = getattr(request, 'user', None)
+        return self.finish(request, response, stats, wall_ms, user)
+
+    async def __acall__(self, request):
+        if not settings.REQUEST_METRICS_ENABLED:
+            return await self.get_response(request)
+
+        # Database work for an ASGI request runs in that request's
+        # thread-sensitive worker thread, whose connections are not the
+        # event loop's, so the wrappers are installed there.
+        stats = RequestStats()
+        token = _current_stats.set(stats)
+        start = time.perf_counter()
+        await sync_to_async(_install_wrapper)(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(_remove_wrapper)(stats)
+            _current_stats.reset(token)
+        wall_ms = (time.perf_counter() - start) * 1000
+        user = await request.auser() if hasattr(request, 'auser') else None
+        return self.finish(request, response, stats, wall_ms, user)
+
+    def finish(self, request, response, stats, wall_ms, user):
+        match = getattr(request, 'resolver_match', None)
+        name = (match.view_name if match else None) or '<unresolved>'
+        duplicates = stats.duplicates(settings.REQUEST_METRICS_N_PLUS_ONE)
+        recorder.record(name, response.status_code, wall_ms, stats, duplicates)
+
+        if wall_ms >= settings.REQUEST_METRICS_SLOW_MS or duplicates:
+            logger.warning(
+                'Slow request %s %s (%s): %.0f ms, %d queries, %.0f ms in DB%s',
+                request.method, request.path, name, wall_ms, stats.queries, stats.db_ms,
+                ''.join(f'\n  x{count} {signature[:200]}' for signature, count in duplicates[:3]),
+            )
+
+        if self._server_timing_allowed(user):
+            response['Server-Timing'] = (
+                f'total;dur={wall_ms:.1f}, db;dur={stats.db_ms:.1f};desc="{stats.queries} queries", '
+                f'tpl;dur={stats.template_ms:.1f}'
+            )
+        return response
+
+    def _server_timing_allowed(self, user):
+        mode = settings.REQUEST_METRICS_SERVER_TIMING
+        if mode == 'all':
+            return True
+        if mode == 'staff':
+            return bool(user is not None and user.is_authenticated and user.is_staff)
+        return False
@@ -0,0 +1,89 @@
+"""
+Content-addressed media storage.
+
+``ContentAddressedStorage`` names every file after the SHA-256 of its bytes
+(``ab/abcd….png`` under ``MEDIA_BLOB_PATH``), so the same screenshot pasted
+into twenty lessons is stored once and every lesson links to the same URL.
+Uploads are hashed while they are streamed to a temporary file next to the
+blobs and then renamed into place, so a large file is never held in memory.
+If the blob already exists the temporary copy is dropped and the blob's mtime
+is refreshed, so the garbage collector treats it as a fresh upload.
+
+Because a blob's content can never change under its name,
+``StaticAssetMiddleware`` serves blob URLs with ``immutable`` cache headers.
+Blobs are shared, so nothing deletes them on behalf of a single record;
+``python manage.py gc_media_blobs`` removes those no rich-text field refers to.
+"""
+import hashlib
+import os
+import re
+import tempfile
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+
+BLOB_NAME = re.compile(r'^[0-9a-f]{2}/[0-9a-f]{64}(\.[a-z0-9]{1,10})?$')
+TEMP_DIR = 'tmp'
+
+
+def blob_name(digest, extension=''):
+    return f'{digest[:2]}/{digest}{extension}'
+
+
+def _extension(name):
+    extension = os.path.splitext(name)[1].lower()
+    return extension if re.fullmatch(r'\.[a-z0-9]{1,10}', extension) else ''
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Store each distinct file once, named by its SHA-256 and original extension."""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('location', os.path.join(settings.MEDIA_ROOT, settings.MEDIA_BLOB_PATH))
+        kwargs.setdefault('base_url', settings.MEDIA_URL + settings.MEDIA_BLOB_PATH)
+        super().__init__(**kwargs)
+
+    def get_available_name(self, name, max_length=None):
+        # The final name comes from the content; identical files share it.
+        return name
+
+    def _save(self, name, content):
+        temp_dir = self.path(TEMP_DIR)
+        os.makedirs(temp_dir, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=temp_dir)
+        try:
+            digest = hashlib.sha256()
+            with os.fdopen(fd, 'wb') as out:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    out.write(chunk)
+            name = blob_name(digest.hexdigest(), _extension(name))
+            path = self.path(name)
+            if os.path.exists(path):
+                os.unlink(temp_path)
+                # gc_media_blobs judges age by mtime; a re-upload must count as new.
+                os.utime(path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(temp_path, self.file_permissions_mode)
+                os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+        return name
+
+    def blobs(self):
+        """Every stored blob name."""
+        root = self.path('')
+        if not os.path.isdir(root):
+            return
+        for prefix in sorted(os.listdir(root)):
+            directory = os.path.join(root, prefix)
+            if prefix == TEMP_DIR or not os.path.isdir(directory):
+                continue
+            for filename in sorted(os.listdir(directory)):
+                name = f'{prefix}/{filename}'
+                if BLOB_NAME.match(name):
+                    yield name
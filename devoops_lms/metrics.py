@@ -0,0 +1,96 @@
+"""Small helpers for summarising latency samples in benchmarks and reports."""
+import math
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of ``values`` (``pct`` in 0-100)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(latencies_ms, elapsed_s=None, errors=0):
+    """Summary dict for a list of latencies in milliseconds."""
+    summary = {
+        'requests': len(latencies_ms),
+        'errors': errors,
+        'mean_ms': round(sum(latencies_ms) / len(latencies_ms), 2) if latencies_ms else 0.0,
+        'p50_ms': round(percentile(latencies_ms, 50), 2),
+        'p90_ms': round(percentile(latencies_ms, 90), 2),
+        'p95_ms': round(percentile(latencies_ms, 95), 2),
+        'p99_ms': round(percentile(latencies_ms, 99), 2),
+        'max_ms': round(max(latencies_ms), 2) if latencies_ms else 0.0,
+    }
+    if elapsed_s:
+        summary['rps'] = round(len(latencies_ms) / elapsed_s, 1)
+    return summary
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram that can be merged across processes.
+
+    Bucket upper bounds grow roughly x1.5, which keeps percentile estimates
+    within a bucket's width while the serialized form stays tiny.
+    """
+
+    DEFAULT_BOUNDS = (
+        1, 2, 3, 5, 7, 10, 15, 20, 30, 50, 75, 100, 150, 200, 300, 500, 750,
+        1000, 1500, 2000, 3000, 5000, 7500, 10000, 20000, 60000,
+    )
+
+    def __init__(self, bounds=DEFAULT_BOUNDS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        index = 0
+        for index, bound in enumerate(self.bounds):
+            if value <= bound:
+                break
+        else:
+            index = len(self.bounds)
+        self.counts[index] += 1
+        self.total += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        self.counts = [mine + theirs for mine, theirs in zip(self.counts, other.counts)]
+        self.total += other.total
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    def quantile(self, pct):
+        """Upper bound of the bucket holding the ``pct`` percentile."""
+        if not self.total:
+            return 0.0
+        target = max(1, math.ceil(pct / 100 * self.total))
+        running = 0
+        for index, count in enumerate(self.counts):
+            running += count
+            if running >= target:
+                return min(self.bounds[index], self.max) if index < len(self.bounds) else self.max
+        return self.max
+
+    @property
+    def mean(self):
+        return self.sum / self.total if self.total else 0.0
+
+    def to_dict(self):
+        return {'bounds': list(self.bounds), 'counts': self.counts, 'total': self.total,
+                'sum': self.sum, 'max': self.max}
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls(data['bounds'])
+        histogram.counts = list(data['counts'])
+        histogram.total = data['total']
+        histogram.sum = data['sum']
+        histogram.max = data['max']
+        return histogram
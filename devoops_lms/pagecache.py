@@ -0,0 +1,161 @@
+"""
+Full-page cache for anonymous visitors.
+
+``AnonymousPageCacheMiddleware`` sits in front of the session, CSRF and auth
+middleware and answers GET/HEAD requests for ``PAGE_CACHE_URL_NAMES`` from the
+"pages" cache. It only does so for clients without a session or messages
+cookie: anyone who might be signed in, or who has a flash message waiting,
+goes through the full stack.
+
+Entries are keyed on host and path only. None of the cached views read the
+query string, so every ``?...`` variant shares one entry. Pages still send
+``Vary: Cookie`` (the auth context processor reads the empty session). That is
+the one header that matters, and it is already covered by serving only
+cookieless clients. A response that sets a cookie, rendered a CSRF token, is
+``private``/``no-store`` or is not a plain 200 is never stored, so nothing
+visitor-specific can leak into the cache.
+
+Each entry remembers the catalog version and ``RELEASE_VERSION`` it was
+rendered under. It is fresh for ``PAGE_CACHE_SECONDS`` while both still match;
+after that, or after a catalog bump, it is stale. A stale entry is served to
+everyone except the one request that wins the refresh lock and re-renders
+the page, so a content edit costs one render per page instead of a burst.
+Entries expire outright ``PAGE_CACHE_STALE_SECONDS`` after going stale.
+
+Responses carry ``X-Page-Cache: hit``, ``stale`` or ``miss``.
+"""
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+from django.utils.cache import cc_delim_re, get_conditional_response
+
+from courses.catalog import catalog_version
+
+MESSAGES_COOKIE = 'messages'
+HEADER = 'X-Page-Cache'
+# Set per response by the middleware in front of this one.
+UNSTORED_HEADERS = {'server-timing', 'set-cookie', HEADER.lower()}
+
+
+def page_key(request):
+    # The cached views ignore query parameters; keying on them would let ?x=<random> flood and bypass the cache.
+    return f'page:{request.get_host()}:{request.path}'
+
+
+def cacheable_request(request):
+    """Resolver match for a request the cache may answer, else ``None``."""
+    if not settings.PAGE_CACHE_ENABLED or request.method not in ('GET', 'HEAD'):
+        return None
+    cookies = request.COOKIES
+    if settings.SESSION_COOKIE_NAME in cookies or MESSAGES_COOKIE in cookies or 'HTTP_AUTHORIZATION' in request.META:
+        return None
+    try:
+        match = resolve(request.path_info)
+    except Resolver404:
+        return None
+    return match if match.view_name in settings.PAGE_CACHE_URL_NAMES else None
+
+
+def cacheable_response(request, response):
+    if response.status_code != 200 or response.streaming or response.cookies:
+        return False
+    # Set whenever the page used a CSRF token, even if the cookie was not resent.
+    if request.META.get('CSRF_COOKIE_NEEDS_UPDATE'):
+        return False
+    directives = {d.strip().lower() for d in cc_delim_re.split(response.get('Cache-Control', ''))}
+    return not directives & {'private', 'no-store'}
+
+
+def is_fresh(entry, version, now):
+    return (
+        entry['catalog_version'] == version
+        and entry['release'] == settings.RELEASE_VERSION
+        and now - entry['stored_at'] < settings.PAGE_CACHE_SECONDS
+    )
+
+
+def store(key, response, version):
+    """Save ``response`` under ``key`` as rendered at catalog ``version``."""
+    entry = {
+        'catalog_version': version,
+        'release': settings.RELEASE_VERSION,
+        'stored_at': time.time(),
+        'status': response.status_code,
+        'headers': [(k, v) for k, v in response.items() if k.lower() not in UNSTORED_HEADERS],
+        'content': response.content,
+    }
+    caches['pages'].set(key, entry, settings.PAGE_CACHE_SECONDS + settings.PAGE_CACHE_STALE_SECONDS)
+
+
+def build_response(request, entry, state):
+    response = HttpResponse(entry['content'], status=entry['status'])
+    for header, value in entry['headers']:
+        response[header] = value
+    response['Age'] = str(max(0, int(time.time() - entry['stored_at'])))
+    response[HEADER] = state
+    return get_conditional_response(request, etag=response.get('ETag'), response=response) or response
+
+
+class AnonymousPageCacheMiddleware:
+    """Serve cached catalog pages to anonymous visitors, refreshing stale ones once."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        match = cacheable_request(request)
+        if match is None:
+            return self.get_response(request)
+        key, cached, version = self.lookup(request, match)
+        if cached is not None:
+            return cached
+        return self.render(request, key, version, self.get_response(request))
+
+    async def __acall__(self, request):
+        match = cacheable_request(request)
+        if match is None:
+            return await self.get_response(request)
+        key, cached, version = await sync_to_async(self.lookup)(request, match)
+        if cached is not None:
+            return cached
+        response = await self.get_response(request)
+        return await sync_to_async(self.render)(request, key, version, response)
+
+    def lookup(self, request, match):
+        """``(key, response or None, catalog version)``; ``None`` means this request renders."""
+        # Request metrics report cache hits under the page's own URL name.
+        request.resolver_match = match
+        key = page_key(request)
+        version = catalog_version()
+        cache = caches['pages']
+        entry = cache.get(key)
+        if entry is None:
+            return key, None, version
+        if is_fresh(entry, version, time.time()):
+            return key, build_response(request, entry, 'hit'), version
+        if cache.add(f'{key}:refresh', 1, settings.PAGE_CACHE_REFRESH_LOCK_SECONDS):
+            request._page_cache_refresh = True
+            return key, None, version
+        return key, build_response(request, entry, 'stale'), version
+
+    def render(self, request, key, version, response):
+        try:
+            if request.method == 'GET' and cacheable_response(request, response):
+                store(key, response, version)
+        finally:
+            if getattr(request, '_page_cache_refresh', False):
+                caches['pages'].delete(f'{key}:refresh')
+        response[HEADER] = 'miss'
+        return response
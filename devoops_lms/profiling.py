@@ -0,0 +1,218 @@
+"""
+Opt-in sampling profiler for individual requests.
+
+``ProfilingMiddleware`` profiles a request when its URL name is listed in
+``PROFILER_URL_NAMES`` (subject to ``PROFILER_SAMPLE_RATE``) or when a staff
+user sends the ``PROFILER_HEADER`` header. A background thread samples the
+request thread's Python stack every ``PROFILER_INTERVAL_MS`` and the result is
+written to ``PROFILER_DIR`` in collapsed-stack format (one ``frame;frame;frame
+count`` line per distinct stack), which flamegraph.pl, speedscope and
+``python manage.py profiles`` read directly.
+
+Overhead is bounded by the sampling interval, ``PROFILER_MAX_SAMPLES`` per
+request and ``PROFILER_MAX_CONCURRENT`` profiled requests per process; files
+beyond ``PROFILER_MAX_FILES`` or older than ``PROFILER_MAX_AGE_DAYS`` are
+deleted after each write.
+"""
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.urls import Resolver404, resolve
+
+UNSAFE_NAME_RE = re.compile(r'[^A-Za-z0-9_.-]+')
+PROFILE_SUFFIX = '.collapsed'
+
+_slots = None
+_slots_size = None
+_slots_lock = threading.Lock()
+
+
+def _profiling_slots():
+    """Process-wide semaphore sized from PROFILER_MAX_CONCURRENT."""
+    global _slots, _slots_size
+    with _slots_lock:
+        if _slots_size != settings.PROFILER_MAX_CONCURRENT:
+            _slots = threading.BoundedSemaphore(settings.PROFILER_MAX_CONCURRENT)
+            _slots_size = settings.PROFILER_MAX_CONCURRENT
+        return _slots
+
+
+def _short_path(filename):
+    base = str(settings.BASE_DIR) + os.sep
+    if filename.startswith(base):
+        return filename[len(base):]
+    marker = f'site-packages{os.sep}'
+    if marker in filename:
+        return filename.split(marker, 1)[1]
+    return os.path.basename(filename)
+
+
+class StackSampler:
+    """Sample one thread's stack on a timer until stopped."""
+
+    def __init__(self, thread_id, interval_ms, max_samples):
+        self.thread_id = thread_id
+        self.interval = interval_ms / 1000
+        self.max_samples = max_samples
+        self.stacks = Counter()
+        self.samples = 0
+        self._labels = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.elapsed_ms = (time.perf_counter() - self.started) * 1000
+        return self
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = f'{code.co_qualname} ({_short_path(code.co_filename)})'.replace(';', ':')
+        return label
+
+    def _run(self):
+        while not self._stop.wait(self.interval) and self.samples < self.max_samples:
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+                self.samples += 1
+
+    def collapsed(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+def write_profile(name, sampler, directory=None):
+    """Write a sampler's collapsed stacks and enforce retention; return the path."""
+    directory = Path(directory or settings.PROFILER_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    stamp = time.strftime('%Y%m%d-%H%M%S')
+    path = directory / (
+        f'{UNSAFE_NAME_RE.sub("_", name)}.{stamp}.{os.getpid()}.{int(sampler.elapsed_ms)}ms{PROFILE_SUFFIX}'
+    )
+    tmp = path.with_suffix('.tmp')
+    tmp.write_text(sampler.collapsed())
+    os.replace(tmp, path)
+    prune_profiles(directory)
+    return path
+
+
+def prune_profiles(directory=None):
+    """Delete profiles beyond PROFILER_MAX_FILES (oldest first) or older than PROFILER_MAX_AGE_DAYS."""
+    directory = Path(directory or settings.PROFILER_DIR)
+    cutoff = time.time() - settings.PROFILER_MAX_AGE_DAYS * 86400
+    files = []
+    for path in directory.glob(f'*{PROFILE_SUFFIX}'):
+        try:
+            files.append((path.stat().st_mtime, path))
+        except FileNotFoundError:
+            continue
+    files.sort(reverse=True)
+    for index, (mtime, path) in enumerate(files):
+        if index >= settings.PROFILER_MAX_FILES or mtime < cutoff:
+            path.unlink(missing_ok=True)
+
+
+def read_profile(path):
+    """Parse a collapsed-stack file into a Counter of stack -> samples."""
+    stacks = Counter()
+    for line in Path(path).read_text().splitlines():
+        stack, _, count = line.rpartition(' ')
+        if stack:
+            stacks[stack] += int(count)
+    return stacks
+
+
+class ProfilingMiddleware:
+    """
+    Sample the stack of selected requests and save a collapsed-stack profile.
+
+    Under ASGI the event loop thread is sampled, which is where async views
+    do their Python work; ORM calls show up as waits in sync_to_async.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not (settings.PROFILER_URL_NAMES or request.headers.get(settings.PROFILER_HEADER)):
+            return self.get_response(request)
+        user = request.user if request.headers.get(settings.PROFILER_HEADER) else None
+        started = self.start(request, user)
+        if started is None:
+            return self.get_response(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            self.stop(started)
+        return self.save(started, response)
+
+    async def __acall__(self, request):
+        if not (settings.PROFILER_URL_NAMES or request.headers.get(settings.PROFILER_HEADER)):
+            return await self.get_response(request)
+        user = await request.auser() if request.headers.get(settings.PROFILER_HEADER) else None
+        started = self.start(request, user)
+        if started is None:
+            return await self.get_response(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            self.stop(started)
+        return self.save(started, response)
+
+    def start(self, request, user):
+        """Begin sampling if this request is selected; return the state needed to finish."""
+        try:
+            name = resolve(request.path_info, getattr(request, 'urlconf', None)).view_name
+        except Resolver404:
+            return None
+        requested = bool(user is not None and user.is_authenticated and user.is_staff)
+        if not (requested or self._sampled(name)):
+            return None
+        slots = _profiling_slots()
+        if not slots.acquire(blocking=False):
+            return None
+        sampler = StackSampler(threading.get_ident(), settings.PROFILER_INTERVAL_MS, settings.PROFILER_MAX_SAMPLES)
+        return name, requested, slots, sampler.start()
+
+    def stop(self, started):
+        _, _, slots, sampler = started
+        sampler.stop()
+        slots.release()
+
+    def save(self, started, response):
+        name, requested, _, sampler = started
+        if sampler.samples:
+            path = write_profile(name, sampler)
+            if requested:
+                response['X-Profile'] = path.name
+        return response
+
+    def _sampled(self, view_name):
+        return view_name in settings.PROFILER_URL_NAMES and random.random() < settings.PROFILER_SAMPLE_RATE
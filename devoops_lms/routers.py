@@ -0,0 +1,151 @@
+"""
+Read-replica routing.
+
+``ReplicaRoutingMiddleware`` marks a request as replica-eligible when its URL
+name is listed in ``settings.REPLICA_READ_VIEWS``. While that flag is set, the
+router sends reads of ``settings.REPLICA_APPS`` models to a random replica.
+Any write pins the client to the primary for ``REPLICA_STICKY_SECONDS`` via a
+cookie, so a learner always sees their own progress right after saving it.
+
+Code outside a request (commands, reports) can opt in with ``use_replica()``.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+STICKY_COOKIE = 'db_primary_pin'
+
+
+@dataclass
+class RoutingState:
+    use_replica: bool = False
+    pinned: bool = False
+    wrote: bool = False
+
+
+_state = ContextVar('db_routing_state', default=None)
+
+
+def current_state():
+    return _state.get()
+
+
+@contextmanager
+def use_replica():
+    """Route eligible reads inside the block to a replica."""
+    token = _state.set(RoutingState(use_replica=True))
+    try:
+        yield
+    finally:
+        _state.reset(token)
+
+
+@contextmanager
+def pin_primary():
+    """Force every read inside the block to the primary."""
+    token = _state.set(RoutingState(pinned=True))
+    try:
+        yield
+    finally:
+        _state.reset(token)
+
+
+class ReplicaRouter:
+    """Send eligible reads to ``settings.REPLICA_DATABASES``; all writes to the primary."""
+
+    def _replicas(self):
+        return getattr(settings, 'REPLICA_DATABASES', [])
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        replicas = self._replicas()
+        if (
+            not replicas
+            or state is None
+            or not state.use_replica
+            or state.pinned
+            or state.wrote
+            or model._meta.app_label not in settings.REPLICA_APPS
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db in replicas:
+            return instance._state.db
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        pool = {DEFAULT_DB_ALIAS, *self._replicas()}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive schema changes through replication (or a file copy locally)
+        if db in self._replicas():
+            return False
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """Scope replica routing to one request and maintain the sticky-after-write cookie."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+            # Keep the ASGI path free of a sync_to_async hop per request.
+            self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        state = RoutingState(pinned=STICKY_COOKIE in request.COOKIES)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.finish(state, response)
+
+    async def __acall__(self, request):
+        # sync_to_async copies the context, so ORM calls made from async views
+        # see (and update) this request's RoutingState.
+        state = RoutingState(pinned=STICKY_COOKIE in request.COOKIES)
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.finish(state, response)
+
+    def finish(self, state, response):
+        if state.wrote:
+            response.set_cookie(
+                STICKY_COOKIE, '1', max_age=settings.REPLICA_STICKY_SECONDS, httponly=True, samesite='Lax',
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = _state.get()
+        if state is not None and request.method in ('GET', 'HEAD'):
+            state.use_replica = request.resolver_match.view_name in settings.REPLICA_READ_VIEWS
+        return None
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        return ReplicaRoutingMiddleware.process_view(self, request, view_func, view_args, view_kwargs)
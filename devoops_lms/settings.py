@@ -46,13 +46,18 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "devoops_lms.assets.StaticAssetMiddleware",
+    "devoops_lms.instrumentation.RequestMetricsMiddleware",
+    "devoops_lms.pagecache.AnonymousPageCacheMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "devoops_lms.routers.ReplicaRoutingMiddleware",
+    "devoops_lms.profiling.ProfilingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
-    # "debug_toolbar.middleware.DebugToolbarMiddleware",
+    # "debug_toolbar.middleware.DebugToolbarMiddleware",  # dev only; see REQUEST_METRICS_* below
     "allauth.account.middleware.AccountMiddleware",
 ]
 
@@ -81,14 +86,243 @@ WSGI_APPLICATION = "devoops_lms.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+# Pick a profile with DATABASE_PROFILE:
+#   sqlite        WAL journal, synchronous=NORMAL, mmap and busy timeout (default)
+#   sqlite-basic  stock rollback-journal SQLite, kept for benchmarking
+#   postgres      PostgreSQL with a psycopg connection pool (or persistent
+#                 connections when DATABASE_POOL=0)
+# Compare them with `python manage.py benchmark_db`.
+DATABASE_PROFILE = os.environ.get("DATABASE_PROFILE", "sqlite")
+
+if DATABASE_PROFILE == "postgres":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.environ.get("POSTGRES_DB", "devoops_lms"),
+            "USER": os.environ.get("POSTGRES_USER", "devoops"),
+            "PASSWORD": os.environ.get("POSTGRES_PASSWORD", ""),
+            "HOST": os.environ.get("POSTGRES_HOST", "localhost"),
+            "PORT": os.environ.get("POSTGRES_PORT", "5432"),
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {},
+        }
+    }
+    if os.environ.get("DATABASE_POOL", "1") == "1":
+        # Django's native psycopg pool; incompatible with CONN_MAX_AGE.
+        DATABASES["default"]["OPTIONS"]["pool"] = {
+            "min_size": int(os.environ.get("DATABASE_POOL_MIN", "2")),
+            "max_size": int(os.environ.get("DATABASE_POOL_MAX", "10")),
+            "timeout": 10,
+        }
+    else:
+        DATABASES["default"]["CONN_MAX_AGE"] = int(os.environ.get("CONN_MAX_AGE", "600"))
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.environ.get("SQLITE_PATH", BASE_DIR / "db.sqlite3"),
+        }
     }
+    if DATABASE_PROFILE == "sqlite":
+        DATABASES["default"]["CONN_MAX_AGE"] = int(os.environ.get("CONN_MAX_AGE", "600"))
+        # Take the write lock at BEGIN so concurrent writers wait on
+        # busy_timeout instead of failing on lock upgrade.
+        DATABASES["default"]["OPTIONS"] = {"transaction_mode": "IMMEDIATE"}
+
+# Deployment profile, matching gunicorn.conf.py:
+#   wsgi  threaded WSGI workers (default)
+#   asgi  uvicorn workers; the JSON endpoints are async views
+# Under ASGI every request's ORM work runs in a fresh thread, so persistent
+# connections would only pile up; rely on the psycopg pool instead.
+SERVER_PROFILE = os.environ.get("SERVER_PROFILE", "wsgi")
+if SERVER_PROFILE == "asgi" and "CONN_MAX_AGE" in DATABASES["default"]:
+    DATABASES["default"]["CONN_MAX_AGE"] = 0
+
+# Applied to every new SQLite connection by devoops_lms.db (sqlite profile only).
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -20000,
+    "temp_store": "MEMORY",
+} if DATABASE_PROFILE == "sqlite" else {}
+
+# Read replicas: DATABASE_REPLICAS is a comma-separated list of SQLite files
+# (sqlite profiles) or `host[:port][/dbname]` entries (postgres). Catalog and
+# reporting reads go to a replica; everything else, and any client that wrote
+# within the last REPLICA_STICKY_SECONDS, stays on the primary.
+REPLICA_DATABASES = []
+for index, entry in enumerate(filter(None, os.environ.get("DATABASE_REPLICAS", "").split(","))):
+    alias = f"replica_{index + 1}"
+    replica = {**DATABASES["default"], "TEST": {"MIRROR": "default"}}
+    if DATABASE_PROFILE == "postgres":
+        host, _, name = entry.strip().partition("/")
+        host, _, port = host.partition(":")
+        replica.update(HOST=host, PORT=port or replica["PORT"], NAME=name or replica["NAME"])
+    else:
+        replica["NAME"] = entry.strip()
+    DATABASES[alias] = replica
+    REPLICA_DATABASES.append(alias)
+
+DATABASE_ROUTERS = ["devoops_lms.routers.ReplicaRouter"]
+REPLICA_STICKY_SECONDS = int(os.environ.get("REPLICA_STICKY_SECONDS", "10"))
+# Apps whose models may be read from a replica.
+REPLICA_APPS = {"courses"}
+# URL names whose reads are replica-eligible.
+REPLICA_READ_VIEWS = {
+    "course_list",
+    "roadmap",
+    "search",
+    "search_suggestions",
+    "technology_detail",
+    "admin:courses_interactiveexercise_changelist",
+    "admin:courses_userexerciseattempt_changelist",
 }
 
 
+# Caches
+# CACHE_BACKEND picks the implementation behind every alias:
+#   sqlite     shared on-box cache in SQLite files under CACHE_DIR (default)
+#   redis      REDIS_URL
+#   memcached  MEMCACHED_LOCATION (comma-separated host:port list)
+# `python manage.py cache_stats` reports hit ratio, evictions and size per alias.
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "sqlite")
+CACHE_DIR = Path(os.environ.get("CACHE_DIR", BASE_DIR / "var" / "cache"))
+CACHE_ALIASES = {
+    # alias: (default timeout in seconds, max entries)
+    "default": (300, 10000),
+    "catalog": (3600, 10000),
+    "sessions": (1209600, 100000),
+    "fragments": (3600, 20000),
+    "pages": (3600, 5000),
+    "ratelimit": (60, 100000),
+}
+
+
+def _cache_config(alias, timeout, max_entries):
+    if CACHE_BACKEND == "redis":
+        return {
+            "BACKEND": "devoops_lms.cache.InstrumentedRedisCache",
+            "LOCATION": os.environ.get("REDIS_URL", "redis://127.0.0.1:6379/0"),
+            "KEY_PREFIX": alias,
+            "TIMEOUT": timeout,
+        }
+    if CACHE_BACKEND == "memcached":
+        return {
+            "BACKEND": "devoops_lms.cache.InstrumentedPyMemcacheCache",
+            "LOCATION": os.environ.get("MEMCACHED_LOCATION", "127.0.0.1:11211").split(","),
+            "KEY_PREFIX": alias,
+            "TIMEOUT": timeout,
+        }
+    return {
+        "BACKEND": "devoops_lms.cache.SQLiteCache",
+        "LOCATION": CACHE_DIR / f"{alias}.sqlite3",
+        "TIMEOUT": timeout,
+        "OPTIONS": {"MAX_ENTRIES": max_entries},
+    }
+
+
+CACHES = {alias: _cache_config(alias, *limits) for alias, limits in CACHE_ALIASES.items()}
+
+# `manage.py test` moves every cache alias, REQUEST_METRICS_DIR and
+# PROFILER_DIR to a temporary directory, so a test run never touches live state.
+TEST_RUNNER = "devoops_lms.testing.TestRunner"
+
+# Sessions
+# SESSION_BACKEND: cached_db (write-through to the "sessions" cache, default),
+# cache (cache only), signed_cookies or db. Expired rows are removed in
+# batches by `python manage.py purge_sessions`.
+SESSION_ENGINE = {
+    "db": "django.contrib.sessions.backends.db",
+    "cached_db": "django.contrib.sessions.backends.cached_db",
+    "cache": "django.contrib.sessions.backends.cache",
+    "signed_cookies": "django.contrib.sessions.backends.signed_cookies",
+}[os.environ.get("SESSION_BACKEND", "cached_db")]
+SESSION_CACHE_ALIAS = "sessions"
+
+# Request instrumentation (devoops_lms.instrumentation)
+# Per-URL-name histograms are flushed per worker to REQUEST_METRICS_DIR and
+# merged by `python manage.py request_metrics`.
+REQUEST_METRICS_ENABLED = os.environ.get("REQUEST_METRICS_ENABLED", "1") == "1"
+REQUEST_METRICS_DIR = BASE_DIR / "var" / "metrics"
+REQUEST_METRICS_FLUSH_SECONDS = 10
+REQUEST_METRICS_SLOW_MS = int(os.environ.get("REQUEST_METRICS_SLOW_MS", "500"))
+# Same query shape repeated this many times in one request is reported as N+1.
+REQUEST_METRICS_N_PLUS_ONE = 5
+# Who receives the Server-Timing header: "all", "staff" or "off".
+REQUEST_METRICS_SERVER_TIMING = "all" if DEBUG else "staff"
+
+# Sampling profiler (devoops_lms.profiling)
+# Profile every request to these URL names (e.g. "validate_exercise,dashboard,lesson_detail"),
+# or any request from a staff user that sends the PROFILER_HEADER header.
+PROFILER_URL_NAMES = set(filter(None, os.environ.get("PROFILER_URL_NAMES", "").split(",")))
+PROFILER_SAMPLE_RATE = float(os.environ.get("PROFILER_SAMPLE_RATE", "1.0"))
+PROFILER_HEADER = "X-Profile"
+PROFILER_DIR = Path(os.environ.get("PROFILER_DIR", BASE_DIR / "var" / "profiles"))
+PROFILER_INTERVAL_MS = float(os.environ.get("PROFILER_INTERVAL_MS", "5"))
+PROFILER_MAX_SAMPLES = 2000
+PROFILER_MAX_CONCURRENT = 2
+PROFILER_MAX_FILES = 200
+PROFILER_MAX_AGE_DAYS = 7
+
+# Live updates (devoops_lms.events), streamed at /events/ under ASGI
+# Publishing defaults to off under WSGI, where /events/ answers 501 and nothing reads the rows.
+EVENTS_ENABLED = os.environ.get("EVENTS_ENABLED", "1" if SERVER_PROFILE == "asgi" else "0") == "1"
+# One tail query per process per interval, however many clients are connected.
+EVENTS_POLL_INTERVAL = float(os.environ.get("EVENTS_POLL_INTERVAL", "0.5"))
+EVENTS_KEEPALIVE_SECONDS = 15
+EVENTS_RETRY_MS = 5000
+EVENTS_QUEUE_SIZE = 100
+EVENTS_GAP_SECONDS = 5
+EVENTS_RETENTION_SECONDS = 3600
+# Every Nth published event deletes rows older than EVENTS_RETENTION_SECONDS.
+EVENTS_PRUNE_EVERY = 1000
+
+# Leaderboards (courses.leaderboards)
+LEADERBOARD_CACHE_SECONDS = 30
+LEADERBOARD_KEEP_WEEKS = 12
+LEADERBOARD_SIZE = 20
+
+# Staff exports (courses.exports): rows fetched per database round trip and
+# bytes encoded (and compressed) per streamed chunk.
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_BUFFER_BYTES = 64 * 1024
+
+# Course bundles (courses.bundles): rows per bulk upsert on import; export
+# reads use EXPORT_CHUNK_SIZE.
+BUNDLE_IMPORT_BATCH_SIZE = 500
+
+# Template fragment cache (courses.fragments): keys carry the catalog and
+# per-learner progress versions, so the timeout only bounds unused entries.
+FRAGMENT_CACHE_ENABLED = True
+FRAGMENT_CACHE_SECONDS = 3600
+
+# Conditional GET (courses.conditional): page ETags include RELEASE_VERSION
+# so a deploy with changed templates never answers 304 with old markup. Set it
+# to the build or commit id in production.
+RELEASE_VERSION = os.environ.get("RELEASE_VERSION", "dev")
+
+# Home page statistics (courses.site_stats): each worker keeps its own copy
+# for LOCAL_SECONDS, backed by the shared cache.
+SITE_STATS_LOCAL_SECONDS = 30
+SITE_STATS_CACHE_SECONDS = 300
+
+# Anonymous full-page cache (devoops_lms.pagecache): pages are fresh for
+# PAGE_CACHE_SECONDS or until the catalog version changes, then served stale
+# for up to PAGE_CACHE_STALE_SECONDS while a single request re-renders them.
+PAGE_CACHE_ENABLED = os.environ.get("PAGE_CACHE_ENABLED", "1") == "1"
+PAGE_CACHE_URL_NAMES = {"home", "course_list", "roadmap", "course_detail", "technology_detail"}
+PAGE_CACHE_SECONDS = 300
+PAGE_CACHE_STALE_SECONDS = 3600
+PAGE_CACHE_REFRESH_LOCK_SECONDS = 30
+
+# Learning event log (courses.activity): events are buffered per process and
+# written in batches; months older than KEEP_MONTHS are archived.
+LEARNING_EVENTS_BATCH_SIZE = 500
+LEARNING_EVENTS_FLUSH_SECONDS = 2
+LEARNING_EVENTS_KEEP_MONTHS = 12
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -129,8 +363,32 @@ STATICFILES_DIRS = [
     BASE_DIR / "static",
 ]
 
+# Fingerprinted + precompressed (gzip/brotli) files in production; plain
+# storage while developing so templates work before `build_assets` has run.
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": (
+            "django.contrib.staticfiles.storage.StaticFilesStorage"
+            if DEBUG
+            else "devoops_lms.assets.PrecompressedManifestStaticFilesStorage"
+        ),
+    },
+}
+
+# Asset pipeline (`python manage.py build_assets`)
+TAILWIND_CLI = os.environ.get("TAILWIND_CLI", "tailwindcss")
+TAILWIND_VERSION = "3.4.17"
+ASSETS_CACHE_DIR = BASE_DIR / ".assets-cache"
+
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
+# Content-addressed uploads (devoops_lms.media), served as immutable by
+# StaticAssetMiddleware; `python manage.py gc_media_blobs` removes unused ones.
+MEDIA_BLOB_PATH = "uploads/"
+MEDIA_BLOB_GC_MIN_AGE_HOURS = 24
 
 # Crispy forms
 CRISPY_ALLOWED_TEMPLATE_PACKS = "tailwind"
@@ -225,7 +483,17 @@ CKEDITOR_5_CONFIGS = {
 
 # Custom color for django-ckeditor-5
 CKEDITOR_5_CUSTOM_CSS = '.ck-editor__editable { min-height: 300px; }'
-CKEDITOR_5_FILE_STORAGE = "django.core.files.storage.FileSystemStorage"
+CKEDITOR_5_FILE_STORAGE = "courses.images.EditorUploadStorage"
+
+# Responsive images (courses.images): derivatives of logos, profile pictures
+# and editor uploads, encoded by IMAGE_WORKERS background threads per process
+# (0 = inline after commit). Formats Pillow cannot encode are skipped.
+IMAGE_WORKERS = int(os.environ.get("IMAGE_WORKERS", "2"))
+IMAGE_DERIVATIVE_WIDTHS = (320, 640, 960, 1280, 1920)
+IMAGE_DERIVATIVE_FORMATS = ("avif", "webp")
+IMAGE_DERIVATIVE_QUALITY = {"avif": 60, "webp": 80}
+IMAGE_CONTENT_SIZES = "(min-width: 1024px) 720px, 100vw"
+IMAGE_LOOKUP_CACHE_SECONDS = 3600
 
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -0,0 +1,65 @@
+"""
+Test isolation for the on-box state the app keeps outside the database.
+
+``TestRunner`` is the project's ``TEST_RUNNER``. For the length of a run it
+points every cache alias, ``REQUEST_METRICS_DIR`` and ``PROFILER_DIR`` at a
+temporary directory. So ``manage.py test`` on a server never reads, fills or
+clears the live caches. That includes Redis or Memcached: tests always get
+SQLite files. Learning events still buffered when the test databases are torn
+down are discarded rather than flushed into a database that no longer exists.
+Test cases that need empty caches mix in ``ClearCachesMixin``.
+"""
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import caches
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from courses import activity
+
+
+def isolated_caches(directory):
+    """``CACHES`` with every alias in its own SQLite file under ``directory``."""
+    return {
+        alias: {
+            'BACKEND': 'devoops_lms.cache.SQLiteCache',
+            'LOCATION': Path(directory) / f'{alias}.sqlite3',
+            'TIMEOUT': config.get('TIMEOUT', 300),
+            'OPTIONS': {'MAX_ENTRIES': settings.CACHE_ALIASES.get(alias, (None, 10000))[1]},
+        }
+        for alias, config in settings.CACHES.items()
+    }
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.state_dir = Path(tempfile.mkdtemp(prefix='devoops-test-'))
+        self.isolation = override_settings(
+            CACHES=isolated_caches(self.state_dir / 'cache'),
+            REQUEST_METRICS_DIR=self.state_dir / 'metrics',
+            PROFILER_DIR=self.state_dir / 'profiles',
+        )
+        self.isolation.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.isolation.disable()
+        shutil.rmtree(self.state_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
+
+    def teardown_databases(self, old_config, **kwargs):
+        # Learning events still buffered belong to the test database, which is about to go.
+        activity.discard()
+        super().teardown_databases(old_config, **kwargs)
+
+
+class ClearCachesMixin:
+    """Start every test with all cache aliases empty."""
+
+    def setUp(self):
+        for alias in caches:
+            caches[alias].clear()
+        super().setUp()
@@ -0,0 +1,418 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.template import engines
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from courses.catalog import bump_catalog_version
+from courses.models import Course, LearningEvent, Lesson, LiveEvent
+from courses.synthetic import create_catalog, create_learners
+from courses.views import RoadmapView
+from users.models import CustomUser, UserProgress
+
+from . import events
+from .assets import IMMUTABLE_CACHE_CONTROL, preferred_encoding
+from .cache import SQLiteCache
+from .instrumentation import RequestMetricsMiddleware, RequestStats, load_aggregates, query_signature, recorder
+from .pagecache import cacheable_response, page_key
+from .profiling import StackSampler, prune_profiles, read_profile
+from .routers import STICKY_COOKIE, ReplicaRouter, pin_primary, use_replica
+from .testing import ClearCachesMixin
+
+
+class StaticAssetPipelineTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp)
+        source = self.tmp / 'src'
+        (source / 'css').mkdir(parents=True)
+        (source / 'css' / 'app.css').write_text('.gradient-bg { color: red; }\n' * 100)
+        self.override = override_settings(
+            STATICFILES_DIRS=[source],
+            STATIC_ROOT=self.tmp / 'collected',
+            STATICFILES_FINDERS=['django.contrib.staticfiles.finders.FileSystemFinder'],
+            STORAGES={
+                'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+                'staticfiles': {'BACKEND': 'devoops_lms.assets.PrecompressedManifestStaticFilesStorage'},
+            },
+        )
+        self.override.enable()
+        self.addCleanup(self.override.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    def hashed_name(self):
+        from django.contrib.staticfiles.storage import staticfiles_storage
+        return staticfiles_storage.stored_name('css/app.css')
+
+    def test_collectstatic_writes_compressed_variants(self):
+        hashed = self.hashed_name()
+        self.assertNotEqual(hashed, 'css/app.css')
+        self.assertTrue((self.tmp / 'collected' / f'{hashed}.gz').exists())
+
+    def test_fingerprinted_file_is_immutable_and_negotiated(self):
+        response = self.client.get(f'/static/{self.hashed_name()}', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], IMMUTABLE_CACHE_CONTROL)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_codings_refused_with_q_zero_are_not_served(self):
+        path = f'/static/{self.hashed_name()}'
+        self.assertFalse(self.client.get(path, HTTP_ACCEPT_ENCODING='gzip;q=0').has_header('Content-Encoding'))
+        self.assertFalse(self.client.get(path, HTTP_ACCEPT_ENCODING='*;q=0, identity').has_header('Content-Encoding'))
+        response = self.client.get(path, HTTP_ACCEPT_ENCODING='br;q=0, gzip;q=0.5')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(preferred_encoding('br;q=0.4, gzip', ['br', 'gzip']), 'gzip')
+        self.assertEqual(preferred_encoding('*', ['br', 'gzip']), 'br')
+
+    def test_unhashed_file_gets_short_cache(self):
+        response = self.client.get('/static/css/app.css')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('immutable', response['Cache-Control'])
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_path_traversal_falls_through(self):
+        response = self.client.get('/static/../manage.py')
+        self.assertEqual(response.status_code, 404)
+
+
+class SQLiteProfileTests(TestCase):
+    def test_pragmas_applied_to_new_connections(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite profile only')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+
+
+@override_settings(REPLICA_DATABASES=['replica_1'])
+class ReplicaRouterTests(TestCase):
+    router = ReplicaRouter()
+
+    def test_reads_default_outside_replica_scope(self):
+        self.assertEqual(self.router.db_for_read(Course), 'default')
+
+    def test_catalog_reads_use_replica_in_scope(self):
+        # TestCase wraps each test in a transaction, which would pin reads to the primary
+        with use_replica(), mock.patch('devoops_lms.routers.connections') as conns:
+            conns.__getitem__.return_value.in_atomic_block = False
+            self.assertEqual(self.router.db_for_read(Course), 'replica_1')
+            self.assertEqual(self.router.db_for_read(CustomUser), 'default')
+            self.router.db_for_write(Course)
+            self.assertEqual(self.router.db_for_read(Course), 'default')
+
+    def test_pinned_reads_stay_on_primary(self):
+        with pin_primary():
+            self.assertEqual(self.router.db_for_read(Course), 'default')
+
+    def test_write_sets_sticky_cookie(self):
+        create_catalog(phases=1, technologies_per_phase=1, modules_per_course=1, lessons_per_module=1)
+        self.client.force_login(create_learners(1)[0])
+        lesson = Lesson.objects.get()
+        response = self.client.post(f'/courses/lesson/{lesson.pk}/complete/', HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(STICKY_COOKIE, response.cookies)
+
+    def test_read_only_request_does_not_set_cookie(self):
+        response = self.client.get('/courses/search/suggestions/?q=git')
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.params = {'TIMEOUT': 60, 'OPTIONS': {'MAX_ENTRIES': 10, 'CULL_CHECK_INTERVAL': 1}}
+        self.cache = SQLiteCache(self.tmp / 'test.sqlite3', self.params)
+
+    def test_round_trip_and_expiry(self):
+        self.cache.set('course', {'id': 1})
+        self.assertEqual(self.cache.get('course'), {'id': 1})
+        self.cache.set('gone', 1, timeout=-1)
+        self.assertIsNone(self.cache.get('gone'))
+        self.assertTrue(self.cache.add('gone', 2))
+        self.assertFalse(self.cache.add('gone', 3))
+        self.assertEqual(self.cache.get_many(['course', 'missing']), {'course': {'id': 1}})
+
+    def test_entries_are_shared_between_instances(self):
+        other_worker = SQLiteCache(self.tmp / 'test.sqlite3', self.params)
+        self.cache.set('hits', 1)
+        self.assertEqual(other_worker.incr('hits'), 2)
+        self.assertEqual(self.cache.get('hits'), 2)
+
+    def test_incr_missing_key_raises(self):
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_stats_report_hits_misses_and_evictions(self):
+        for index in range(20):
+            self.cache.set(f'key{index}', 'x' * 100)
+        self.cache.get('key19')
+        self.cache.get('nope')
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+        self.assertEqual(stats['hit_ratio'], 0.5)
+        self.assertGreater(stats['evictions'], 0)
+        self.assertLessEqual(stats['entries'], 10)
+        self.assertGreater(stats['bytes'], 0)
+
+
+class SessionEngineTests(TestCase):
+    def setUp(self):
+        caches['sessions'].clear()
+        self.user = create_learners(1)[0]
+
+    def session_queries(self):
+        self.client.force_login(self.user)
+        self.client.get('/dashboard/')
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/dashboard/')
+        return [query for query in ctx.captured_queries if 'django_session' in query['sql']]
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cached_db')
+    def test_cached_db_skips_session_select(self):
+        self.assertEqual(self.session_queries(), [])
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.db')
+    def test_db_engine_reads_session_table(self):
+        self.assertEqual(len(self.session_queries()), 1)
+
+    def test_purge_sessions_deletes_only_expired(self):
+        past = timezone.now() - timedelta(days=1)
+        Session.objects.bulk_create(
+            [Session(session_key=f'expired{index:04d}', session_data='', expire_date=past) for index in range(25)]
+            + [Session(session_key='live', session_data='', expire_date=timezone.now() + timedelta(days=1))]
+        )
+        out = StringIO()
+        call_command('purge_sessions', batch_size=10, pause=0, stdout=out)
+        self.assertIn('Purged 25', out.getvalue())
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ['live'])
+
+
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        caches['pages'].clear()
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp)
+        recorder.reset()
+        self.addCleanup(recorder.reset)
+
+    def test_query_signature_collapses_in_lists(self):
+        self.assertEqual(
+            query_signature('SELECT 1 FROM t WHERE id IN (%s, %s, %s)'),
+            query_signature('SELECT 1 FROM t WHERE id IN (%s)'),
+        )
+
+    def test_repeated_query_shape_is_reported(self):
+        stats = RequestStats()
+        for _ in range(6):
+            stats(lambda *args: None, 'SELECT 1 FROM t WHERE id = %s', (1,), False, {})
+        self.assertEqual(stats.queries, 6)
+        self.assertEqual(stats.duplicates(5), [('SELECT 1 FROM t WHERE id = %s', 6)])
+
+    @override_settings(REQUEST_METRICS_SERVER_TIMING='all')
+    def test_request_is_timed_and_aggregated(self):
+        with self.settings(REQUEST_METRICS_DIR=self.tmp):
+            response = self.client.get('/courses/roadmap/')
+            self.assertEqual(response.status_code, 200)
+            self.assertRegex(response['Server-Timing'], r'total;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries", tpl;dur=')
+            recorder.flush()
+            views, _ = load_aggregates(self.tmp)
+        self.assertEqual(views['roadmap']['wall_ms'].total, 1)
+        self.assertGreater(views['roadmap']['queries'].mean, 0)
+
+    @override_settings(REQUEST_METRICS_SERVER_TIMING='all')
+    def test_templates_rendered_outside_template_responses_are_timed(self):
+        def view(request):
+            template = engines['django'].from_string('{% for i in items %}{{ i }}{% endfor %}')
+            return HttpResponse(template.render({'items': range(20000)}, request))
+
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        response = RequestMetricsMiddleware(view)(request)
+        self.assertNotIn('tpl;dur=0.0', response['Server-Timing'])
+        self.assertRegex(response['Server-Timing'], r'tpl;dur=\d+\.\d')
+
+    @override_settings(REQUEST_METRICS_SERVER_TIMING='all')
+    async def test_async_view_queries_are_counted(self):
+        response = await self.async_client.get('/courses/search/suggestions/', {'q': 'Tech'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('desc="2 queries"', response['Server-Timing'])
+
+    @override_settings(REQUEST_METRICS_SERVER_TIMING='staff')
+    def test_server_timing_hidden_from_anonymous_users(self):
+        response = self.client.get('/courses/roadmap/')
+        self.assertFalse(response.has_header('Server-Timing'))
+
+
+class AnonymousPageCacheTests(ClearCachesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        create_catalog(phases=1, technologies_per_phase=1, modules_per_course=1, lessons_per_module=1)
+
+    def test_second_anonymous_request_is_served_from_cache(self):
+        first = self.client.get('/courses/')
+        self.assertEqual(first['X-Page-Cache'], 'miss')
+        with self.assertNumQueries(0):
+            second = self.client.get('/courses/')
+        self.assertEqual(second['X-Page-Cache'], 'hit')
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_query_strings_share_the_page_entry(self):
+        self.client.get('/courses/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/courses/', {'utm_source': 'x', 'nonce': '123'})
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+
+    def test_signed_in_learners_bypass_the_cache(self):
+        self.client.get('/courses/roadmap/')
+        self.client.force_login(create_learners(1)[0])
+        response = self.client.get('/courses/roadmap/')
+        self.assertFalse(response.has_header('X-Page-Cache'))
+
+    def test_catalog_bump_serves_stale_while_one_request_refreshes(self):
+        lock = f'{page_key(RequestFactory().get("/"))}:refresh'
+        self.client.get('/')
+        bump_catalog_version()
+        caches['pages'].add(lock, 1)  # another worker is already re-rendering
+        self.assertEqual(self.client.get('/')['X-Page-Cache'], 'stale')
+
+        caches['pages'].delete(lock)
+        self.assertEqual(self.client.get('/')['X-Page-Cache'], 'miss')
+        self.assertEqual(self.client.get('/')['X-Page-Cache'], 'hit')
+
+    def test_pages_with_a_csrf_token_are_not_stored(self):
+        request = RequestFactory().get('/')
+        get_token(request)
+        self.assertFalse(cacheable_response(request, HttpResponse('<form></form>')))
+        self.assertTrue(cacheable_response(RequestFactory().get('/'), HttpResponse('ok')))
+
+
+def _busy_loop(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+class ProfilerTests(TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.override = override_settings(PROFILER_DIR=self.tmp, PROFILER_INTERVAL_MS=1)
+        self.override.enable()
+        self.addCleanup(self.override.disable)
+
+    def test_sampler_captures_the_running_function(self):
+        sampler = StackSampler(threading.get_ident(), interval_ms=1, max_samples=1000).start()
+        _busy_loop(0.05)
+        sampler.stop()
+        self.assertGreater(sampler.samples, 0)
+        self.assertTrue(any(stack.endswith('_busy_loop (devoops_lms/tests.py)') for stack in sampler.stacks))
+
+    @override_settings(PROFILER_URL_NAMES={'roadmap'})
+    def test_listed_url_name_is_profiled(self):
+        def slow_context(view, **kwargs):
+            _busy_loop(0.03)
+            return {}
+
+        with mock.patch.object(RoadmapView, 'get_context_data', autospec=True, side_effect=slow_context):
+            self.client.get('/courses/search/suggestions/?q=Te')
+            self.client.get('/courses/roadmap/')
+        profiles = list(self.tmp.glob('*.collapsed'))
+        self.assertEqual([path.name.split('.')[0] for path in profiles], ['roadmap'])
+        self.assertTrue(any(stack.endswith('_busy_loop (devoops_lms/tests.py)') for stack in read_profile(profiles[0])))
+
+    def test_header_requires_staff(self):
+        create_catalog(phases=1, technologies_per_phase=1)
+        lesson = Lesson.objects.first()
+        learner = create_learners(1, prefix='profile')[0]
+        self.client.force_login(learner)
+        response = self.client.get(f'/courses/lesson/{lesson.pk}/', headers={'X-Profile': '1'})
+        self.assertFalse(response.has_header('X-Profile'))
+
+        learner.is_staff = True
+        learner.save()
+        response = self.client.get(f'/courses/lesson/{lesson.pk}/', headers={'X-Profile': '1'})
+        self.assertTrue((self.tmp / response['X-Profile']).exists())
+
+    @override_settings(PROFILER_MAX_FILES=2)
+    def test_retention_keeps_newest_files(self):
+        for index in range(5):
+            path = self.tmp / f'dashboard.{index}.collapsed'
+            path.write_text('a;b 1\n')
+            os.utime(path, (time.time() + index, time.time() + index))
+        prune_profiles(self.tmp)
+        self.assertEqual(sorted(path.name for path in self.tmp.iterdir()),
+                         ['dashboard.3.collapsed', 'dashboard.4.collapsed'])
+
+
+@override_settings(EVENTS_ENABLED=True, EVENTS_POLL_INTERVAL=0.05, EVENTS_KEEPALIVE_SECONDS=5)
+class LiveEventTests(TransactionTestCase):
+    """The broker tails committed rows from its own thread, so the events must really commit."""
+
+    def setUp(self):
+        events.broker.last_id = None
+        events.broker.gaps = {}
+        self.user = create_learners(1, prefix='live')[0]
+
+    def test_fetch_returns_rows_after_the_first_poll(self):
+        broker = events.EventBroker()
+        events.publish(self.user.pk, 'grade', {'score': 1})
+        self.assertEqual(broker.fetch(), [])
+        events.publish(self.user.pk, 'grade', {'score': 2})
+        [(_, user_id, kind, data)] = broker.fetch()
+        self.assertEqual((user_id, kind, data), (self.user.pk, 'grade', {'score': 2}))
+        self.assertEqual(broker.fetch(), [])
+
+    @override_settings(EVENTS_ENABLED=False)
+    def test_nothing_is_written_when_publishing_is_off(self):
+        events.publish(self.user.pk, 'grade', {'score': 1})
+        self.assertFalse(LiveEvent.objects.exists())
+
+    def test_learning_streak_counts_consecutive_days(self):
+        course = create_catalog(phases=1, technologies_per_phase=1, modules_per_course=1, lessons_per_module=1)[0]
+        progress = UserProgress.objects.create(user=self.user, course=course)
+        self.assertEqual(self.user.get_learning_streak(), 0)
+        progress.mark_lesson_complete(course.modules.get().lessons.get())
+        self.assertEqual(self.user.get_learning_streak(), 1)
+        LearningEvent.objects.filter(user=self.user).update(occurred_at=timezone.now() - timedelta(days=1))
+        self.assertEqual(self.user.get_learning_streak(), 0)
+
+    async def test_stream_replays_missed_events_then_delivers_new_ones(self):
+        missed = await sync_to_async(LiveEvent.objects.create)(user=self.user, kind='grade', data={'score': 1})
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get('/events/', headers={'Last-Event-ID': str(missed.pk - 1)})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = aiter(response.streaming_content)
+        try:
+            self.assertTrue((await anext(chunks)).startswith(b'retry: '))
+            self.assertIn(f'id: {missed.pk}\nevent: grade'.encode(), await anext(chunks))
+            while events.broker.last_id is None:
+                await asyncio.sleep(0.01)
+            await sync_to_async(events.publish)(self.user.pk, 'streak', {'streak_days': 3})
+            frame = await asyncio.wait_for(anext(chunks), 5)
+            self.assertIn(b'event: streak\ndata: {"streak_days": 3}', frame)
+        finally:
+            await chunks.aclose()
@@ -9,6 +9,7 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('', views.HomeView.as_view(), name='home'),
     path('dashboard/', views.DashboardView.as_view(), name='dashboard'),
+    path('events/', views.event_stream, name='event_stream'),
     path('courses/', include('courses.urls')),
     path('users/', include('users.urls')),
     path('ckeditor5/', include('django_ckeditor_5.urls')),
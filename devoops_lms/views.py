@@ -1,19 +1,26 @@
+from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
 from django.views.generic import TemplateView
 from django.db.models import Count, Avg, Sum
 from courses.models import Course, Lesson, UserExerciseAttempt
+from courses import activity, analytics, site_stats
+from courses.prerequisites import prerequisite_graph
 from users.models import UserProgress
-from django.utils import timezone
-from datetime import timedelta
 from django.contrib.auth import views as auth_views
+from . import events
 
 class HomeView(TemplateView):
     template_name = 'home.html'
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['technologies_count'] = 15  # Will be dynamic later
-        context['total_lessons'] = 120      # Will be dynamic later
+        # Maintained counts, held in memory per worker: no queries here
+        stats = site_stats.get()
+        context['site_stats'] = stats
+        context['technologies_count'] = stats.technologies
+        context['total_lessons'] = stats.lessons
         return context
 
 class DashboardView(LoginRequiredMixin, TemplateView):
@@ -26,10 +33,11 @@ class DashboardView(LoginRequiredMixin, TemplateView):
         # Get user progress data
         user_progress = UserProgress.objects.filter(user=user).select_related('course')
         
-        # Calculate learning statistics
-        total_courses = Course.objects.filter(is_active=True).count()
-        enrolled_courses = user_progress.count()
-        completed_courses = user_progress.filter(progress_percentage=100).count()
+        # Calculate learning statistics (grouped per phase, cached per user)
+        phases = analytics.phase_progress(user)
+        total_courses = sum(stats.active_courses for stats in phases.values())
+        enrolled_courses = sum(stats.enrolled for stats in phases.values())
+        completed_courses = sum(stats.completed for stats in phases.values())
         
         # Calculate total learning time
         total_lessons_completed = sum(progress.completed_lessons.count() for progress in user_progress)
@@ -38,12 +46,8 @@ class DashboardView(LoginRequiredMixin, TemplateView):
             for progress in user_progress
         )
         
-        # Recent activity (last 7 days)
-        seven_days_ago = timezone.now() - timedelta(days=7)
-        recent_activity = UserProgress.objects.filter(
-            user=user,
-            updated_at__gte=seven_days_ago
-        ).order_by('-updated_at')[:10]
+        # Recent activity (last 7 days), a range scan over the event log
+        recent_activity = activity.recent(user.pk, days=7, limit=10)
         
         # Exercise performance
         exercise_attempts = UserExerciseAttempt.objects.filter(user=user)
@@ -52,7 +56,13 @@ class DashboardView(LoginRequiredMixin, TemplateView):
         exercise_success_rate = (correct_exercises / total_exercises * 100) if total_exercises > 0 else 0
         
         # Current learning phase
-        current_phase = self._get_current_learning_phase(user)
+        current_phase = self._get_current_learning_phase(phases)
+        
+        # Next course whose prerequisites are all completed
+        graph = prerequisite_graph()
+        completed_ids = {progress.course_id for progress in user_progress if progress.progress_percentage == 100}
+        next_course_id = graph.next_recommended(completed_ids, started=[progress.course_id for progress in user_progress])
+        next_course = {'id': next_course_id, 'title': graph.titles[next_course_id]} if next_course_id else None
         
         context.update({
             'user_progress': user_progress,
@@ -66,52 +76,31 @@ class DashboardView(LoginRequiredMixin, TemplateView):
             'exercise_success_rate': round(exercise_success_rate, 1),
             'current_phase': current_phase,
             'streak_days': self._calculate_streak(user),
+            'next_course': next_course,
         })
         return context
     
-    def _get_current_learning_phase(self, user):
+    def _get_current_learning_phase(self, phases):
         """Determine user's current learning phase based on progress"""
-        user_progress = UserProgress.objects.filter(user=user).select_related('course__technology')
-        
-        if not user_progress:
-            return 1  # Start with phase 1
-        
-        # Find the highest phase with incomplete courses
-        phases_progress = {}
-        for progress in user_progress:
-            phase = progress.course.technology.phase
-            if phase not in phases_progress:
-                phases_progress[phase] = []
-            phases_progress[phase].append(progress.progress_percentage)
-        
-        # Find the first phase that's not 100% complete
-        for phase in sorted(phases_progress.keys()):
-            avg_progress = sum(phases_progress[phase]) / len(phases_progress[phase])
-            if avg_progress < 100:
-                return phase
-        
-        # If all phases are complete, return the next phase
-        return max(phases_progress.keys()) + 1 if phases_progress else 1
+        return analytics.current_phase(phases)
     
     def _calculate_streak(self, user):
         """Calculate user's learning streak"""
-        today = timezone.now().date()
-        streak = 0
-        
-        # Check last 30 days for activity
-        for i in range(30):
-            check_date = today - timedelta(days=i)
-            has_activity = UserProgress.objects.filter(
-                user=user,
-                updated_at__date=check_date
-            ).exists() or UserExerciseAttempt.objects.filter(
-                user=user,
-                attempted_at__date=check_date
-            ).exists()
-            
-            if has_activity:
-                streak += 1
-            else:
-                break
-        
-        return streak
\ No newline at end of file
+        return user.get_learning_streak()
+
+
+@login_required
+async def event_stream(request):
+    """Server-sent events with the current user's progress, grading and streak updates"""
+    if not isinstance(request, ASGIRequest):
+        # A WSGI worker would be held for the lifetime of the connection.
+        return HttpResponse('Live updates are served by the ASGI profile.', status=501, content_type='text/plain')
+    user = await request.auser()
+    last_event_id = request.headers.get('Last-Event-ID', '')
+    response = StreamingHttpResponse(
+        events.stream(user.pk, int(last_event_id) if last_event_id.isdigit() else None),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
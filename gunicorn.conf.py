@@ -0,0 +1,25 @@
+"""
+Gunicorn configuration for the two deployment profiles.
+
+    gunicorn                        # SERVER_PROFILE=wsgi: threaded WSGI workers
+    SERVER_PROFILE=asgi gunicorn    # uvicorn workers; async views run on the event loop
+
+Install the servers with `pip install .[asgi]`.
+"""
+import multiprocessing
+import os
+
+profile = os.environ.get("SERVER_PROFILE", "wsgi")
+
+bind = os.environ.get("GUNICORN_BIND", "127.0.0.1:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() + 1))
+keepalive = 5
+timeout = 30
+
+if profile == "asgi":
+    wsgi_app = "devoops_lms.asgi:application"
+    worker_class = "uvicorn_worker.UvicornWorker"
+else:
+    wsgi_app = "devoops_lms.wsgi:application"
+    worker_class = "gthread"
+    threads = int(os.environ.get("GUNICORN_THREADS", "4"))
@@ -0,0 +1,12 @@
+/** Tailwind config used by `python manage.py build_assets`. */
+module.exports = {
+  content: [
+    './templates/**/*.html',
+    './courses/templates/**/*.html',
+    './users/templates/**/*.html',
+  ],
+  theme: {
+    extend: {},
+  },
+  plugins: [],
+};
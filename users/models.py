@@ -1,7 +1,12 @@
+from datetime import timedelta
+
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils import timezone
 
-from courses.models import Course
+from courses import activity
+from courses.models import Course, LearningEvent
+from devoops_lms import events
 
 
 class CustomUser(AbstractUser):
@@ -26,6 +31,15 @@ class CustomUser(AbstractUser):
             return UserProgress.objects.get(user=self, course=course)
         except UserProgress.DoesNotExist:
             return None
+    
+    def get_learning_streak(self, days=30):
+        """Consecutive days up to today with any logged learning activity"""
+        today = timezone.now().date()
+        active = activity.active_days(self.pk, since=today - timedelta(days=days - 1))
+        streak = 0
+        while streak < days and today - timedelta(days=streak) in active:
+            streak += 1
+        return streak
 
 class UserProgress(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
@@ -54,6 +68,7 @@ class UserProgress(models.Model):
             self.progress_percentage = 0
         
         self.save()
+        events.publish_progress(self, completed_count)
     
     def is_lesson_completed(self, lesson):
         """Check if a specific lesson is completed"""
@@ -63,6 +78,7 @@ class UserProgress(models.Model):
         """Mark a lesson as completed and update progress"""
         if not self.is_lesson_completed(lesson):
             self.completed_lessons.add(lesson)
+            activity.record(self.user_id, LearningEvent.LESSON_COMPLETED, lesson.id, self.course_id)
             self.last_accessed_lesson = lesson
             self.update_progress()
             return True